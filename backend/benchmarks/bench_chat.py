@@ -0,0 +1,157 @@
+"""End-to-end NL-to-SQL latency benchmark for /api/chat.
+
+Drives the FastAPI app in-process against SQLite and DuckDB fixtures with the
+deterministic mock LLM provider, and reports p50/p95/p99 per pipeline stage
+(schema fetch, context build, LLM, execution) from the `Server-Timing` header.
+
+    python benchmarks/bench_chat.py --requests 200 --latency-ms 150 --jitter-ms 60
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+import duckdb
+from fastapi.testclient import TestClient
+
+from iopsdata.utils.encryption import generate_key
+from iopsdata.utils.timing import parse_server_timing
+
+PROMPTS = [
+    "How many orders did each customer place?",
+    "Show the ten most recent orders",
+    "Total revenue by region",
+    "Which customers have no orders?",
+]
+
+FIXTURE_DDL = [
+    "create table customers (id integer primary key, name text, region text)",
+    "create table orders "
+    "(id integer primary key, customer_id integer, amount double, created_at text)",
+]
+
+
+def _seed_rows(rows: int) -> tuple[list[tuple], list[tuple]]:
+    regions = ("north", "south", "east", "west")
+    customers = [(i, f"customer-{i}", regions[i % 4]) for i in range(rows)]
+    orders = [(i, i % rows, float(i % 97), f"2024-01-{i % 28 + 1:02d}") for i in range(rows * 5)]
+    return customers, orders
+
+
+def build_sqlite_fixture(path: Path, rows: int) -> None:
+    customers, orders = _seed_rows(rows)
+    conn = sqlite3.connect(path)
+    for ddl in FIXTURE_DDL:
+        conn.execute(ddl)
+    conn.executemany("insert into customers values (?, ?, ?)", customers)
+    conn.executemany("insert into orders values (?, ?, ?, ?)", orders)
+    conn.commit()
+    conn.close()
+
+
+def build_duckdb_fixture(path: Path, rows: int) -> None:
+    customers, orders = _seed_rows(rows)
+    conn = duckdb.connect(str(path))
+    for ddl in FIXTURE_DDL:
+        conn.execute(ddl)
+    conn.executemany("insert into customers values (?, ?, ?)", customers)
+    conn.executemany("insert into orders values (?, ?, ?, ?)", orders)
+    conn.close()
+
+
+def percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_backend(client: TestClient, backend: str, path: Path, args: argparse.Namespace) -> None:
+    response = client.post(
+        "/api/connections",
+        json={"provider": backend, "name": f"bench-{backend}", "config": {"path": str(path)}},
+    )
+    response.raise_for_status()
+
+    stages: dict[str, list[float]] = {}
+    started = time.perf_counter()
+    for index in range(args.requests):
+        request_started = time.perf_counter()
+        response = client.post(
+            "/api/chat",
+            json={
+                "connection_id": f"bench-{backend}",
+                "prompt": PROMPTS[index % len(PROMPTS)],
+                "provider": "mock",
+                "auto_execute": not args.no_execute,
+                "dialect": backend,
+            },
+        )
+        total_ms = (time.perf_counter() - request_started) * 1000
+        if response.status_code != 200:
+            stages.setdefault("errors", []).append(1.0)
+            continue
+        for name, duration in parse_server_timing(response.headers["server-timing"]).items():
+            stages.setdefault(name, []).append(duration)
+        stages.setdefault("total", []).append(total_ms)
+    elapsed = time.perf_counter() - started
+
+    errors = len(stages.pop("errors", []))
+    print(f"\n{backend}: {args.requests} requests in {elapsed:.2f}s ({errors} errors)")
+    print(f"{'stage':<10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, samples in stages.items():
+        print(
+            f"{name:<10}{percentile(samples, 0.5):>10.2f}"
+            f"{percentile(samples, 0.95):>10.2f}{percentile(samples, 0.99):>10.2f}"
+        )
+    client.delete(f"/api/connections/bench-{backend}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--rows", type=int, default=1000, help="customers per fixture")
+    parser.add_argument("--backend", choices=["sqlite", "duckdb", "both"], default="both")
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--jitter-ms", type=float, default=30.0)
+    parser.add_argument(
+        "--distribution", choices=["fixed", "uniform", "lognormal"], default="lognormal"
+    )
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-execute", action="store_true", help="skip auto_execute")
+    args = parser.parse_args()
+
+    os.environ.setdefault("FERNET_KEY", generate_key())
+    os.environ.update(
+        {
+            "MOCK_LLM_ENABLED": "1",
+            "MOCK_LLM_LATENCY_MS": str(args.latency_ms),
+            "MOCK_LLM_JITTER_MS": str(args.jitter_ms),
+            "MOCK_LLM_DISTRIBUTION": args.distribution,
+            "MOCK_LLM_RATE_LIMIT_RATE": str(args.rate_limit_rate),
+            "MOCK_LLM_SEED": str(args.seed),
+        }
+    )
+
+    from iopsdata.api.main import app
+
+    backends = ["sqlite", "duckdb"] if args.backend == "both" else [args.backend]
+    with tempfile.TemporaryDirectory() as tmp, TestClient(app) as client:
+        for backend in backends:
+            path = Path(tmp) / f"bench.{backend}"
+            if backend == "sqlite":
+                build_sqlite_fixture(path, args.rows)
+            else:
+                build_duckdb_fixture(path, args.rows)
+            run_backend(client, backend, path, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Benchmark for LineageGraph construction and traversal at query-history scale.
+
+Builds a synthetic month of lineage: `--queries` query nodes, each reading a
+few tables and writing one, drawn from `--tables` tables with a skewed
+(hot-table) distribution. Writes always target a table later in a fixed
+order, so the graph stays acyclic and `topological_order` succeeds.
+
+    python benchmarks/bench_lineage_graph.py --queries 300000 --tables 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+from iopsdata.lineage.graph import LineageGraph
+
+
+def build(queries: int, tables: int, reads: int, seed: int) -> LineageGraph:
+    rng = random.Random(seed)
+    graph = LineageGraph()
+    table_ids = [graph.add_node("table", f"schema.table_{index}") for index in range(tables)]
+    for index in range(queries):
+        query = graph.add_node("query", f"q{index}")
+        target = rng.randrange(1, tables)
+        for _ in range(reads):
+            # Skew reads towards low-numbered (upstream, hot) tables.
+            source = int(target * rng.random() ** 2)
+            graph.add_edge(table_ids[source], query, "reads")
+        graph.add_edge(query, table_ids[target], "writes")
+    return graph
+
+
+def timed(label: str, fn) -> object:
+    started = time.perf_counter()
+    result = fn()
+    print(f"{label:<32}{(time.perf_counter() - started) * 1000:>10.1f} ms")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--queries", type=int, default=250_000)
+    parser.add_argument("--tables", type=int, default=20_000)
+    parser.add_argument("--reads", type=int, default=3, help="tables read per query")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    graph = timed("build", lambda: build(args.queries, args.tables, args.reads, args.seed))
+    print(f"{len(graph)} nodes, {graph.edge_count} edges")
+    hot, leaf = "table:schema.table_0", f"table:schema.table_{args.tables - 1}"
+    impacted = timed("downstream(hot, depth<=2)", lambda: graph.downstream(hot, max_depth=2))
+    print(f"  {len(impacted)} nodes")
+    impacted = timed("downstream(hot)", lambda: graph.downstream(hot))
+    print(f"  {len(impacted)} nodes")
+    sources = timed("upstream(leaf)", lambda: graph.upstream(leaf))
+    print(f"  {len(sources)} nodes")
+    timed("find_cycle", graph.find_cycle)
+    timed("topological_order", graph.topological_order)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Microbenchmark for the shared SSE decoder on high-token-rate streams.
+
+Builds a synthetic OpenAI-style `text/event-stream` body (one event per token,
+keep-alive comments, a trailing usage event), cuts it into network-sized
+chunks and measures decode throughput of `SSEDecoder` against the previous
+per-line `replace("data:", "")` approach.
+
+    python benchmarks/bench_sse.py --tokens 200000 --chunk-bytes 1400
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+
+from iopsdata.llm.base import SSEDecoder
+
+
+def build_stream(tokens: int, keepalive_every: int) -> str:
+    frames: list[str] = []
+    for index in range(tokens):
+        if keepalive_every and index % keepalive_every == 0:
+            frames.append(": keep-alive\n\n")
+        chunk = {"choices": [{"index": 0, "delta": {"content": f" tok{index % 97}"}}]}
+        frames.append(f"data: {json.dumps(chunk)}\n\n")
+    usage = {"choices": [], "usage": {"prompt_tokens": 10, "completion_tokens": tokens}}
+    frames.append(f"data: {json.dumps(usage)}\n\ndata: [DONE]\n\n")
+    return "".join(frames)
+
+
+def split_chunks(body: str, chunk_bytes: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    chunks: list[str] = []
+    start = 0
+    while start < len(body):
+        size = rng.randint(chunk_bytes // 2, chunk_bytes * 3 // 2)
+        chunks.append(body[start : start + size])
+        start += size
+    return chunks
+
+
+def decode_with_sse_decoder(chunks: list[str], parse_json: bool) -> int:
+    decoder = SSEDecoder()
+    count = 0
+    for chunk in chunks:
+        for event in decoder.feed(chunk):
+            if event.data == "[DONE]":
+                return count
+            if parse_json:
+                event.json()
+            count += 1
+    return count
+
+
+def decode_line_by_line(chunks: list[str], parse_json: bool) -> int:
+    """The pre-decoder approach: buffer into lines, strip a `data:` prefix per line."""
+
+    count = 0
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            if not line.startswith("data:"):
+                continue
+            data = line.replace("data:", "").strip()
+            if data == "[DONE]":
+                return count
+            if parse_json:
+                json.loads(data)
+            count += 1
+    return count
+
+
+def bench(name: str, fn, chunks: list[str], size_mb: float, repeat: int, parse_json: bool) -> None:
+    timings = []
+    events = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        events = fn(chunks, parse_json)
+        timings.append(time.perf_counter() - started)
+    best = min(timings)
+    print(
+        f"{name:<14}{events:>10} events{best * 1000:>10.1f} ms"
+        f"{events / best / 1e6:>10.2f} Mev/s{size_mb / best:>10.1f} MB/s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--tokens", type=int, default=100_000)
+    parser.add_argument("--chunk-bytes", type=int, default=1400, help="mean network chunk size")
+    parser.add_argument("--keepalive-every", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    body = build_stream(args.tokens, args.keepalive_every)
+    chunks = split_chunks(body, args.chunk_bytes, args.seed)
+    size_mb = len(body) / 1e6
+    print(f"{args.tokens} tokens, {size_mb:.1f} MB in {len(chunks)} chunks")
+    for parse_json in (False, True):
+        print(f"\nframing {'+ json.loads' if parse_json else 'only'}:")
+        bench("sse-decoder", decode_with_sse_decoder, chunks, size_mb, args.repeat, parse_json)
+        bench("line-by-line", decode_line_by_line, chunks, size_mb, args.repeat, parse_json)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,8 @@ from fastapi import Depends, Header, HTTPException, Request
 
 from iopsdata.connections.manager import ConnectionManager
 from iopsdata.db.supabase import SupabaseClientWrapper, get_supabase_client
+from iopsdata.lineage.graph import LineageGraph
+from iopsdata.services.conversations import ConversationStore
 
 
 @dataclass
@@ -23,7 +25,7 @@ class ConnectionManagerProvider:
 
 
 async def get_supabase() -> SupabaseClientWrapper:
-    """Provide a Supabase client wrapper."""
+    """Provide the process-wide Supabase client wrapper."""
 
     return await get_supabase_client()
 
@@ -50,6 +52,18 @@ def get_connection_manager(request: Request) -> ConnectionManager:
     return request.app.state.connection_manager
 
 
+def get_lineage_graph(request: Request) -> LineageGraph:
+    """Fetch the accumulated lineage graph from application state."""
+
+    return request.app.state.lineage_graph
+
+
+def get_conversation_store(request: Request) -> ConversationStore:
+    """Fetch the conversation history store from application state."""
+
+    return request.app.state.conversation_store
+
+
 def get_connection(
     connection_id: str,
     manager: ConnectionManager = Depends(get_connection_manager),
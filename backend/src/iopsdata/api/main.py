@@ -18,6 +18,12 @@ from iopsdata.api.routes.files import router as files_router
 from iopsdata.api.routes.lineage import router as lineage_router
 from iopsdata.api.routes.providers import router as providers_router
 from iopsdata.api.routes.settings import router as settings_router
+from iopsdata.api.routes.usage import router as usage_router
+from iopsdata.db.supabase import close_supabase_client
+from iopsdata.lineage.graph import LineageGraph
+from iopsdata.lineage.offload import lineage_parser
+from iopsdata.llm.usage import build_usage_sink, usage_recorder
+from iopsdata.services.conversations import ConversationStore
 
 
 @asynccontextmanager
@@ -28,7 +34,16 @@ async def lifespan(app: FastAPI):
     if not fernet_key:
         raise RuntimeError("FERNET_KEY must be set for connection management")
     app.state.connection_manager = ConnectionManagerProvider(fernet_key).manager
+    app.state.conversation_store = ConversationStore(
+        history_token_budget=int(os.getenv("CHAT_HISTORY_TOKENS", "600")),
+    )
+    app.state.lineage_graph = LineageGraph()
+    usage_recorder.sink = build_usage_sink()
     yield
+    await usage_recorder.close()
+    # Flush buffered Supabase inserts before the shared client goes away.
+    await close_supabase_client()
+    lineage_parser.close()
     # Cleanup connections on shutdown.
     manager = app.state.connection_manager
     for name in list(manager._connections.keys()):
@@ -66,3 +81,4 @@ app.include_router(files_router, prefix="/api")
 app.include_router(lineage_router, prefix="/api")
 app.include_router(providers_router, prefix="/api")
 app.include_router(settings_router, prefix="/api")
+app.include_router(usage_router, prefix="/api")
@@ -2,59 +2,458 @@
 
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import json
+import logging
+import os
+import time
+from collections.abc import AsyncIterator
+from contextlib import AsyncExitStack
+from dataclasses import asdict
+from typing import Any
 
-from iopsdata.api.dependencies import get_connection_manager
-from iopsdata.api.schemas import ChatRequest, ChatResponse, QueryResultPayload
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import StreamingResponse
+
+from iopsdata.api.dependencies import get_connection_manager, get_conversation_store
+from iopsdata.api.schemas import (
+    BatchChatItem,
+    BatchChatRequest,
+    ChatRequest,
+    ChatResponse,
+    QueryResultPayload,
+)
+from iopsdata.connections.base import DatabaseConnection, QueryResult, QuerySession
 from iopsdata.connections.manager import ConnectionManager
-from iopsdata.llm.context import SQL_GENERATION_PROMPT, build_schema_context, extract_sql_from_response, table_from_dict
-from iopsdata.llm.router import get_provider
+from iopsdata.llm.base import BaseLLMProvider, LLMProviderError, LLMResponse
+from iopsdata.llm.context import (
+    FOLLOW_UP_PREFIX,
+    FOLLOW_UP_SUFFIX,
+    SQL_GENERATION_PREFIX,
+    SQL_GENERATION_SUFFIX,
+    SchemaContext,
+    StreamingSQLExtractor,
+    extract_sql_from_response,
+)
+from iopsdata.llm.hedging import generate_hedged
+from iopsdata.llm.router import generate_routed, get_provider, route_providers
+from iopsdata.llm.usage import UsageRecord, usage_recorder
+from iopsdata.services.conversations import ConversationStore, render_history
+from iopsdata.services.sql_repair import SQLRepairError, run_with_repair
+from iopsdata.utils.timing import StageTimer
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["chat"])
 
+# Upper bound on waiting for a pooled connection once the generated SQL is ready.
+SESSION_CHECKOUT_TIMEOUT_S = float(os.getenv("CHAT_SESSION_CHECKOUT_TIMEOUT_S", "10"))
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest, manager: ConnectionManager = Depends(get_connection_manager)) -> ChatResponse:
-    """Generate SQL from natural language and optionally execute it."""
+
+def _result_payload(query_result: QueryResult) -> QueryResultPayload:
+    return QueryResultPayload(
+        columns=query_result.columns,
+        rows=[list(row) for row in query_result.rows],
+        row_count=query_result.row_count,
+    )
+
+
+def _configured_provider(name: str | None) -> BaseLLMProvider:
+    if name is None:
+        routed = route_providers()
+        if not routed:
+            raise HTTPException(status_code=503, detail="No healthy LLM provider is configured")
+        name = routed[0]
+    provider = get_provider(name)
+    if not provider.is_configured():
+        raise HTTPException(status_code=400, detail=f"Provider {provider.name} is not configured")
+    return provider
+
+
+def _provider_to_warm(request: ChatRequest) -> BaseLLMProvider | None:
+    """Instantiate the provider a chat request will call first, so it can warm up early."""
+
+    if request.provider:
+        # Fail fast with a client error for an explicit but unusable provider.
+        return _configured_provider(request.provider)
+    routed = route_providers()
+    return get_provider(routed[0]) if routed else None
+
+
+async def _prepare(
+    request: ChatRequest,
+    manager: ConnectionManager,
+    store: ConversationStore,
+    timer: StageTimer,
+    provider: BaseLLMProvider | None = None,
+) -> tuple[DatabaseConnection, SchemaContext, str, str]:
+    """Resolve the connection and build the cacheable prompt prefix and per-request suffix.
+
+    The schema fetch and prompt construction overlap with warming up `provider`.
+    """
 
     connection = manager.get(request.connection_id)
     if not connection:
         raise HTTPException(status_code=404, detail="Connection not found")
 
-    schema = await manager.schema_for(request.connection_id)
-    tables = [table_from_dict(table) for table in schema]
-    schema_context = build_schema_context(tables, dialect=request.dialect or "postgresql")
+    async def build_prompt() -> tuple[SchemaContext, str, str]:
+        with timer.stage("schema"):
+            await manager.schema_for(request.connection_id)
+        with timer.stage("context"):
+            schema_context = await manager.schema_context_for(
+                request.connection_id,
+                dialect=request.dialect or "postgresql",
+            )
+            history = store.window(request.conversation_id) if request.conversation_id else []
+            if history:
+                prefix = FOLLOW_UP_PREFIX.format(schema_context=schema_context.text)
+                prompt = FOLLOW_UP_SUFFIX.format(
+                    conversation_history=render_history(history),
+                    user_request=request.prompt,
+                )
+            else:
+                prefix = SQL_GENERATION_PREFIX.format(schema_context=schema_context.text)
+                prompt = SQL_GENERATION_SUFFIX.format(user_request=request.prompt)
+        return schema_context, prefix, prompt
 
-    prompt = SQL_GENERATION_PROMPT.format(schema_context=schema_context, user_request=request.prompt)
+    async def warm_up() -> None:
+        if provider is not None:
+            with timer.stage("warmup"):
+                await provider.warmup()
 
-    provider = get_provider(request.provider or "groq")
-    if not provider.is_configured():
-        raise HTTPException(status_code=400, detail=f"Provider {provider.name} is not configured")
+    (schema_context, prefix, prompt), _ = await asyncio.gather(build_prompt(), warm_up())
+    return connection, schema_context, prefix, prompt
+
+
+async def _check_out(
+    connection: DatabaseConnection, stack: AsyncExitStack, timer: StageTimer
+) -> QuerySession:
+    """Check a pooled connection out for the rest of `stack`, waiting a bounded time.
+
+    Called only once the SQL is ready, so a slow LLM call never holds a pool slot.
+    """
+
+    with timer.stage("session"):
+        try:
+            async with asyncio.timeout(SESSION_CHECKOUT_TIMEOUT_S):
+                return await stack.enter_async_context(connection.session())
+        except TimeoutError as exc:
+            raise HTTPException(
+                status_code=503, detail="Timed out waiting for a database connection"
+            ) from exc
+
+
+def _token_usage(responses: list[LLMResponse]) -> dict[str, int | None]:
+    def total(field: str) -> int | None:
+        counts = [getattr(response, field) for response in responses]
+        return None if all(count is None for count in counts) else sum(c or 0 for c in counts)
+
+    return {
+        "prompt": total("prompt_tokens"),
+        "completion": total("completion_tokens"),
+        "total": total("total_tokens"),
+        "cached": total("cached_tokens"),
+    }
 
-    try:
-        response = await provider.generate(prompt)
-    finally:
-        await provider.close()
 
-    sql = extract_sql_from_response(response.content) or response.content.strip()
+@router.post("/chat", response_model=ChatResponse)
+async def chat(
+    request: ChatRequest,
+    http_response: Response,
+    manager: ConnectionManager = Depends(get_connection_manager),
+    store: ConversationStore = Depends(get_conversation_store),
+) -> ChatResponse:
+    """Generate SQL from natural language and optionally execute it.
+
+    Generated SQL is checked against the cached schema and with `EXPLAIN`
+    before it runs; failures are sent back to the model up to
+    `max_repairs` times before giving up with a 422. With a `conversation_id`,
+    recent turns of that conversation are included in the prompt. The schema
+    fetch and provider warm-up run concurrently; with `auto_execute`, a pooled
+    connection is checked out only once the SQL is ready. Per-stage
+    durations are reported in the `Server-Timing` response header.
+    """
 
-    results = None
-    if request.auto_execute:
-        query_result = await connection.execute(sql)
-        results = QueryResultPayload(
-            columns=query_result.columns,
-            rows=[list(row) for row in query_result.rows],
-            row_count=query_result.row_count,
+    timer = StageTimer()
+    provider = _provider_to_warm(request)
+    async with AsyncExitStack() as stack:
+        if provider is not None:
+            stack.push_async_callback(provider.close)
+        connection, schema_context, prefix, prompt = await _prepare(
+            request,
+            manager,
+            store,
+            timer,
+            # Hedged requests race fresh provider instances, so warming one up is wasted.
+            provider=None if request.hedge else provider,
         )
+        try:
+            with timer.stage("llm"):
+                if request.hedge:
+                    chain = route_providers(request.provider, request.fallbacks)
+                    response = await generate_hedged(prompt, chain, prefix=prefix)
+                else:
+                    response = await generate_routed(
+                        prompt, request.provider, request.fallbacks, provider, prefix=prefix
+                    )
+        except LLMProviderError as exc:
+            raise HTTPException(status_code=502, detail=str(exc)) from exc
+        usage_recorder.record_responses([response], "chat", request.workspace_id)
+
+        sql = extract_sql_from_response(response.content) or response.content.strip()
+
+        async def regenerate(fix_prompt: str, fix_prefix: str) -> LLMResponse:
+            fixed = await generate_routed(
+                fix_prompt, response.provider, request.fallbacks, provider, prefix=fix_prefix
+            )
+            usage_recorder.record_responses([fixed], "repair", request.workspace_id)
+            return fixed
+
+        session: QuerySession = connection
+        if request.auto_execute:
+            session = manager.result_cache.session(
+                request.connection_id,
+                await _check_out(connection, stack, timer),
+                request.dialect,
+            )
+        try:
+            outcome = await run_with_repair(
+                sql,
+                session,
+                schema_context,
+                regenerate,
+                execute=request.auto_execute,
+                max_repairs=request.max_repairs,
+                timer=timer,
+            )
+        except SQLRepairError as exc:
+            raise HTTPException(
+                status_code=422,
+                detail={"message": str(exc), "sql": exc.sql, "errors": exc.errors},
+            ) from exc
+        except LLMProviderError as exc:
+            raise HTTPException(status_code=502, detail=str(exc)) from exc
 
+    if request.conversation_id:
+        store.append(request.conversation_id, request.prompt, outcome.sql)
+    http_response.headers["Server-Timing"] = timer.server_timing()
     return ChatResponse(
-        sql=sql,
+        sql=outcome.sql,
         provider=response.provider,
         model=response.model,
-        tokens={
-            "prompt": response.prompt_tokens,
-            "completion": response.completion_tokens,
-            "total": response.total_tokens,
+        tokens=_token_usage([response, *outcome.responses]),
+        results=_result_payload(outcome.result) if outcome.result is not None else None,
+        repairs=outcome.repairs,
+        conversation_id=request.conversation_id,
+    )
+
+
+def _sse(event: str, data: dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def _chat_events(
+    request: ChatRequest,
+    connection: QuerySession,
+    provider: BaseLLMProvider,
+    prefix: str,
+    prompt: str,
+    store: ConversationStore,
+) -> AsyncIterator[str]:
+    extractor = StreamingSQLExtractor()
+    execution: asyncio.Task[QueryResult] | None = None
+
+    def _start(sql: str) -> str:
+        nonlocal execution
+        if request.conversation_id:
+            store.append(request.conversation_id, request.prompt, sql)
+        if request.auto_execute:
+            # Execution overlaps with whatever the model still streams after the SQL.
+            execution = asyncio.create_task(connection.execute(sql))
+        return _sse("sql", {"sql": sql})
+
+    started = time.perf_counter()
+    try:
+        async for chunk in provider.stream(prompt, prefix=prefix):
+            yield _sse("token", {"text": chunk})
+            sql = extractor.feed(chunk)
+            if sql:
+                yield _start(sql)
+
+        if extractor.sql is None:
+            sql = extractor.finish()
+            if sql is None:
+                # Never execute (or present as SQL) a reply that contains no statement.
+                yield _sse("error", {"detail": "No SQL found in model response"})
+                return
+            yield _start(sql)
+        if execution is not None:
+            yield _sse("results", _result_payload(await execution).model_dump())
+        done: dict[str, Any] = {"provider": provider.name, "model": provider.model}
+        if provider.stream_result is not None:
+            done.update(asdict(provider.stream_result))
+            usage_recorder.record(
+                UsageRecord.from_stream(
+                    provider.name,
+                    provider.model,
+                    provider.stream_result,
+                    latency_ms=(time.perf_counter() - started) * 1000,
+                    workspace_id=request.workspace_id,
+                )
+            )
+        yield _sse("done", done)
+    except (LLMProviderError, RuntimeError, PermissionError) as exc:
+        yield _sse("error", {"detail": str(exc)})
+    except Exception as exc:
+        # The response has already started; report any failure as a final frame.
+        logger.exception("Chat stream failed")
+        yield _sse("error", {"detail": f"{type(exc).__name__}: {exc}"})
+    finally:
+        if execution is not None and not execution.done():
+            execution.cancel()
+        await provider.close()
+
+
+@router.post("/chat/stream")
+async def chat_stream(
+    request: ChatRequest,
+    manager: ConnectionManager = Depends(get_connection_manager),
+    store: ConversationStore = Depends(get_conversation_store),
+) -> StreamingResponse:
+    """Stream SQL generation as server-sent events and execute as soon as the SQL is complete.
+
+    Emits `token` events while the model generates, a `sql` event once the
+    statement is complete, `results` when `auto_execute` is set, and a final
+    `done` (or `error`) event.
+    """
+
+    timer = StageTimer()
+    provider = _configured_provider(request.provider)
+    try:
+        connection, _, prefix, prompt = await _prepare(request, manager, store, timer, provider)
+    except BaseException:
+        await provider.close()
+        raise
+    session = manager.result_cache.session(request.connection_id, connection, request.dialect)
+    return StreamingResponse(
+        _chat_events(request, session, provider, prefix, prompt, store),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            "Server-Timing": timer.server_timing(),
         },
-        results=results,
+    )
+
+
+async def _batch_item(
+    index: int,
+    prompt: str,
+    request: BatchChatRequest,
+    connection: QuerySession,
+    schema_context: SchemaContext,
+    provider: BaseLLMProvider,
+    prefix: str,
+    semaphore: asyncio.Semaphore,
+) -> BatchChatItem:
+    async def generate(text: str, text_prefix: str, operation: str) -> LLMResponse:
+        started = time.perf_counter()
+        response = await provider.generate(text, prefix=text_prefix)
+        response.latency_ms = (time.perf_counter() - started) * 1000
+        usage_recorder.record_responses([response], operation, request.workspace_id)
+        return response
+
+    async def regenerate(fix_prompt: str, fix_prefix: str) -> LLMResponse:
+        return await generate(fix_prompt, fix_prefix, "repair")
+
+    async with semaphore:
+        try:
+            response = await generate(
+                SQL_GENERATION_SUFFIX.format(user_request=prompt), prefix, "batch"
+            )
+            sql = extract_sql_from_response(response.content) or response.content.strip()
+            outcome = await run_with_repair(
+                sql,
+                connection,
+                schema_context,
+                regenerate,
+                execute=request.auto_execute,
+                max_repairs=request.max_repairs,
+            )
+        except SQLRepairError as exc:
+            return BatchChatItem(index=index, prompt=prompt, sql=exc.sql, error=str(exc))
+        except (LLMProviderError, RuntimeError, PermissionError) as exc:
+            return BatchChatItem(index=index, prompt=prompt, error=str(exc))
+        except Exception as exc:
+            logger.exception("Batch chat item %s failed", index)
+            return BatchChatItem(index=index, prompt=prompt, error=f"{type(exc).__name__}: {exc}")
+
+    return BatchChatItem(
+        index=index,
+        prompt=prompt,
+        sql=outcome.sql,
+        tokens=_token_usage([response, *outcome.responses]),
+        results=_result_payload(outcome.result) if outcome.result is not None else None,
+        repairs=outcome.repairs,
+    )
+
+
+async def _batch_lines(
+    request: BatchChatRequest,
+    connection: QuerySession,
+    schema_context: SchemaContext,
+    provider: BaseLLMProvider,
+) -> AsyncIterator[str]:
+    prefix = SQL_GENERATION_PREFIX.format(schema_context=schema_context.text)
+    semaphore = asyncio.Semaphore(request.concurrency)
+    tasks = [
+        asyncio.create_task(
+            _batch_item(
+                index, prompt, request, connection, schema_context, provider, prefix, semaphore
+            )
+        )
+        for index, prompt in enumerate(request.prompts)
+    ]
+    try:
+        for next_item in asyncio.as_completed(tasks):
+            item = await next_item
+            yield item.model_dump_json() + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await provider.close()
+
+
+@router.post("/chat/batch")
+async def chat_batch(
+    request: BatchChatRequest,
+    manager: ConnectionManager = Depends(get_connection_manager),
+) -> StreamingResponse:
+    """Generate (and optionally execute) SQL for many prompts against one connection.
+
+    The schema context is built once and one provider client is shared by all
+    prompts. Up to `concurrency` prompts are in flight at a time, still subject
+    to the provider's client-side rate limits. Results stream back as NDJSON
+    lines, in completion order, each tagged with the prompt's `index`.
+    """
+
+    connection = manager.get(request.connection_id)
+    if not connection:
+        raise HTTPException(status_code=404, detail="Connection not found")
+
+    timer = StageTimer()
+    with timer.stage("schema"):
+        await manager.schema_for(request.connection_id)
+    with timer.stage("context"):
+        schema_context = await manager.schema_context_for(
+            request.connection_id,
+            dialect=request.dialect or "postgresql",
+        )
+    provider = _configured_provider(request.provider)
+    session = manager.result_cache.session(request.connection_id, connection, request.dialect)
+    return StreamingResponse(
+        _batch_lines(request, session, schema_context, provider),
+        media_type="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no", "Server-Timing": timer.server_timing()},
     )
@@ -21,6 +21,7 @@ async def create_connection(
     connection = manager.create_connection(payload.provider, payload.name, **payload.config)
     await connection.connect()
     manager.register(payload.name, connection)
+    manager.result_cache.set_ttl(payload.name, payload.cache_ttl_s)
     return ConnectionResponse(name=payload.name, provider=payload.provider, status=connection.pool_status())
 
 
@@ -16,17 +16,31 @@ async def execute_sql(
     request: ExecuteRequest,
     manager: ConnectionManager = Depends(get_connection_manager),
 ) -> ExecuteResponse:
-    """Execute SQL against a stored connection."""
+    """Execute SQL against a stored connection.
+
+    Read queries are served from the connection's result cache when an
+    identical query (after canonicalization) with the same `params` ran
+    within the cache TTL; writes evict cached results for the tables they
+    touch.
+    """
 
     connection = manager.get(request.connection_id)
     if not connection:
         raise HTTPException(status_code=404, detail="Connection not found")
 
-    result = await connection.execute(request.sql)
+    result, cached = await manager.result_cache.execute(
+        request.connection_id,
+        connection,
+        request.sql,
+        request.params,
+        dialect=request.dialect,
+        use_cache=request.use_cache,
+    )
     return ExecuteResponse(
         results=QueryResultPayload(
             columns=result.columns,
             rows=[list(row) for row in result.rows],
             row_count=result.row_count,
-        )
+        ),
+        cached=cached,
     )
@@ -2,23 +2,188 @@
 
 from __future__ import annotations
 
-from fastapi import APIRouter
+import hashlib
+from typing import Any
 
-from iopsdata.api.schemas import LineageRequest, LineageResponse
-from iopsdata.lineage.parser import extract_lineage
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from sqlglot.errors import SqlglotError
+
+from iopsdata.api.dependencies import get_connection_manager, get_lineage_graph
+from iopsdata.api.schemas import (
+    LineageRequest,
+    LineageResponse,
+    ScriptLineageRequest,
+    ScriptLineageResponse,
+    ScriptStatementLineage,
+)
+from iopsdata.lineage.columns import ColumnSchema, extract_column_lineage
+from iopsdata.lineage.offload import LineageParseTimeout, SqlTooLargeError, lineage_parser
+from iopsdata.lineage.parse_cache import fingerprint_sql, parse_cache
+from iopsdata.lineage.parser import LineageExtraction, extract_lineage
+from iopsdata.lineage.script import extract_script_lineage
 
 router = APIRouter(tags=["lineage"])
 
+MAX_NEIGHBORHOOD_DEPTH = 6
+MAX_NEIGHBORHOOD_NODES = 2000
+MAX_NEIGHBORHOOD_EDGES = 5000
+MAX_NEIGHBORHOOD_QUERIES = 20000
+
+
+def _analyze(
+    sql: str, dialect: str | None, include_columns: bool, schema: ColumnSchema | None
+) -> tuple[LineageExtraction, str, dict[str, list[str]] | None]:
+    extraction = extract_lineage(sql, dialect=dialect)
+    fingerprint = fingerprint_sql(sql, dialect)
+    columns = extract_column_lineage(sql, schema, dialect) if include_columns else None
+    return extraction, fingerprint, columns
+
 
 @router.post("/lineage", response_model=LineageResponse)
-async def parse_lineage(payload: LineageRequest) -> LineageResponse:
-    """Parse SQL and return lineage metadata."""
+async def parse_lineage(
+    payload: LineageRequest,
+    request: Request,
+) -> LineageResponse:
+    """Parse SQL and return lineage metadata.
+
+    With `include_columns`, output columns are also traced back to their
+    source columns, resolving unqualified names against the cached schema
+    of `connection_id` when given. With `track`, the query (and its column
+    lineage, if requested) is added to the server's accumulated lineage
+    graph, once per statement fingerprint.
 
-    extraction = extract_lineage(payload.sql, dialect=payload.dialect)
+    Parsing runs in the lineage worker pool, subject to its size limit
+    (413) and timeout (504).
+    """
+
+    try:
+        lineage_parser.check_size(payload.sql)
+    except SqlTooLargeError as exc:
+        raise HTTPException(status_code=413, detail=str(exc)) from exc
+    schema = None
+    if payload.include_columns and payload.connection_id:
+        manager = get_connection_manager(request)
+        if not manager.get(payload.connection_id):
+            raise HTTPException(status_code=404, detail="Connection not found")
+        schema = await manager.column_schema_for(payload.connection_id)
+    try:
+        extraction, fingerprint, column_lineage = await lineage_parser.run(
+            payload.sql, _analyze, payload.sql, payload.dialect, payload.include_columns, schema
+        )
+    except SqlglotError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except LineageParseTimeout as exc:
+        raise HTTPException(status_code=504, detail=str(exc)) from exc
+    query_id = None
+    if payload.track:
+        graph = get_lineage_graph(request)
+        query_id = graph.add_query(extraction, query_id=f"query:{fingerprint}")
+        if column_lineage is not None:
+            column_lineage = graph.add_column_lineage(query_id, column_lineage)
     return LineageResponse(
         query_type=extraction.query_type,
         tables_read=extraction.tables_read,
         tables_written=extraction.tables_written,
         columns_used=extraction.columns_used,
         ctes=extraction.ctes,
+        fingerprint=fingerprint,
+        column_lineage=column_lineage,
+        query_id=query_id,
     )
+
+
+@router.post("/lineage/script", response_model=ScriptLineageResponse)
+async def parse_script_lineage(payload: ScriptLineageRequest) -> ScriptLineageResponse:
+    """Split a multi-statement script and return per-statement lineage and run order.
+
+    Each statement lists the earlier statements it depends on; statements in
+    the same stage are independent and can run concurrently. Long scripts are
+    parsed across the lineage parser's shared process pool.
+    """
+
+    try:
+        script = await lineage_parser.run(
+            payload.sql,
+            extract_script_lineage,
+            payload.sql,
+            payload.dialect,
+            lineage_parser.script_workers,
+            lineage_parser.script_executor(),
+        )
+    except SqlTooLargeError as exc:
+        raise HTTPException(status_code=413, detail=str(exc)) from exc
+    except SqlglotError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except LineageParseTimeout as exc:
+        raise HTTPException(status_code=504, detail=str(exc)) from exc
+    return ScriptLineageResponse(
+        statements=[
+            ScriptStatementLineage(
+                index=index,
+                sql=lineage.sql,
+                query_type=lineage.query_type,
+                tables_read=lineage.tables_read,
+                tables_written=lineage.tables_written,
+                depends_on=depends_on,
+            )
+            for index, (lineage, depends_on) in enumerate(
+                zip(script.statements, script.dependencies, strict=True)
+            )
+        ],
+        stages=script.stages,
+    )
+
+
+@router.get("/lineage/graph/neighborhood")
+async def lineage_neighborhood(
+    request: Request,
+    node: str,
+    depth: int = 2,
+    direction: str = "both",
+    max_nodes: int = 200,
+    max_edges: int = 500,
+    aggregate_queries: bool = True,
+    max_queries: int | None = None,
+) -> Response:
+    """Return the k-hop neighborhood of a table or column node of the tracked graph.
+
+    `node` is a graph node id such as `table:orders` or `column:orders.id`.
+    Caps are clamped server-side so the client never lays out the full
+    graph. Responses carry a weak ETag derived from the graph version and
+    the query, and `If-None-Match` hits return 304.
+    """
+
+    if direction not in ("upstream", "downstream", "both"):
+        raise HTTPException(
+            status_code=400, detail="direction must be upstream, downstream or both"
+        )
+    depth = min(max(0, depth), MAX_NEIGHBORHOOD_DEPTH)
+    max_nodes = min(max(1, max_nodes), MAX_NEIGHBORHOOD_NODES)
+    max_edges = min(max(1, max_edges), MAX_NEIGHBORHOOD_EDGES)
+    if max_queries is None:
+        max_queries = max_nodes * 10
+    max_queries = min(max(0, max_queries), MAX_NEIGHBORHOOD_QUERIES)
+    graph = get_lineage_graph(request)
+    key = (
+        f"{node}|{depth}|{direction}|{max_nodes}|{max_edges}|{aggregate_queries}|{max_queries}"
+    )
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    etag = f'W/"{graph.version}-{digest}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    try:
+        neighborhood = graph.neighborhood(
+            node, depth, direction, max_nodes, max_edges, aggregate_queries, max_queries
+        )
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail="Lineage node not found") from exc
+    return JSONResponse(neighborhood, headers=headers)
+
+
+@router.get("/lineage/parse-cache")
+async def parse_cache_stats() -> dict[str, Any]:
+    """Report size and hit rate of the shared SQL parse cache."""
+
+    return parse_cache.info()
@@ -0,0 +1,38 @@
+"""LLM usage accounting routes."""
+
+from __future__ import annotations
+
+import time
+from dataclasses import asdict
+from typing import Any
+
+from fastapi import APIRouter, HTTPException
+
+from iopsdata.llm.usage import usage_recorder
+
+router = APIRouter(tags=["usage"])
+
+GROUP_BY_FIELDS = {"provider", "model", "operation", "workspace_id"}
+
+
+@router.get("/usage/summary")
+async def usage_summary(
+    group_by: str = "provider,model",
+    since_minutes: float | None = None,
+) -> dict[str, Any]:
+    """Aggregate recent LLM calls by the given comma-separated fields."""
+
+    fields = tuple(name.strip() for name in group_by.split(",") if name.strip())
+    unknown = set(fields) - GROUP_BY_FIELDS
+    if not fields or unknown:
+        allowed = ", ".join(sorted(GROUP_BY_FIELDS))
+        raise HTTPException(status_code=400, detail=f"group_by must be a subset of: {allowed}")
+    since = time.time() - since_minutes * 60 if since_minutes is not None else None
+    return {"group_by": list(fields), "rows": usage_recorder.summary(fields, since=since)}
+
+
+@router.get("/usage/recent")
+async def usage_recent(limit: int = 100) -> dict[str, Any]:
+    """Return the most recent recorded LLM calls."""
+
+    return {"records": [asdict(record) for record in usage_recorder.recent(max(1, limit))]}
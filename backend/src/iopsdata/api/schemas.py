@@ -13,8 +13,13 @@ class ChatRequest(BaseModel):
 
     connection_id: str
     prompt: str
+    conversation_id: str | None = None
+    workspace_id: str | None = None
     provider: str | None = None
+    fallbacks: list[str] | None = None
+    hedge: bool = False
     auto_execute: bool = False
+    max_repairs: int = Field(default=2, ge=0, le=5)
     dialect: str | None = None
 
 
@@ -34,6 +39,33 @@ class ChatResponse(BaseModel):
     model: str
     tokens: dict[str, int | None]
     results: QueryResultPayload | None = None
+    repairs: int = 0
+    conversation_id: str | None = None
+
+
+class BatchChatRequest(BaseModel):
+    """Request payload for /api/chat/batch."""
+
+    connection_id: str
+    prompts: list[str] = Field(min_length=1, max_length=1000)
+    workspace_id: str | None = None
+    provider: str | None = None
+    auto_execute: bool = False
+    max_repairs: int = Field(default=2, ge=0, le=5)
+    concurrency: int = Field(default=8, ge=1, le=64)
+    dialect: str | None = None
+
+
+class BatchChatItem(BaseModel):
+    """One NDJSON line streamed by /api/chat/batch."""
+
+    index: int
+    prompt: str
+    sql: str | None = None
+    tokens: dict[str, int | None] | None = None
+    results: QueryResultPayload | None = None
+    repairs: int = 0
+    error: str | None = None
 
 
 class ExecuteRequest(BaseModel):
@@ -41,12 +73,16 @@ class ExecuteRequest(BaseModel):
 
     connection_id: str
     sql: str
+    params: list[Any] = Field(default_factory=list)
+    dialect: str | None = None
+    use_cache: bool = True
 
 
 class ExecuteResponse(BaseModel):
     """Response payload for /api/execute."""
 
     results: QueryResultPayload
+    cached: bool = False
 
 
 class ConnectionCreate(BaseModel):
@@ -55,6 +91,7 @@ class ConnectionCreate(BaseModel):
     provider: str
     name: str
     config: dict[str, Any] = Field(default_factory=dict)
+    cache_ttl_s: float | None = Field(None, ge=0)
 
 
 class ConnectionResponse(BaseModel):
@@ -79,6 +116,9 @@ class LineageRequest(BaseModel):
 
     sql: str
     dialect: str | None = None
+    include_columns: bool = False
+    connection_id: str | None = None
+    track: bool = False
 
 
 class LineageResponse(BaseModel):
@@ -89,6 +129,34 @@ class LineageResponse(BaseModel):
     tables_written: list[str]
     columns_used: list[str]
     ctes: list[str]
+    fingerprint: str
+    column_lineage: dict[str, list[str]] | None = None
+    query_id: str | None = None
+
+
+class ScriptLineageRequest(BaseModel):
+    """Request payload for multi-statement script lineage."""
+
+    sql: str
+    dialect: str | None = None
+
+
+class ScriptStatementLineage(BaseModel):
+    """Lineage of one statement in a script and the statements it must follow."""
+
+    index: int
+    sql: str
+    query_type: str
+    tables_read: list[str]
+    tables_written: list[str]
+    depends_on: list[int]
+
+
+class ScriptLineageResponse(BaseModel):
+    """Response payload for script lineage; `stages` lists concurrently runnable statements."""
+
+    statements: list[ScriptStatementLineage]
+    stages: list[list[int]]
 
 
 class UserSettingsResponse(BaseModel):
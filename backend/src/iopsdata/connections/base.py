@@ -3,8 +3,10 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
-from typing import Any
+from typing import Any, Protocol
 
 
 @dataclass
@@ -16,6 +18,14 @@ class QueryResult:
     row_count: int
 
 
+class QuerySession(Protocol):
+    """Something that runs queries: a connection, or one checked out of its pool."""
+
+    async def execute(self, query: str, *args: Any) -> QueryResult: ...
+
+    async def explain(self, query: str) -> QueryResult: ...
+
+
 class DatabaseConnection(ABC):
     """Abstract database connection wrapper."""
 
@@ -43,6 +53,22 @@ class DatabaseConnection(ABC):
     async def execute(self, query: str, *args: Any) -> QueryResult:
         """Execute a query and return normalized results."""
 
+    async def explain(self, query: str) -> QueryResult:
+        """Plan a query without running it, raising if the database rejects it."""
+
+        return await self.execute(f"EXPLAIN {query}")
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[QuerySession]:
+        """Hold one connection with session settings applied for a series of queries.
+
+        Pooled providers check a connection out and apply their timeout and
+        read-only settings once instead of per query. Single-connection
+        providers yield themselves.
+        """
+
+        yield self
+
     @abstractmethod
     async def get_schema(self) -> list[dict[str, Any]]:
         """Extract schema metadata for the database."""
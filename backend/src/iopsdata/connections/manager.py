@@ -2,9 +2,10 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
 import time
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Any
 
 from cryptography.fernet import Fernet
@@ -15,6 +16,13 @@ from iopsdata.connections.providers.mysql import MySQLConnection
 from iopsdata.connections.providers.postgres import PostgresConnection
 from iopsdata.connections.providers.sqlite import SQLiteConnection
 from iopsdata.connections.providers.supabase_db import SupabaseConnection
+from iopsdata.connections.result_cache import QueryResultCache, build_result_cache
+from iopsdata.lineage.columns import ColumnSchema, column_schema
+from iopsdata.llm.context.schema_builder import (
+    SchemaContext,
+    compile_schema_context,
+    schema_fingerprint,
+)
 
 
 @dataclass
@@ -23,16 +31,26 @@ class CachedSchema:
 
     schema: list[dict[str, Any]]
     expires_at: float
+    fingerprint: str = ""
+    contexts: dict[tuple[str, int], SchemaContext] = field(default_factory=dict)
+    columns: ColumnSchema | None = None
 
 
 class ConnectionManager:
     """Store and manage active database connections."""
 
-    def __init__(self, fernet_key: str, schema_ttl_s: int = 900) -> None:
+    def __init__(
+        self,
+        fernet_key: str,
+        schema_ttl_s: int = 900,
+        result_cache: QueryResultCache | None = None,
+    ) -> None:
         self._fernet = Fernet(fernet_key)
         self._connections: dict[str, DatabaseConnection] = {}
         self._schema_cache: dict[str, CachedSchema] = {}
+        self._schema_locks: dict[str, asyncio.Lock] = {}
         self._schema_ttl_s = schema_ttl_s
+        self.result_cache = result_cache or build_result_cache()
 
     def encrypt_credentials(self, credentials: dict[str, Any]) -> str:
         payload = json.dumps(credentials).encode("utf-8")
@@ -43,6 +61,10 @@ class ConnectionManager:
         return json.loads(payload)
 
     def register(self, name: str, connection: DatabaseConnection) -> None:
+        if self._connections.get(name) is not connection:
+            # A different connection under the same name must not inherit its schema.
+            self.invalidate_schema(name)
+            self.result_cache.invalidate_connection(name)
         self._connections[name] = connection
 
     def get(self, name: str) -> DatabaseConnection | None:
@@ -54,6 +76,8 @@ class ConnectionManager:
             await connection.disconnect()
             self._connections.pop(name, None)
             self._schema_cache.pop(name, None)
+            self._schema_locks.pop(name, None)
+            self.result_cache.invalidate_connection(name)
 
     async def health_check(self, name: str) -> bool:
         connection = self._connections.get(name)
@@ -62,17 +86,69 @@ class ConnectionManager:
         return connection.is_connected()
 
     async def schema_for(self, name: str) -> list[dict[str, Any]]:
+        cached = await self._cached_schema(name)
+        return cached.schema
+
+    async def schema_context_for(
+        self,
+        name: str,
+        dialect: str = "postgresql",
+        max_tables: int = 25,
+    ) -> SchemaContext:
+        """Return the rendered schema context, memoized per fingerprint, dialect and budget."""
+
+        cached = await self._cached_schema(name)
+        key = (dialect.lower(), max_tables)
+        context = cached.contexts.get(key)
+        if context is None:
+            context = compile_schema_context(
+                cached.schema,
+                dialect=dialect,
+                max_tables=max_tables,
+                fingerprint=cached.fingerprint,
+            )
+            cached.contexts[key] = context
+        return context
+
+    async def column_schema_for(self, name: str) -> ColumnSchema:
+        """Return the cached schema as a `{table: {column: type}}` mapping for column lineage."""
+
+        cached = await self._cached_schema(name)
+        if cached.columns is None:
+            cached.columns = column_schema(cached.schema)
+        return cached.columns
+
+    def invalidate_schema(self, name: str) -> None:
+        self._schema_cache.pop(name, None)
+
+    async def _cached_schema(self, name: str) -> CachedSchema:
         cached = self._schema_cache.get(name)
         if cached and cached.expires_at > time.time():
-            return cached.schema
-
-        connection = self._connections.get(name)
-        if not connection:
-            raise RuntimeError("Connection not registered")
-
-        schema = await connection.get_schema()
-        self._schema_cache[name] = CachedSchema(schema=schema, expires_at=time.time() + self._schema_ttl_s)
-        return schema
+            return cached
+
+        # Single-flight the refresh so concurrent requests share one extraction.
+        lock = self._schema_locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            cached = self._schema_cache.get(name)
+            if cached and cached.expires_at > time.time():
+                return cached
+
+            connection = self._connections.get(name)
+            if not connection:
+                raise RuntimeError("Connection not registered")
+
+            schema = await connection.get_schema()
+            fingerprint = schema_fingerprint(schema)
+            # An unchanged schema keeps its rendered contexts across TTL refreshes.
+            contexts = cached.contexts if cached and cached.fingerprint == fingerprint else {}
+            refreshed = CachedSchema(
+                schema=schema,
+                expires_at=time.time() + self._schema_ttl_s,
+                fingerprint=fingerprint,
+                contexts=contexts,
+            )
+            self._schema_cache[name] = refreshed
+            return refreshed
 
     def create_connection(self, provider: str, name: str, **kwargs: Any) -> DatabaseConnection:
         provider = provider.lower()
@@ -28,8 +28,8 @@ class DuckDBConnection(DatabaseConnection):
     async def connect(self) -> None:
         if self._conn is not None:
             return
+        # DuckDB has no statement_timeout setting; query_timeout_s is not enforced here.
         self._conn = duckdb.connect(self._path, read_only=self.read_only)
-        self._conn.execute(f"SET statement_timeout={int(self.query_timeout_s * 1000)}")
 
     async def disconnect(self) -> None:
         if self._conn is not None:
@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from typing import Any
 
 try:
@@ -9,7 +11,7 @@ try:
 except ImportError:
     aiomysql = None
 
-from iopsdata.connections.base import DatabaseConnection, QueryResult
+from iopsdata.connections.base import DatabaseConnection, QueryResult, QuerySession
 from iopsdata.connections.schema_extractor import extract_mysql_schema
 
 
@@ -64,26 +66,41 @@ class MySQLConnection(DatabaseConnection):
             "free": self._pool.freesize,
         }
 
-    async def execute(self, query: str, *args: Any) -> QueryResult:
-        if not self._pool:
-            raise RuntimeError("Connection pool not initialized")
+    async def _apply_settings(self, conn: Any) -> None:
+        async with conn.cursor() as cursor:
+            timeout_ms = int(self.query_timeout_s * 1000)
+            await cursor.execute(f"SET SESSION MAX_EXECUTION_TIME={timeout_ms}")
+            if self.read_only:
+                await cursor.execute("SET SESSION TRANSACTION READ ONLY")
+
+    async def _fetch(self, conn: Any, query: str, *args: Any) -> QueryResult:
         if self.read_only and query.strip().lower().startswith(("insert", "update", "delete", "drop", "alter")):
             raise PermissionError("Read-only connection")
-
         try:
-            async with self._pool.acquire() as conn:
-                async with conn.cursor() as cursor:
-                    await cursor.execute(f"SET SESSION MAX_EXECUTION_TIME={int(self.query_timeout_s * 1000)}")
-                    if self.read_only:
-                        await cursor.execute("SET SESSION TRANSACTION READ ONLY")
-                    await cursor.execute(query, args)
-                    rows = await cursor.fetchmany(self.max_rows)
-                    columns = [desc[0] for desc in cursor.description or []]
+            async with conn.cursor() as cursor:
+                await cursor.execute(query, args)
+                rows = await cursor.fetchmany(self.max_rows)
+                columns = [desc[0] for desc in cursor.description or []]
         except Exception as exc:  # pragma: no cover - defensive wrapper
             raise RuntimeError(f"MySQL query failed: {exc}") from exc
 
         return QueryResult(columns=columns, rows=[tuple(row) for row in rows], row_count=len(rows))
 
+    async def execute(self, query: str, *args: Any) -> QueryResult:
+        async with self.session() as session:
+            return await session.execute(query, *args)
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[QuerySession]:
+        if not self._pool:
+            raise RuntimeError("Connection pool not initialized")
+        async with self._pool.acquire() as conn:
+            try:
+                await self._apply_settings(conn)
+            except Exception as exc:  # pragma: no cover - defensive wrapper
+                raise RuntimeError(f"MySQL query failed: {exc}") from exc
+            yield _MySQLSession(self, conn)
+
     async def get_schema(self) -> list[dict[str, Any]]:
         if not self._pool:
             raise RuntimeError("Connection pool not initialized")
@@ -95,3 +112,17 @@ class MySQLConnection(DatabaseConnection):
                     return await extract_mysql_schema(cursor, self.max_rows)
         except Exception as exc:  # pragma: no cover - defensive wrapper
             raise RuntimeError(f"MySQL schema extraction failed: {exc}") from exc
+
+
+class _MySQLSession:
+    """A pooled connection checked out with session settings already applied."""
+
+    def __init__(self, owner: MySQLConnection, conn: Any) -> None:
+        self._owner = owner
+        self._conn = conn
+
+    async def execute(self, query: str, *args: Any) -> QueryResult:
+        return await self._owner._fetch(self._conn, query, *args)
+
+    async def explain(self, query: str) -> QueryResult:
+        return await self.execute(f"EXPLAIN {query}")
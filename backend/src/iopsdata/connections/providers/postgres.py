@@ -2,11 +2,13 @@
 
 from __future__ import annotations
 
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from typing import Any
 
 import asyncpg
 
-from iopsdata.connections.base import DatabaseConnection, QueryResult
+from iopsdata.connections.base import DatabaseConnection, QueryResult, QuerySession
 from iopsdata.connections.schema_extractor import extract_postgres_schema
 
 
@@ -47,18 +49,17 @@ class PostgresConnection(DatabaseConnection):
             "free": self._pool.get_idle_size(),
         }
 
-    async def execute(self, query: str, *args: Any) -> QueryResult:
-        if not self._pool:
-            raise RuntimeError("Connection pool not initialized")
+    async def _apply_settings(self, conn: asyncpg.Connection) -> None:
+        # SET does not accept bind parameters; the timeout is an int we format ourselves.
+        await conn.execute(f"SET statement_timeout = {int(self.query_timeout_s * 1000)}")
+        if self.read_only:
+            await conn.execute("SET SESSION CHARACTERISTICS AS TRANSACTION READ ONLY")
+
+    async def _fetch(self, conn: asyncpg.Connection, query: str, *args: Any) -> QueryResult:
         if self.read_only and query.strip().lower().startswith(("insert", "update", "delete", "drop", "alter")):
             raise PermissionError("Read-only connection")
-
         try:
-            async with self._pool.acquire() as conn:
-                await conn.execute("SET statement_timeout TO $1", int(self.query_timeout_s * 1000))
-                if self.read_only:
-                    await conn.execute("SET SESSION CHARACTERISTICS AS TRANSACTION READ ONLY")
-                records = await conn.fetch(query, *args)
+            records = await conn.fetch(query, *args)
         except Exception as exc:  # pragma: no cover - defensive wrapper
             raise RuntimeError(f"PostgreSQL query failed: {exc}") from exc
 
@@ -66,6 +67,21 @@ class PostgresConnection(DatabaseConnection):
         columns = list(records[0].keys()) if records else []
         return QueryResult(columns=columns, rows=rows, row_count=len(rows))
 
+    async def execute(self, query: str, *args: Any) -> QueryResult:
+        async with self.session() as session:
+            return await session.execute(query, *args)
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[QuerySession]:
+        if not self._pool:
+            raise RuntimeError("Connection pool not initialized")
+        async with self._pool.acquire() as conn:
+            try:
+                await self._apply_settings(conn)
+            except Exception as exc:  # pragma: no cover - defensive wrapper
+                raise RuntimeError(f"PostgreSQL query failed: {exc}") from exc
+            yield _PostgresSession(self, conn)
+
     async def get_schema(self) -> list[dict[str, Any]]:
         if not self._pool:
             raise RuntimeError("Connection pool not initialized")
@@ -74,3 +90,17 @@ class PostgresConnection(DatabaseConnection):
                 return await extract_postgres_schema(conn, self.max_rows)
         except Exception as exc:  # pragma: no cover - defensive wrapper
             raise RuntimeError(f"PostgreSQL schema extraction failed: {exc}") from exc
+
+
+class _PostgresSession:
+    """A pooled connection checked out with session settings already applied."""
+
+    def __init__(self, owner: PostgresConnection, conn: asyncpg.Connection) -> None:
+        self._owner = owner
+        self._conn = conn
+
+    async def execute(self, query: str, *args: Any) -> QueryResult:
+        return await self._owner._fetch(self._conn, query, *args)
+
+    async def explain(self, query: str) -> QueryResult:
+        return await self.execute(f"EXPLAIN {query}")
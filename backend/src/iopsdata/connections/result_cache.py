@@ -0,0 +1,317 @@
+"""Query result cache with per-connection TTL and table-level invalidation."""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from collections import OrderedDict
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass, field
+from typing import Any
+
+from sqlglot import expressions as exp
+from sqlglot.errors import SqlglotError
+
+from iopsdata.connections.base import QueryResult, QuerySession
+from iopsdata.lineage.parse_cache import parse_sql
+from iopsdata.lineage.parser import extract_lineage
+from iopsdata.llm.context.sql_validator import sqlglot_dialect
+
+# Statement types whose results depend only on the tables they read.
+CACHEABLE_QUERY_TYPES = {"SELECT", "UNION", "INTERSECT", "EXCEPT"}
+
+# Nodes that write a table, wherever they appear in the tree.
+WRITE_NODES = (exp.Insert, exp.Update, exp.Delete, exp.Merge, exp.Into)
+
+# Functions with side effects, so a SELECT calling them is not a pure read.
+VOLATILE_FUNCTIONS = frozenset(
+    {
+        "setval",
+        "nextval",
+        "set_config",
+        "pg_advisory_lock",
+        "pg_advisory_xact_lock",
+        "pg_advisory_unlock",
+        "pg_notify",
+        "pg_sleep",
+        "get_lock",
+        "release_lock",
+        "sleep",
+    }
+)
+
+CacheKey = tuple[str, str, str]
+
+
+@dataclass
+class CachedResult:
+    """Cached query result and the tables it was computed from."""
+
+    result: QueryResult
+    expires_at: float
+    tables: frozenset[str]
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+
+@dataclass(frozen=True)
+class QueryPlan:
+    """How a statement interacts with the cache."""
+
+    key: CacheKey
+    cacheable: bool
+    parsed: bool = True
+    tables_read: frozenset[str] = field(default_factory=frozenset)
+    tables_written: frozenset[str] = field(default_factory=frozenset)
+
+
+def _table_key(name: str) -> str:
+    # Match on the bare table name so `public.orders` and `orders` invalidate each other.
+    return name.rsplit(".", 1)[-1].lower()
+
+
+def _function_name(func: exp.Func) -> str:
+    return (func.name if isinstance(func, exp.Anonymous) else func.sql_name()).lower()
+
+
+def _side_effects(sql: str, dialect: str | None) -> tuple[frozenset[str], bool]:
+    """Return the tables written anywhere in a statement and whether it has side effects.
+
+    Catches what top-level lineage misses: data-modifying CTEs,
+    `SELECT ... INTO`, `FOR UPDATE` and calls such as `setval()`.
+    """
+
+    parsed = parse_sql(sql, sqlglot_dialect(dialect), copy=False)
+    written: set[str] = set()
+    writes = False
+    for node in parsed.find_all(*WRITE_NODES):
+        writes = True
+        target = node.this
+        table = target if isinstance(target, exp.Table) else None
+        if table is None and isinstance(target, exp.Expression):
+            table = target.find(exp.Table)
+        if table is not None and table.name:
+            written.add(_table_key(table.name))
+    volatile = any(
+        _function_name(func) in VOLATILE_FUNCTIONS for func in parsed.find_all(exp.Func)
+    )
+    return frozenset(written), writes or volatile or parsed.find(exp.Lock) is not None
+
+
+def canonical_sql(sql: str, dialect: str | None = None) -> str:
+    """Render SQL in sqlglot's canonical form, falling back to collapsed whitespace."""
+
+    read = sqlglot_dialect(dialect)
+    try:
+        return parse_sql(sql, read, copy=False).sql(dialect=read, normalize=True)
+    except SqlglotError:
+        return " ".join(sql.split())
+
+
+class QueryResultCache:
+    """Size-bounded LRU cache of query results.
+
+    Entries are keyed by connection, canonical SQL and parameters and expire
+    after the connection's TTL. Each entry is indexed by the tables its query
+    reads, so a statement that writes a table evicts only the results that
+    depend on it.
+    """
+
+    def __init__(self, max_entries: int = 1000, default_ttl_s: float = 300.0) -> None:
+        self._max_entries = max_entries
+        self._default_ttl_s = default_ttl_s
+        self._ttls: dict[str, float] = {}
+        self._entries: OrderedDict[CacheKey, CachedResult] = OrderedDict()
+        self._by_table: dict[tuple[str, str], set[CacheKey]] = {}
+        # Bumped on every invalidation so in-flight reads do not cache stale results.
+        self._generations: dict[str, int] = {}
+        self.stats = CacheStats()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def set_ttl(self, connection_id: str, ttl_s: float | None) -> None:
+        """Override the TTL for one connection (`None` restores the default, 0 disables)."""
+
+        if ttl_s is None:
+            self._ttls.pop(connection_id, None)
+        else:
+            self._ttls[connection_id] = ttl_s
+
+    def ttl_for(self, connection_id: str) -> float:
+        return self._ttls.get(connection_id, self._default_ttl_s)
+
+    def plan(
+        self,
+        connection_id: str,
+        sql: str,
+        params: Sequence[Any] = (),
+        dialect: str | None = None,
+    ) -> QueryPlan:
+        key = (connection_id, canonical_sql(sql, dialect), json.dumps(list(params), default=str))
+        try:
+            lineage = extract_lineage(sql, dialect=sqlglot_dialect(dialect))
+            nested_writes, side_effects = _side_effects(sql, dialect)
+        except SqlglotError:
+            return QueryPlan(key=key, cacheable=False, parsed=False)
+        written = nested_writes | {_table_key(table) for table in lineage.tables_written}
+        return QueryPlan(
+            key=key,
+            cacheable=(
+                not written
+                and not side_effects
+                and lineage.query_type in CACHEABLE_QUERY_TYPES
+            ),
+            tables_read=frozenset(_table_key(table) for table in lineage.tables_read),
+            tables_written=written,
+        )
+
+    def get(self, key: CacheKey) -> QueryResult | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.stats.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return entry.result
+
+    def put(self, key: CacheKey, result: QueryResult, tables: Iterable[str]) -> None:
+        connection_id = key[0]
+        ttl_s = self.ttl_for(connection_id)
+        if ttl_s <= 0:
+            return
+        if key in self._entries:
+            self._remove(key)
+        entry = CachedResult(result, time.monotonic() + ttl_s, frozenset(tables))
+        self._entries[key] = entry
+        for table in entry.tables:
+            self._by_table.setdefault((connection_id, table), set()).add(key)
+        while len(self._entries) > self._max_entries:
+            self._remove(next(iter(self._entries)))
+            self.stats.evictions += 1
+
+    def invalidate_tables(self, connection_id: str, tables: Iterable[str]) -> int:
+        """Drop cached results on `connection_id` that read any of `tables`."""
+
+        self._generations[connection_id] = self._generations.get(connection_id, 0) + 1
+        removed = 0
+        for table in {_table_key(table) for table in tables}:
+            for key in self._by_table.pop((connection_id, table), set()):
+                if key in self._entries:
+                    self._remove(key)
+                    removed += 1
+        self.stats.invalidations += removed
+        return removed
+
+    def invalidate_connection(self, connection_id: str) -> None:
+        self._generations[connection_id] = self._generations.get(connection_id, 0) + 1
+        for key in [key for key in self._entries if key[0] == connection_id]:
+            self._remove(key)
+
+    async def execute(
+        self,
+        connection_id: str,
+        connection: QuerySession,
+        sql: str,
+        params: Sequence[Any] = (),
+        dialect: str | None = None,
+        use_cache: bool = True,
+    ) -> tuple[QueryResult, bool]:
+        """Run SQL through the cache, returning the result and whether it was a cache hit.
+
+        Reads are served from and stored in the cache (`use_cache=False` skips
+        the lookup but still refreshes the entry); writes bypass it and
+        invalidate every cached result that read a written table.
+        """
+
+        plan = self.plan(connection_id, sql, params, dialect)
+        if plan.cacheable and use_cache:
+            cached = self.get(plan.key)
+            if cached is not None:
+                return cached, True
+        generation = self._generations.get(connection_id, 0)
+        result = await connection.execute(sql, *params)
+        if not plan.cacheable:
+            self.invalidate_for(plan)
+        elif self._generations.get(connection_id, 0) == generation:
+            self.put(plan.key, result, plan.tables_read)
+        return result, False
+
+    def invalidate_for(self, plan: QueryPlan) -> None:
+        """Invalidate what an executed, non-cacheable statement may have changed.
+
+        Statements whose written tables are unknown (unparsed SQL, procedure
+        calls, `COPY`, data-modifying CTEs, volatile functions) may have
+        written anything, so they flush the whole connection.
+        """
+
+        connection_id = plan.key[0]
+        if plan.tables_written:
+            self.invalidate_tables(connection_id, plan.tables_written)
+        elif not plan.cacheable:
+            self.invalidate_connection(connection_id)
+
+    def session(
+        self, connection_id: str, session: QuerySession, dialect: str | None = None
+    ) -> CachedSession:
+        """Wrap `session` so statements it runs go through this cache."""
+
+        return CachedSession(self, connection_id, session, dialect)
+
+    def _remove(self, key: CacheKey) -> None:
+        entry = self._entries.pop(key)
+        for table in entry.tables:
+            keys = self._by_table.get((key[0], table))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[(key[0], table)]
+
+
+class CachedSession:
+    """Query session whose statements are served from, and invalidate, a result cache.
+
+    Lets code that only knows about `QuerySession` (such as the chat repair
+    loop) execute generated SQL without bypassing cache invalidation.
+    """
+
+    def __init__(
+        self,
+        cache: QueryResultCache,
+        connection_id: str,
+        session: QuerySession,
+        dialect: str | None = None,
+    ) -> None:
+        self._cache = cache
+        self._connection_id = connection_id
+        self._session = session
+        self._dialect = dialect
+
+    async def execute(self, query: str, *args: Any) -> QueryResult:
+        result, _ = await self._cache.execute(
+            self._connection_id, self._session, query, args, dialect=self._dialect
+        )
+        return result
+
+    async def explain(self, query: str) -> QueryResult:
+        return await self._session.explain(query)
+
+
+def build_result_cache() -> QueryResultCache:
+    """Build a result cache sized by `QUERY_CACHE_MAX_ENTRIES` and `QUERY_CACHE_TTL_S`."""
+
+    return QueryResultCache(
+        max_entries=int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "1000")),
+        default_ttl_s=float(os.getenv("QUERY_CACHE_TTL_S", "300")),
+    )
@@ -1,5 +1,6 @@
 """Database layer for Supabase integration."""
 
+from .batching import BatchStats, BatchWriter
 from .models import (
     Connection,
     Conversation,
@@ -10,9 +11,16 @@ from .models import (
     Workspace,
     WorkspaceMember,
 )
-from .supabase import SupabaseClientWrapper, build_supabase_config, get_supabase_client
+from .supabase import (
+    SupabaseClientWrapper,
+    build_supabase_config,
+    close_supabase_client,
+    get_supabase_client,
+)
 
 __all__ = [
+    "BatchStats",
+    "BatchWriter",
     "Connection",
     "Conversation",
     "Message",
@@ -23,5 +31,6 @@ __all__ = [
     "WorkspaceMember",
     "SupabaseClientWrapper",
     "build_supabase_config",
+    "close_supabase_client",
     "get_supabase_client",
 ]
@@ -0,0 +1,159 @@
+"""Write-behind batching for row inserts."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+BatchWrite = Callable[[list[dict[str, Any]]], Awaitable[None]]
+
+_FLUSH = object()
+
+
+@dataclass
+class BatchStats:
+    queued: int = 0
+    written: int = 0
+    batches: int = 0
+    retries: int = 0
+    dropped: int = 0
+    failed: int = 0
+
+
+class BatchWriter:
+    """Buffer rows and hand them to `write` in batches from a background task.
+
+    A batch is written once `max_batch` rows are queued or `flush_interval_s`
+    has passed since its first row, whichever comes first. Failed writes are
+    retried `max_retries` times with exponential backoff starting at
+    `backoff_s`; rows of a batch that still fails are logged and counted as
+    failed. At most `max_queue` rows wait in memory: with the `block` policy
+    `put` waits for room, with `drop` it discards the new row and returns
+    False. Call `flush()` to wait for everything queued so far to be written
+    and `close()` on shutdown.
+    """
+
+    def __init__(
+        self,
+        write: BatchWrite,
+        name: str = "batch",
+        max_batch: int = 100,
+        flush_interval_s: float = 1.0,
+        max_queue: int = 10_000,
+        policy: str = "block",
+        max_retries: int = 3,
+        backoff_s: float = 0.5,
+    ) -> None:
+        if policy not in ("block", "drop"):
+            raise ValueError("policy must be 'block' or 'drop'")
+        self.name = name
+        self._write = write
+        self._max_batch = max(1, max_batch)
+        self._flush_interval_s = flush_interval_s
+        self._max_queue = max_queue
+        self._policy = policy
+        self._max_retries = max_retries
+        self._backoff_s = backoff_s
+        self._queue: asyncio.Queue[Any] | None = None
+        self._worker: asyncio.Task[None] | None = None
+        self.stats = BatchStats()
+
+    def _ensure_worker(self) -> asyncio.Queue[Any]:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self._max_queue)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+        return self._queue
+
+    async def put(self, row: dict[str, Any]) -> bool:
+        """Queue one row; returns False if it was dropped because the queue is full."""
+
+        queue = self._ensure_worker()
+        if self._policy == "drop":
+            try:
+                queue.put_nowait(row)
+            except asyncio.QueueFull:
+                self.stats.dropped += 1
+                return False
+        else:
+            await queue.put(row)
+        self.stats.queued += 1
+        return True
+
+    async def flush(self) -> None:
+        """Write every row queued before this call."""
+
+        if self._queue is None:
+            return
+        queue = self._ensure_worker()
+        # The marker wakes a worker waiting out the flush interval.
+        await queue.put(_FLUSH)
+        await queue.join()
+
+    async def close(self) -> None:
+        """Flush pending rows and stop the background task."""
+
+        await self.flush()
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+
+    async def _run(self) -> None:
+        assert self._queue is not None
+        queue = self._queue
+        loop = asyncio.get_running_loop()
+        while True:
+            first = await queue.get()
+            batch: list[dict[str, Any]] = []
+            markers = 0
+            if first is _FLUSH:
+                markers += 1
+            else:
+                batch.append(first)
+                deadline = loop.time() + self._flush_interval_s
+                while len(batch) < self._max_batch:
+                    timeout = deadline - loop.time()
+                    try:
+                        if timeout <= 0:
+                            item = queue.get_nowait()
+                        else:
+                            item = await asyncio.wait_for(queue.get(), timeout)
+                    except (asyncio.QueueEmpty, TimeoutError):
+                        break
+                    if item is _FLUSH:
+                        markers += 1
+                        break
+                    batch.append(item)
+            try:
+                if batch:
+                    await self._write_batch(batch)
+            finally:
+                for _ in range(len(batch) + markers):
+                    queue.task_done()
+
+    async def _write_batch(self, batch: list[dict[str, Any]]) -> None:
+        for attempt in range(self._max_retries + 1):
+            try:
+                await self._write(batch)
+            except Exception:
+                if attempt == self._max_retries:
+                    self.stats.failed += len(batch)
+                    logger.exception(
+                        "Writing %d %s rows failed after %d attempts",
+                        len(batch),
+                        self.name,
+                        attempt + 1,
+                    )
+                    return
+                self.stats.retries += 1
+                await asyncio.sleep(self._backoff_s * 2**attempt)
+            else:
+                self.stats.written += len(batch)
+                self.stats.batches += 1
+                return
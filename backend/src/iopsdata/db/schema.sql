@@ -88,6 +88,42 @@ create table if not exists public.query_history (
     updated_at timestamptz not null default now()
 );
 
+-- LLM usage records token counts, latency and estimated cost per provider call.
+create table if not exists public.llm_usage (
+    id uuid primary key default gen_random_uuid(),
+    workspace_id uuid references public.workspaces (id) on delete cascade,
+    provider text not null,
+    model text not null,
+    operation text not null,
+    prompt_tokens integer,
+    completion_tokens integer,
+    total_tokens integer,
+    cached_tokens integer,
+    latency_ms double precision,
+    cost_usd numeric(12, 6),
+    success boolean not null default true,
+    created_at timestamptz not null default now()
+);
+
+-- Lineage events record the lineage of each SQL statement tracked in a session.
+-- `tables` lists every table the statement reads or writes for filtered history reads.
+create table if not exists public.lineage_events (
+    id uuid primary key default gen_random_uuid(),
+    session_id text not null,
+    created_at timestamptz not null default now(),
+    query jsonb not null,
+    dependencies jsonb not null default '[]'::jsonb,
+    metadata jsonb not null default '{}'::jsonb,
+    tables text[] not null default '{}'
+);
+
+-- Lineage snapshots hold each session's table-to-last-writer index for resuming trackers.
+create table if not exists public.lineage_snapshots (
+    session_id text primary key,
+    snapshot jsonb not null,
+    updated_at timestamptz not null default now()
+);
+
 -- User settings store per-user preferences and defaults for the app.
 create table if not exists public.user_settings (
     id uuid primary key default gen_random_uuid(),
@@ -111,6 +147,10 @@ create index if not exists idx_uploaded_files_uploaded_by on public.uploaded_fil
 create index if not exists idx_query_history_workspace_id on public.query_history (workspace_id);
 create index if not exists idx_query_history_connection_id on public.query_history (connection_id);
 create index if not exists idx_query_history_user_id on public.query_history (user_id);
+create index if not exists idx_llm_usage_workspace_created on public.llm_usage (workspace_id, created_at);
+create index if not exists idx_lineage_events_session_page
+    on public.lineage_events (session_id, created_at desc, id desc);
+create index if not exists idx_lineage_events_tables on public.lineage_events using gin (tables);
 create index if not exists idx_user_settings_user_id on public.user_settings (user_id);
 
 comment on table public.workspaces is 'Top-level tenant container for all data and users in iOpsData.';
@@ -120,6 +160,9 @@ comment on table public.conversations is 'Chat sessions within a workspace for a
 comment on table public.messages is 'Chat messages plus optional generated SQL for lineage.';
 comment on table public.uploaded_files is 'User-uploaded datasets or artifacts stored in object storage.';
 comment on table public.query_history is 'Executed SQL statements with metadata for auditing and lineage.';
+comment on table public.llm_usage is 'Per-call LLM token usage, latency and estimated cost for accounting.';
+comment on table public.lineage_events is 'Per-statement SQL lineage tracked within a session.';
+comment on table public.lineage_snapshots is 'Latest dependency-index snapshot per lineage session.';
 comment on table public.user_settings is 'Per-user settings and defaults for the iOpsData app.';
 
 create or replace function public.set_updated_at()
@@ -179,6 +222,7 @@ alter table public.conversations enable row level security;
 alter table public.messages enable row level security;
 alter table public.uploaded_files enable row level security;
 alter table public.query_history enable row level security;
+alter table public.llm_usage enable row level security;
 alter table public.user_settings enable row level security;
 
 create policy workspaces_select on public.workspaces
@@ -362,6 +406,28 @@ with check (
     )
 );
 
+create policy llm_usage_select on public.llm_usage
+for select
+using (
+    exists (
+        select 1
+        from public.workspace_members
+        where workspace_members.workspace_id = llm_usage.workspace_id
+          and workspace_members.user_id = auth.uid()
+    )
+);
+
+create policy llm_usage_insert on public.llm_usage
+for insert
+with check (
+    exists (
+        select 1
+        from public.workspace_members
+        where workspace_members.workspace_id = llm_usage.workspace_id
+          and workspace_members.user_id = auth.uid()
+    )
+);
+
 create policy user_settings_access on public.user_settings
 for all
 using (user_id = auth.uid())
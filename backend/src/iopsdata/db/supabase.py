@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import asyncio
 import os
 from dataclasses import dataclass
 from typing import Any
@@ -9,6 +10,8 @@ from typing import Any
 import httpx
 from supabase import AsyncClient, create_async_client
 
+from iopsdata.db.batching import BatchWriter
+
 
 @dataclass
 class SupabaseConfig:
@@ -19,6 +22,10 @@ class SupabaseConfig:
     max_connections: int = 50
     max_keepalive_connections: int = 10
     timeout_seconds: int = 30
+    batch_size: int = 100
+    batch_interval_s: float = 1.0
+    batch_max_queue: int = 10_000
+    batch_policy: str = "block"
 
 
 class SupabaseClientWrapper:
@@ -28,13 +35,18 @@ class SupabaseClientWrapper:
         self._config = config
         self._client: AsyncClient | None = None
         self._http_client: httpx.AsyncClient | None = None
+        self._writers: dict[str, BatchWriter] = {}
+        self._init_lock = asyncio.Lock()
 
     async def init(self) -> AsyncClient:
         """Initialize the async Supabase client with connection pooling."""
 
-        if self._client is not None:
-            return self._client
+        async with self._init_lock:
+            if self._client is None:
+                self._client = await self._create_client()
+        return self._client
 
+    async def _create_client(self) -> AsyncClient:
         limits = httpx.Limits(
             max_connections=self._config.max_connections,
             max_keepalive_connections=self._config.max_keepalive_connections,
@@ -43,16 +55,17 @@ class SupabaseClientWrapper:
             timeout=self._config.timeout_seconds,
             limits=limits,
         )
-        self._client = await create_async_client(
+        return await create_async_client(
             self._config.url,
             self._config.anon_key,
             httpx_client=self._http_client,
         )
-        return self._client
 
     async def close(self) -> None:
-        """Close the underlying HTTP client."""
+        """Flush batched inserts and close the underlying HTTP client."""
 
+        for writer in self._writers.values():
+            await writer.close()
         if self._http_client is not None:
             await self._http_client.aclose()
         self._client = None
@@ -81,23 +94,56 @@ class SupabaseClientWrapper:
         response = await client.table("connections").select("*").eq("workspace_id", workspace_id).execute()
         return list(response.data or [])
 
-    async def insert_message(self, payload: dict[str, Any]) -> dict[str, Any]:
-        """Insert a message row and return the inserted record."""
+    async def insert_rows(self, table: str, rows: list[dict[str, Any]]) -> None:
+        """Insert rows into `table` with a single bulk request."""
 
+        if not rows:
+            return
         client = await self._get_client()
-        response = await client.table("messages").insert(payload).execute()
-        if not response.data:
-            raise RuntimeError("Failed to insert message")
-        return response.data[0]
+        response = await client.table(table).insert(rows).execute()
+        if response.data is None:
+            raise RuntimeError(f"Failed to insert into {table}")
 
-    async def log_query_history(self, payload: dict[str, Any]) -> dict[str, Any]:
-        """Insert a query history entry and return the inserted record."""
+    def batch_writer(self, table: str) -> BatchWriter:
+        """Return the write-behind buffer that bulk-inserts rows into `table`."""
 
-        client = await self._get_client()
-        response = await client.table("query_history").insert(payload).execute()
-        if not response.data:
-            raise RuntimeError("Failed to insert query history")
-        return response.data[0]
+        writer = self._writers.get(table)
+        if writer is None:
+
+            async def write(rows: list[dict[str, Any]]) -> None:
+                await self.insert_rows(table, rows)
+
+            writer = self._writers[table] = BatchWriter(
+                write,
+                name=table,
+                max_batch=self._config.batch_size,
+                flush_interval_s=self._config.batch_interval_s,
+                max_queue=self._config.batch_max_queue,
+                policy=self._config.batch_policy,
+            )
+        return writer
+
+    async def flush(self) -> None:
+        """Wait until all batched inserts queued so far are written."""
+
+        for writer in list(self._writers.values()):
+            await writer.flush()
+
+    async def insert_message(self, payload: dict[str, Any]) -> bool:
+        """Queue a message row for a batched insert; False if the buffer dropped it."""
+
+        return await self.batch_writer("messages").put(payload)
+
+    async def log_query_history(self, payload: dict[str, Any]) -> bool:
+        """Queue a query history row for a batched insert; False if the buffer dropped it."""
+
+        return await self.batch_writer("query_history").put(payload)
+
+    async def insert_llm_usage(self, rows: list[dict[str, Any]]) -> int:
+        """Queue LLM usage rows for batched inserts; returns how many the buffer accepted."""
+
+        writer = self.batch_writer("llm_usage")
+        return sum([await writer.put(row) for row in rows])
 
     async def upsert_user_settings(self, payload: dict[str, Any]) -> dict[str, Any]:
         """Upsert user settings by user_id."""
@@ -113,13 +159,19 @@ class SupabaseClientWrapper:
         return response.data[0]
 
 
-def build_supabase_config() -> SupabaseConfig:
-    """Build Supabase configuration from environment variables."""
+def build_supabase_config(service_role: bool = False) -> SupabaseConfig:
+    """Build Supabase configuration from environment variables.
+
+    With `service_role`, the client authenticates with
+    `SUPABASE_SERVICE_ROLE_KEY`, which bypasses row level security; use it
+    only for server-side writes that have no end-user session.
+    """
 
     url = os.getenv("SUPABASE_URL")
-    anon_key = os.getenv("SUPABASE_ANON_KEY")
+    key_name = "SUPABASE_SERVICE_ROLE_KEY" if service_role else "SUPABASE_ANON_KEY"
+    anon_key = os.getenv(key_name)
     if not url or not anon_key:
-        raise RuntimeError("SUPABASE_URL and SUPABASE_ANON_KEY must be set")
+        raise RuntimeError(f"SUPABASE_URL and {key_name} must be set")
 
     return SupabaseConfig(
         url=url,
@@ -127,12 +179,35 @@ def build_supabase_config() -> SupabaseConfig:
         max_connections=int(os.getenv("SUPABASE_MAX_CONNECTIONS", "50")),
         max_keepalive_connections=int(os.getenv("SUPABASE_MAX_KEEPALIVE", "10")),
         timeout_seconds=int(os.getenv("SUPABASE_TIMEOUT", "30")),
+        batch_size=int(os.getenv("SUPABASE_BATCH_SIZE", "100")),
+        batch_interval_s=float(os.getenv("SUPABASE_BATCH_INTERVAL_S", "1.0")),
+        batch_max_queue=int(os.getenv("SUPABASE_BATCH_MAX_QUEUE", "10000")),
+        batch_policy=os.getenv("SUPABASE_BATCH_POLICY", "block"),
     )
 
 
+_shared_client: SupabaseClientWrapper | None = None
+
+
 async def get_supabase_client() -> SupabaseClientWrapper:
-    """Convenience helper to build and initialize the Supabase client wrapper."""
+    """Return the process-wide Supabase client wrapper, initializing it on first use.
+
+    Sharing one wrapper keeps one HTTP connection pool and one set of
+    write-behind buffers per process; `close_supabase_client()` flushes and
+    closes it on shutdown.
+    """
+
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = SupabaseClientWrapper(build_supabase_config())
+    await _shared_client.init()
+    return _shared_client
+
+
+async def close_supabase_client() -> None:
+    """Flush pending batched inserts and close the process-wide client, if one was created."""
 
-    wrapper = SupabaseClientWrapper(build_supabase_config())
-    await wrapper.init()
-    return wrapper
+    global _shared_client
+    wrapper, _shared_client = _shared_client, None
+    if wrapper is not None:
+        await wrapper.close()
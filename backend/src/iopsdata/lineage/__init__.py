@@ -1,19 +1,43 @@
 """SQL lineage tracking exports."""
 
-from iopsdata.lineage.graph import LineageEdge, LineageGraph, LineageNode
-from iopsdata.lineage.models import LineageQuery, LineageRecord
-from iopsdata.lineage.parser import LineageExtraction, extract_lineage, extract_dependencies
+from iopsdata.lineage.columns import column_schema, extract_column_lineage
+from iopsdata.lineage.graph import LineageCycleError, LineageEdge, LineageGraph, LineageNode
+from iopsdata.lineage.models import LineagePage, LineageQuery, LineageRecord
+from iopsdata.lineage.offload import (
+    LineageParser,
+    LineageParseTimeout,
+    SqlTooLargeError,
+    lineage_parser,
+)
+from iopsdata.lineage.parse_cache import ParseCache, fingerprint_sql, parse_cache, parse_sql
+from iopsdata.lineage.parser import LineageExtraction, extract_dependencies, extract_lineage
+from iopsdata.lineage.script import ScriptLineage, extract_script_lineage, split_statements
 from iopsdata.lineage.tracker import InMemoryLineageStore, LineageTracker, SupabaseLineageStore
 
 __all__ = [
+    "LineageCycleError",
     "LineageEdge",
     "LineageGraph",
     "LineageNode",
+    "LineagePage",
     "LineageQuery",
     "LineageRecord",
     "LineageExtraction",
+    "LineageParser",
+    "LineageParseTimeout",
+    "SqlTooLargeError",
+    "lineage_parser",
+    "ParseCache",
+    "parse_cache",
+    "parse_sql",
+    "fingerprint_sql",
     "extract_lineage",
+    "extract_column_lineage",
+    "column_schema",
     "extract_dependencies",
+    "ScriptLineage",
+    "extract_script_lineage",
+    "split_statements",
     "LineageTracker",
     "InMemoryLineageStore",
     "SupabaseLineageStore",
@@ -0,0 +1,252 @@
+"""Bulk lineage extraction for backfilling lineage from query logs.
+
+Statements are streamed from a file or the `query_history` table, deduped
+by a literal-insensitive text fingerprint, parsed in chunks across a
+process pool and merged into one LineageGraph:
+
+    python -m iopsdata.lineage.backfill --file queries.jsonl --workers 8 --output graph.json
+    python -m iopsdata.lineage.backfill --table query_history --dialect postgres
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from sqlglot.errors import SqlglotError
+
+from iopsdata.lineage.graph import LineageGraph
+from iopsdata.lineage.parser import LineageExtraction, extract_lineage
+
+# Quoted strings and standalone numbers; identifiers such as `t1` are left alone.
+_LITERALS = re.compile(r"'(?:[^']|'')*'|(?<![\w.])\d+(?:\.\d+)?(?![\w.])")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_key(sql: str) -> str:
+    """Cheap pre-parse fingerprint: literals masked and whitespace collapsed.
+
+    Table and column lineage do not depend on literal values, so statements
+    that differ only in literals are parsed once.
+    """
+
+    masked = _WHITESPACE.sub(" ", _LITERALS.sub("?", sql)).strip().rstrip(";").strip()
+    return hashlib.sha1(masked.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class BackfillReport:
+    """Outcome of a backfill run."""
+
+    graph: LineageGraph
+    statements: int = 0
+    unique: int = 0
+    failed: int = 0
+    elapsed_s: float = 0.0
+    errors: list[str] = field(default_factory=list)
+
+    @property
+    def statements_per_s(self) -> float:
+        return self.statements / self.elapsed_s if self.elapsed_s else 0.0
+
+    def summary(self) -> dict[str, float | int]:
+        return {
+            "statements": self.statements,
+            "unique": self.unique,
+            "failed": self.failed,
+            "nodes": len(self.graph),
+            "edges": self.graph.edge_count,
+            "elapsed_s": round(self.elapsed_s, 3),
+            "statements_per_s": round(self.statements_per_s, 1),
+        }
+
+
+def _extract_chunk(
+    chunk: list[tuple[str, str]], dialect: str | None
+) -> list[tuple[str, LineageExtraction | None, str | None]]:
+    results: list[tuple[str, LineageExtraction | None, str | None]] = []
+    for key, sql in chunk:
+        try:
+            results.append((key, extract_lineage(sql, dialect=dialect), None))
+        except SqlglotError as exc:
+            results.append((key, None, f"{type(exc).__name__}: {exc}"))
+    return results
+
+
+class _InlineExecutor(Executor):
+    """Run work units in the calling process (workers <= 1)."""
+
+    def submit(self, fn, /, *args, **kwargs):  # type: ignore[no-untyped-def]
+        future: Future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as exc:
+            future.set_exception(exc)
+        return future
+
+
+def backfill(
+    statements: Iterable[str],
+    dialect: str | None = None,
+    workers: int | None = None,
+    chunk_size: int = 500,
+    graph: LineageGraph | None = None,
+    max_errors: int = 100,
+) -> BackfillReport:
+    """Extract lineage for `statements` and merge it into one graph.
+
+    Statements are consumed lazily: only unseen fingerprints are batched into
+    chunks of `chunk_size`, and at most two chunks per worker are in flight,
+    so memory stays bounded by the number of distinct statements. Each
+    distinct statement becomes one query node whose `occurrences` metadata
+    counts how often it appeared. `workers` defaults to the CPU count;
+    `workers <= 1` parses in-process.
+    """
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    report = BackfillReport(graph=graph if graph is not None else LineageGraph())
+    counts: dict[str, int] = {}
+    query_ids: dict[str, str] = {}
+    started = time.perf_counter()
+
+    def merge(future: Future) -> None:
+        for key, extraction, error in future.result():
+            if extraction is None:
+                if len(report.errors) < max_errors:
+                    report.errors.append(error or "unknown error")
+                continue
+            query_ids[key] = report.graph.add_query(extraction)
+
+    executor: Executor = ProcessPoolExecutor(workers) if workers > 1 else _InlineExecutor()
+    in_flight: deque[Future] = deque()
+    max_in_flight = max(1, workers) * 2
+    chunk: list[tuple[str, str]] = []
+    with executor:
+        for sql in statements:
+            report.statements += 1
+            key = statement_key(sql)
+            seen = counts.get(key, 0)
+            counts[key] = seen + 1
+            if seen:
+                continue
+            chunk.append((key, sql))
+            if len(chunk) >= chunk_size:
+                in_flight.append(executor.submit(_extract_chunk, chunk, dialect))
+                chunk = []
+                # Merge in submission order so node ids are deterministic.
+                while len(in_flight) >= max_in_flight:
+                    merge(in_flight.popleft())
+        if chunk:
+            in_flight.append(executor.submit(_extract_chunk, chunk, dialect))
+        while in_flight:
+            merge(in_flight.popleft())
+
+    report.failed = sum(count for key, count in counts.items() if key not in query_ids)
+    for key, query_id in query_ids.items():
+        report.graph.nodes[query_id].metadata["occurrences"] = str(counts[key])
+    report.unique = len(counts)
+    report.elapsed_s = time.perf_counter() - started
+    return report
+
+
+def iter_file_statements(path: str | Path, field_name: str = "sql_query") -> Iterator[str]:
+    """Stream statements from a `.jsonl` export (one row per line) or a `;`-separated SQL file."""
+
+    path = Path(path)
+    with path.open(encoding="utf-8") as handle:
+        if path.suffix == ".jsonl":
+            for line in handle:
+                if line.strip():
+                    row = json.loads(line)
+                    sql = row.get(field_name) or row.get("sql")
+                    if sql:
+                        yield sql
+            return
+        buffer: list[str] = []
+        for line in handle:
+            buffer.append(line)
+            if line.rstrip().endswith(";"):
+                statement = "".join(buffer).strip()
+                buffer = []
+                if statement.rstrip(";").strip():
+                    yield statement
+        statement = "".join(buffer).strip()
+        if statement:
+            yield statement
+
+
+def iter_table_statements(
+    table: str = "query_history", column: str = "sql_query", page_size: int = 1000
+) -> Iterator[str]:
+    """Stream statements from a Supabase table, one page at a time."""
+
+    from iopsdata.db.supabase import SupabaseClientWrapper, build_supabase_config
+
+    wrapper = SupabaseClientWrapper(build_supabase_config())
+    loop = asyncio.new_event_loop()
+
+    async def fetch(start: int) -> list[dict[str, str]]:
+        client = await wrapper._get_client()
+        response = await (
+            client.table(table)
+            .select(column)
+            .order("created_at")
+            .range(start, start + page_size - 1)
+            .execute()
+        )
+        return list(response.data or [])
+
+    try:
+        start = 0
+        while True:
+            rows = loop.run_until_complete(fetch(start))
+            for row in rows:
+                if row.get(column):
+                    yield row[column]
+            if len(rows) < page_size:
+                return
+            start += page_size
+    finally:
+        loop.run_until_complete(wrapper.close())
+        loop.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--file", help=".jsonl export or ;-separated .sql file")
+    source.add_argument("--table", help="Supabase table to read, e.g. query_history")
+    parser.add_argument("--column", default="sql_query", help="field holding the SQL text")
+    parser.add_argument("--dialect", default=None)
+    parser.add_argument("--workers", type=int, default=None, help="default: CPU count")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--output", help="write the merged graph as JSON to this path")
+    args = parser.parse_args()
+
+    if args.file:
+        statements = iter_file_statements(args.file, args.column)
+    else:
+        statements = iter_table_statements(args.table, args.column)
+    report = backfill(statements, args.dialect, args.workers, args.chunk_size)
+    if args.output:
+        Path(args.output).write_text(report.graph.to_json(), encoding="utf-8")
+    print(json.dumps(report.summary(), indent=2))
+    for error in report.errors[:10]:
+        print(f"  failed: {error}")
+
+
+if __name__ == "__main__":
+    main()
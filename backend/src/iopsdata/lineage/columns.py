@@ -0,0 +1,87 @@
+"""Column-level lineage on top of sqlglot's qualify and scope machinery."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from sqlglot import expressions as exp
+from sqlglot.errors import SqlglotError
+from sqlglot.lineage import lineage as sqlglot_lineage
+
+from iopsdata.lineage.parse_cache import parse_sql
+
+ColumnSchema = dict[str, dict[str, str]]
+
+
+def column_schema(schema: list[dict[str, Any]]) -> ColumnSchema:
+    """Convert extracted connection schema into sqlglot's `{table: {column: type}}` mapping.
+
+    Tables are keyed by their bare name so both `orders` and `public.orders`
+    references resolve against it.
+    """
+
+    mapping: ColumnSchema = {}
+    for table in schema:
+        name = str(table.get("name", "")).rsplit(".", 1)[-1]
+        if name:
+            mapping[name] = {
+                column["name"]: str(column.get("type") or "unknown")
+                for column in table.get("columns", [])
+            }
+    return mapping
+
+
+def _table_name(table: exp.Table) -> str:
+    return f"{table.db}.{table.name}" if table.db else table.name
+
+
+def _output_names(statement: exp.Expression) -> tuple[exp.Expression, str | None, list[str]]:
+    """Return the query to trace, the table it writes (if any) and explicit target columns."""
+
+    if isinstance(statement, (exp.Insert, exp.Create)) and isinstance(
+        statement.expression, exp.Query
+    ):
+        target = statement.this
+        if isinstance(target, exp.Schema):
+            columns = [column.name for column in target.expressions]
+            target = target.this
+        else:
+            columns = []
+        table = _table_name(target) if isinstance(target, exp.Table) else None
+        return statement.expression, table, columns
+    return statement, None, []
+
+
+def extract_column_lineage(
+    sql: str,
+    schema: ColumnSchema | None = None,
+    dialect: str | None = None,
+) -> dict[str, list[str]]:
+    """Map each output column of a query to the `table.column` sources that feed it.
+
+    CTEs, subqueries and aliases are resolved through sqlglot's scopes, and
+    unqualified columns against `schema` when given. For `INSERT ... SELECT`
+    and `CREATE TABLE ... AS SELECT`, outputs are named `target.column`
+    (using the insert column list when present). Outputs computed without
+    any column (e.g. `count(*)`) map to an empty list; columns that cannot
+    be attributed to a table are left out. Raises SqlglotError for
+    statements that are not queries.
+    """
+
+    statement = parse_sql(sql, dialect, copy=False)
+    query, target, target_columns = _output_names(statement)
+    if not isinstance(query, exp.Query):
+        raise SqlglotError(f"Column lineage needs a query, got {statement.key.upper()}")
+
+    nodes = sqlglot_lineage(None, query, schema=schema or {}, dialect=dialect, copy=True)
+    lineage: dict[str, list[str]] = {}
+    for position, (name, node) in enumerate(nodes.items()):
+        if target:
+            column = target_columns[position] if position < len(target_columns) else name
+            name = f"{target}.{column}"
+        sources: set[str] = set()
+        for leaf in node.walk():
+            if not leaf.downstream and isinstance(leaf.source, exp.Table):
+                sources.add(f"{_table_name(leaf.source)}.{leaf.name.rsplit('.', 1)[-1]}")
+        lineage[name] = sorted(sources)
+    return lineage
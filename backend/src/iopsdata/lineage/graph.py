@@ -3,13 +3,29 @@
 from __future__ import annotations
 
 import json
+from array import array
+from bisect import bisect_right
+from collections import deque
+from collections.abc import Iterator
 from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, Any
 from uuid import uuid4
 
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from iopsdata.lineage.columns import ColumnSchema, extract_column_lineage
 from iopsdata.lineage.parser import LineageExtraction
 
+_compact = json.JSONEncoder(separators=(",", ":")).encode
+
 
-@dataclass
+@dataclass(slots=True)
 class LineageNode:
     """Graph node representing a table, query, or output."""
 
@@ -19,7 +35,7 @@ class LineageNode:
     metadata: dict[str, str] = field(default_factory=dict)
 
 
-@dataclass
+@dataclass(slots=True)
 class LineageEdge:
     """Graph edge representing data flow between nodes."""
 
@@ -28,58 +44,582 @@ class LineageEdge:
     relation: str
 
 
+class LineageCycleError(ValueError):
+    """Raised when a topological order is requested for a graph with cycles."""
+
+    def __init__(self, cycle: list[str]) -> None:
+        super().__init__(f"Lineage graph has a cycle: {' -> '.join(cycle)}")
+        self.cycle = cycle
+
+
 class LineageGraph:
-    """Graph structure capturing SQL lineage and dependencies."""
+    """Graph structure capturing SQL lineage and dependencies.
+
+    Nodes get dense integer indexes; edges live only in per-node adjacency
+    maps (`target -> relation` and `source -> relation`), so adding an edge
+    is deduplicated in O(1) and upstream/downstream traversals touch only
+    the edges they follow. There is at most one edge per ordered node pair.
+
+    The graph only grows. Every added node or edge bumps `version`, and
+    compact logs of when each was added let `delta(since)` and the
+    exporters return just what changed after a version a client has seen.
+    """
 
     def __init__(self) -> None:
         self.nodes: dict[str, LineageNode] = {}
-        self.edges: list[LineageEdge] = []
+        self._index: dict[str, int] = {}
+        self._by_key: dict[tuple[str, str], int] = {}
+        self._ids: list[str] = []
+        self._out: list[dict[int, int]] = []
+        self._in: list[dict[int, int]] = []
+        self._relations: list[str] = []
+        self._relation_codes: dict[str, int] = {}
+        self._edge_count = 0
+        self._column_lineage: dict[str, dict[str, list[str]]] = {}
+        self.version = 0
+        self._node_versions = array("q")
+        self._edge_sources = array("q")
+        self._edge_targets = array("q")
+        self._edge_versions = array("q")
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def edge_count(self) -> int:
+        return self._edge_count
+
+    @property
+    def edges(self) -> list[LineageEdge]:
+        """All edges, materialized on demand."""
 
-    def _ensure_node(self, node_type: str, label: str, metadata: dict[str, str] | None = None) -> LineageNode:
-        node_id = f"{node_type}:{label}"
-        if node_id not in self.nodes:
-            self.nodes[node_id] = LineageNode(
-                id=node_id,
+        return list(self.iter_edges())
+
+    def iter_edges(self) -> Iterator[LineageEdge]:
+        ids, relations = self._ids, self._relations
+        for source, targets in enumerate(self._out):
+            for target, code in targets.items():
+                yield LineageEdge(source=ids[source], target=ids[target], relation=relations[code])
+
+    def _add(self, node: LineageNode) -> int:
+        index = len(self._ids)
+        self.nodes[node.id] = node
+        self._index[node.id] = index
+        self._ids.append(node.id)
+        self._out.append({})
+        self._in.append({})
+        self.version += 1
+        self._node_versions.append(self.version)
+        return index
+
+    def _ensure_node(
+        self, node_type: str, label: str, metadata: dict[str, str] | None = None
+    ) -> int:
+        index = self._by_key.get((node_type, label))
+        if index is None:
+            node = LineageNode(
+                id=f"{node_type}:{label}",
                 node_type=node_type,
                 label=label,
                 metadata=metadata or {},
             )
-        return self.nodes[node_id]
+            index = self._index.get(node.id)
+            if index is None:
+                index = self._add(node)
+            self._by_key[(node_type, label)] = index
+        return index
+
+    def _link(self, source: int, target: int, relation: str) -> bool:
+        targets = self._out[source]
+        if target in targets:
+            return False
+        code = self._relation_codes.get(relation)
+        if code is None:
+            code = self._relation_codes[relation] = len(self._relations)
+            self._relations.append(relation)
+        targets[target] = code
+        self._in[target][source] = code
+        self._edge_count += 1
+        self.version += 1
+        self._edge_sources.append(source)
+        self._edge_targets.append(target)
+        self._edge_versions.append(self.version)
+        return True
+
+    def add_node(
+        self, node_type: str, label: str, metadata: dict[str, str] | None = None
+    ) -> str:
+        """Add (or find) the node for `node_type`/`label` and return its id."""
+
+        return self._ids[self._ensure_node(node_type, label, metadata)]
+
+    def add_edge(self, source: str, target: str, relation: str) -> bool:
+        """Add an edge between existing nodes; returns False if the pair is already linked."""
+
+        return self._link(self._node_index(source), self._node_index(target), relation)
+
+    def add_query(self, lineage: LineageExtraction, query_id: str | None = None) -> str:
+        """Add a query to the graph and return the query node id.
 
-    def add_query(self, lineage: LineageExtraction) -> str:
-        """Add a query to the graph and return the query node id."""
+        Passing a stable `query_id` (e.g. derived from the statement
+        fingerprint) makes repeated adds of the same query a no-op.
+        """
 
-        query_id = f"query:{uuid4().hex}"
-        self.nodes[query_id] = LineageNode(
-            id=query_id,
-            node_type="query",
-            label=lineage.query_type,
-            metadata={"sql": lineage.sql},
+        if query_id is None:
+            query_id = f"query:{uuid4().hex}"
+        elif query_id in self._index:
+            return query_id
+        query = self._add(
+            LineageNode(
+                id=query_id,
+                node_type="query",
+                label=lineage.query_type,
+                metadata={"sql": lineage.sql},
+            )
         )
 
         for table in lineage.tables_read:
-            table_node = self._ensure_node("table", table)
-            self.edges.append(LineageEdge(source=table_node.id, target=query_id, relation="reads"))
+            self._link(self._ensure_node("table", table), query, "reads")
 
         for table in lineage.tables_written:
-            table_node = self._ensure_node("table", table)
-            self.edges.append(LineageEdge(source=query_id, target=table_node.id, relation="writes"))
+            self._link(query, self._ensure_node("table", table), "writes")
 
         for cte in lineage.ctes:
-            cte_node = self._ensure_node("cte", cte)
-            self.edges.append(LineageEdge(source=cte_node.id, target=query_id, relation="cte"))
+            self._link(self._ensure_node("cte", cte), query, "cte")
 
         return query_id
 
+    def resolve_columns(
+        self,
+        query_id: str,
+        schema: ColumnSchema | None = None,
+        dialect: str | None = None,
+    ) -> dict[str, list[str]]:
+        """Resolve column lineage for a query node and add `column` nodes and edges.
+
+        Each source column gets a `derives` edge to the output column it
+        feeds. Outputs of plain queries are named `<query_id>.<column>`.
+        Resolution runs on first request per query, keeping `add_query` on the
+        cheap table-level path. Raises SqlglotError for statements that are
+        not queries.
+        """
+
+        resolved = self._column_lineage.get(query_id)
+        if resolved is not None:
+            return resolved
+        resolved = extract_column_lineage(
+            self.nodes[query_id].metadata["sql"], schema=schema, dialect=dialect
+        )
+        return self.add_column_lineage(query_id, resolved)
+
+    def add_column_lineage(
+        self, query_id: str, resolved: dict[str, list[str]]
+    ) -> dict[str, list[str]]:
+        """Add column lineage computed elsewhere (see `resolve_columns`) for a query node."""
+
+        existing = self._column_lineage.get(query_id)
+        if existing is not None:
+            return existing
+        query = self._node_index(query_id)
+        for output, sources in resolved.items():
+            label = output if "." in output else f"{query_id}.{output}"
+            target = self._ensure_node("column", label)
+            self._link(query, target, "produces")
+            for source in sources:
+                self._link(self._ensure_node("column", source), target, "derives")
+        self._column_lineage[query_id] = resolved
+        return resolved
+
+    def _node_index(self, node_id: str) -> int:
+        try:
+            return self._index[node_id]
+        except KeyError:
+            raise KeyError(f"Unknown lineage node: {node_id}") from None
+
+    def walk(
+        self,
+        node_id: str,
+        direction: str = "downstream",
+        max_depth: int | None = None,
+        depth_first: bool = False,
+    ) -> Iterator[tuple[str, int]]:
+        """Yield `(node_id, depth)` for nodes reachable from `node_id`, excluding it.
+
+        `downstream` follows edges in data-flow direction (what a node
+        feeds), `upstream` against it (what a node is built from). Each node
+        is yielded once, so cycles terminate; `max_depth` bounds the number
+        of hops. Breadth-first by default, which yields nodes nearest first
+        at their shortest distance.
+        """
+
+        if direction == "downstream":
+            adjacency = self._out
+        elif direction == "upstream":
+            adjacency = self._in
+        else:
+            raise ValueError("direction must be 'upstream' or 'downstream'")
+
+        start = self._node_index(node_id)
+        ids = self._ids
+        # Shortest known depth per node. Breadth-first search settles each node
+        # on first visit; depth-first search re-expands a node when a shorter
+        # path turns up, so `max_depth` still bounds hops along the best path.
+        depths = {start: 0}
+        emitted = {start}
+        frontier: deque[tuple[int, int]] = deque([(start, 0)])
+        pop = frontier.pop if depth_first else frontier.popleft
+        while frontier:
+            index, depth = pop()
+            if depth > depths[index]:
+                continue
+            if index not in emitted:
+                emitted.add(index)
+                yield ids[index], depth
+            if max_depth is not None and depth >= max_depth:
+                continue
+            for neighbour in adjacency[index]:
+                if depths.get(neighbour, depth + 2) > depth + 1:
+                    depths[neighbour] = depth + 1
+                    frontier.append((neighbour, depth + 1))
+
+    def upstream(self, node_id: str, max_depth: int | None = None) -> list[str]:
+        """Nodes `node_id` depends on, nearest first."""
+
+        return [node for node, _ in self.walk(node_id, "upstream", max_depth)]
+
+    def downstream(self, node_id: str, max_depth: int | None = None) -> list[str]:
+        """Nodes affected by a change to `node_id` (impact analysis), nearest first."""
+
+        return [node for node, _ in self.walk(node_id, "downstream", max_depth)]
+
+    def find_cycle(self) -> list[str] | None:
+        """Return one cycle as a closed path of node ids, or None if the graph is acyclic."""
+
+        white, grey, black = 0, 1, 2
+        colour = [white] * len(self._ids)
+        for root in range(len(self._ids)):
+            if colour[root] != white:
+                continue
+            colour[root] = grey
+            path = [root]
+            stack = [iter(self._out[root])]
+            while stack:
+                for child in stack[-1]:
+                    if colour[child] == grey:
+                        cycle = path[path.index(child) :] + [child]
+                        return [self._ids[index] for index in cycle]
+                    if colour[child] == white:
+                        colour[child] = grey
+                        path.append(child)
+                        stack.append(iter(self._out[child]))
+                        break
+                else:
+                    colour[path.pop()] = black
+                    stack.pop()
+        return None
+
+    def topological_order(self) -> list[str]:
+        """Return node ids so that every edge points forward (Kahn's algorithm).
+
+        Raises LineageCycleError naming one cycle when no such order exists.
+        """
+
+        remaining = [len(sources) for sources in self._in]
+        ready = deque(index for index, count in enumerate(remaining) if count == 0)
+        order: list[int] = []
+        while ready:
+            index = ready.popleft()
+            order.append(index)
+            for target in self._out[index]:
+                remaining[target] -= 1
+                if remaining[target] == 0:
+                    ready.append(target)
+        if len(order) < len(self._ids):
+            raise LineageCycleError(self.find_cycle() or [])
+        return [self._ids[index] for index in order]
+
+    def neighborhood(
+        self,
+        node_id: str,
+        max_depth: int = 2,
+        direction: str = "both",
+        max_nodes: int = 200,
+        max_edges: int = 500,
+        aggregate_queries: bool = True,
+        max_queries: int | None = None,
+    ) -> dict[str, Any]:
+        """Return the `max_depth`-hop lineage neighborhood of `node_id`, sized for display.
+
+        Upstream and downstream are followed separately from the center, so
+        tables that merely share a source with it are not pulled in. Passing
+        through a query node does not count as a hop: depth 1 around a table
+        reaches the tables it is built from and the tables it feeds. Nodes
+        are collected nearest first up to `max_nodes`.
+
+        With `aggregate_queries`, query and CTE nodes are folded away: the
+        queries writing one selected table from another become a single
+        `flows` edge whose `weight` counts them, and queries that only read a
+        table add to its `readers` count. Hidden nodes do not count towards
+        `max_nodes`; queries that lead nowhere further are not traversed at
+        all, and the rest are capped by `max_queries` (default ten times
+        `max_nodes`). Without aggregation, queries are returned as nodes and
+        count towards `max_nodes`. At most `max_edges` edges are returned,
+        heaviest first; `truncated` reports whether a cap was hit.
+        """
+
+        sides = {
+            "downstream": (self._out,),
+            "upstream": (self._in,),
+            "both": (self._out, self._in),
+        }
+        if direction not in sides:
+            raise ValueError("direction must be 'upstream', 'downstream' or 'both'")
+        start = self._node_index(node_id)
+        ids, nodes, relations = self._ids, self.nodes, self._relations
+
+        def is_query(index: int) -> bool:
+            return nodes[ids[index]].node_type == "query"
+
+        hidden = {"query", "cte"} if aggregate_queries else set()
+        if max_queries is None:
+            max_queries = max_nodes * 10
+        shown, traversed = 1, 0
+
+        # 0-1 breadth-first search per side: query nodes cost no depth, so
+        # they are queued at the front and nodes are still settled nearest first.
+        selected: dict[int, int] = {start: 0}
+        depths: dict[tuple[int, int], int] = {}
+        frontier: deque[tuple[int, int, int]] = deque()
+        for side in range(len(sides[direction])):
+            depths[(start, side)] = 0
+            frontier.append((start, side, 0))
+        truncated = False
+        while frontier:
+            index, side, depth = frontier.popleft()
+            if depth > depths[(index, side)]:
+                continue
+            adjacency = sides[direction][side]
+            for neighbour in adjacency[index]:
+                free = is_query(neighbour)
+                if free and (depth >= max_depth or (hidden and not adjacency[neighbour])):
+                    # A query here could not reach anything within range; folded-away
+                    # dead ends (such as read-only queries) are counted as readers below.
+                    continue
+                next_depth = depth if free else depth + 1
+                if next_depth > max_depth:
+                    continue
+                if depths.get((neighbour, side), next_depth + 1) <= next_depth:
+                    continue
+                if neighbour not in selected:
+                    if nodes[ids[neighbour]].node_type in hidden:
+                        if traversed >= max_queries:
+                            truncated = True
+                            continue
+                        traversed += 1
+                    else:
+                        if shown >= max_nodes:
+                            truncated = True
+                            continue
+                        shown += 1
+                    selected[neighbour] = next_depth
+                else:
+                    selected[neighbour] = min(selected[neighbour], next_depth)
+                depths[(neighbour, side)] = next_depth
+                if free:
+                    frontier.appendleft((neighbour, side, next_depth))
+                else:
+                    frontier.append((neighbour, side, next_depth))
+
+        readers: dict[int, int] = {}
+        edges: list[dict[str, Any]] = []
+        if aggregate_queries:
+            visible = {i for i in selected if nodes[ids[i]].node_type not in hidden}
+
+            def visible_targets(query: int) -> list[int]:
+                return [
+                    target
+                    for target, code in self._out[query].items()
+                    if target in visible and relations[code] == "writes"
+                ]
+
+            weights: dict[tuple[int, int], int] = {}
+            for index in visible:
+                for query, code in self._out[index].items():
+                    if relations[code] != "reads" or not is_query(query):
+                        continue
+                    targets = visible_targets(query)
+                    if not targets:
+                        readers[index] = readers.get(index, 0) + 1
+                    for target in targets:
+                        weights[(index, target)] = weights.get((index, target), 0) + 1
+            for (source, target), weight in sorted(weights.items(), key=lambda item: -item[1]):
+                edges.append(
+                    {
+                        "source": ids[source],
+                        "target": ids[target],
+                        "relation": "flows",
+                        "weight": weight,
+                    }
+                )
+        else:
+            visible = set(selected)
+        for index in visible:
+            for target, code in self._out[index].items():
+                if target in visible:
+                    edges.append(
+                        {"source": ids[index], "target": ids[target], "relation": relations[code]}
+                    )
+        if len(edges) > max_edges:
+            edges = edges[:max_edges]
+            truncated = True
+
+        result_nodes: list[dict[str, Any]] = []
+        for index, depth in sorted(selected.items(), key=lambda item: item[1]):
+            if index not in visible:
+                continue
+            node = nodes[ids[index]]
+            entry: dict[str, Any] = {
+                "id": node.id,
+                "node_type": node.node_type,
+                "label": node.label,
+                "metadata": node.metadata,
+                "depth": depth,
+            }
+            if aggregate_queries:
+                entry["readers"] = readers.get(index, 0)
+            result_nodes.append(entry)
+        return {
+            "version": self.version,
+            "center": node_id,
+            "nodes": result_nodes,
+            "edges": edges,
+            "truncated": truncated,
+        }
+
+    def _node_start(self, since: int | None) -> int:
+        return 0 if since is None else bisect_right(self._node_versions, since)
+
+    def _edge_start(self, since: int | None) -> int:
+        return 0 if since is None else bisect_right(self._edge_versions, since)
+
+    def _iter_node_dicts(self, since: int | None = None) -> Iterator[dict[str, Any]]:
+        nodes, ids = self.nodes, self._ids
+        for index in range(self._node_start(since), len(ids)):
+            node = nodes[ids[index]]
+            yield {
+                "id": node.id,
+                "node_type": node.node_type,
+                "label": node.label,
+                "metadata": node.metadata,
+            }
+
+    def _iter_edge_dicts(self, since: int | None = None) -> Iterator[dict[str, str]]:
+        ids, relations, out = self._ids, self._relations, self._out
+        sources, targets = self._edge_sources, self._edge_targets
+        for position in range(self._edge_start(since), len(sources)):
+            source, target = sources[position], targets[position]
+            yield {
+                "source": ids[source],
+                "target": ids[target],
+                "relation": relations[out[source][target]],
+            }
+
     def to_dict(self) -> dict[str, list[dict[str, str]]]:
         """Export graph data for visualization."""
 
         return {
-            "nodes": [node.__dict__ for node in self.nodes.values()],
-            "edges": [edge.__dict__ for edge in self.edges],
+            "nodes": list(self._iter_node_dicts()),
+            "edges": list(self._iter_edge_dicts()),
+        }
+
+    def delta(self, since: int) -> dict[str, Any]:
+        """Nodes and edges added after version `since`, plus the current version."""
+
+        return {
+            "version": self.version,
+            "since": since,
+            "nodes": list(self._iter_node_dicts(since)),
+            "edges": list(self._iter_edge_dicts(since)),
         }
 
-    def to_json(self) -> str:
-        """Export graph data as JSON."""
+    def iter_json(self, since: int | None = None) -> Iterator[str]:
+        """Yield the compact JSON document `{"version", "nodes", "edges"}` in pieces.
+
+        With `since`, only nodes and edges added after that version are included.
+        """
+
+        yield f'{{"version":{self.version},"nodes":['
+        for position, node in enumerate(self._iter_node_dicts(since)):
+            yield ("," if position else "") + _compact(node)
+        yield '],"edges":['
+        for position, edge in enumerate(self._iter_edge_dicts(since)):
+            yield ("," if position else "") + _compact(edge)
+        yield "]}"
+
+    def iter_ndjson(self, since: int | None = None) -> Iterator[str]:
+        """Yield one JSON line per node, then per edge, then a closing `version` line."""
+
+        for node in self._iter_node_dicts(since):
+            yield _compact({"kind": "node", **node}) + "\n"
+        for edge in self._iter_edge_dicts(since):
+            yield _compact({"kind": "edge", **edge}) + "\n"
+        yield _compact({"kind": "version", "version": self.version}) + "\n"
+
+    def write_json(self, fp: IO[str], since: int | None = None, ndjson: bool = False) -> None:
+        """Stream the graph to a text file without materializing the document."""
+
+        for chunk in self.iter_ndjson(since) if ndjson else self.iter_json(since):
+            fp.write(chunk)
+
+    def to_json(self, indent: int | None = None) -> str:
+        """Export graph data as JSON (compact unless `indent` is given)."""
+
+        if indent is None:
+            return "".join(self.iter_json())
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def to_arrow(self, since: int | None = None) -> tuple[pa.Table, pa.Table]:
+        """Return `(nodes, edges)` as Arrow tables; node metadata is a JSON string column."""
+
+        if pa is None:
+            raise ImportError(
+                "pyarrow is required for Arrow export. Install with: pip install pyarrow"
+            )
+        ids, nodes = self._ids, self.nodes
+        node_range = range(self._node_start(since), len(ids))
+        node_table = pa.table(
+            {
+                "id": [ids[index] for index in node_range],
+                "node_type": pa.array(
+                    [nodes[ids[index]].node_type for index in node_range]
+                ).dictionary_encode(),
+                "label": [nodes[ids[index]].label for index in node_range],
+                "metadata": [_compact(nodes[ids[index]].metadata) for index in node_range],
+            }
+        )
+        start = self._edge_start(since)
+        sources, targets = self._edge_sources[start:], self._edge_targets[start:]
+        edge_table = pa.table(
+            {
+                "source": [ids[index] for index in sources],
+                "target": [ids[index] for index in targets],
+                "relation": pa.array(
+                    [
+                        self._relations[self._out[source][target]]
+                        for source, target in zip(sources, targets, strict=True)
+                    ]
+                ).dictionary_encode(),
+            }
+        )
+        return node_table, edge_table
+
+    def write_parquet(self, directory: str | Path, since: int | None = None) -> tuple[Path, Path]:
+        """Write `nodes.parquet` and `edges.parquet` into `directory`."""
 
-        return json.dumps(self.to_dict(), indent=2)
+        node_table, edge_table = self.to_arrow(since)
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        paths = directory / "nodes.parquet", directory / "edges.parquet"
+        pq.write_table(node_table, paths[0])
+        pq.write_table(edge_table, paths[1])
+        return paths
@@ -29,3 +29,10 @@ class LineageRecord(BaseModel):
     query: LineageQuery
     dependencies: list[str] = Field(default_factory=list)
     metadata: dict[str, Any] = Field(default_factory=dict)
+
+
+class LineagePage(BaseModel):
+    """One page of a session's lineage history, newest first."""
+
+    records: list[LineageRecord] = Field(default_factory=list)
+    next_cursor: str | None = None
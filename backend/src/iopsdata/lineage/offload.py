@@ -0,0 +1,112 @@
+"""Run CPU-bound lineage parsing off the event loop."""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import os
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
+class SqlTooLargeError(ValueError):
+    """Raised when a statement exceeds the configured size limit for parsing."""
+
+
+class LineageParseTimeout(TimeoutError):
+    """Raised when parsing does not finish within the configured timeout."""
+
+
+class LineageParser:
+    """Dispatch sqlglot work to a bounded thread pool with size and time limits.
+
+    Threads share the process-wide parse cache, and the interpreter switches
+    away from a parsing thread every few milliseconds, so one huge statement
+    no longer stalls every other request on the event loop. Statements over
+    `max_sql_bytes` (UTF-8) are rejected before parsing. A call that exceeds
+    `timeout_s`, including time queued behind `max_workers` busy workers,
+    raises LineageParseTimeout; the worker finishes that parse in the
+    background, so the pool size also bounds how much runaway work can pile
+    up.
+
+    Multi-statement scripts can additionally fan their statements out to a
+    shared process pool of `script_workers` (default: the CPU count; 1
+    parses scripts in the worker thread).
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        max_sql_bytes: int = 1_000_000,
+        timeout_s: float = 5.0,
+        script_workers: int | None = None,
+    ) -> None:
+        self.max_workers = max_workers
+        self.max_sql_bytes = max_sql_bytes
+        self.timeout_s = timeout_s
+        self.script_workers = script_workers
+        self._executor: ThreadPoolExecutor | None = None
+        self._script_executor: ProcessPoolExecutor | None = None
+
+    def check_size(self, sql: str) -> None:
+        size = len(sql.encode("utf-8"))
+        if size > self.max_sql_bytes:
+            raise SqlTooLargeError(
+                f"SQL is {size} bytes; lineage parsing is limited to {self.max_sql_bytes} bytes"
+            )
+
+    async def run(self, sql: str, fn: Callable[..., T], *args: object) -> T:
+        """Check `sql` against the size limit, then return `fn(*args)` from a worker."""
+
+        self.check_size(sql)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="lineage-parse"
+            )
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, functools.partial(fn, *args))
+        try:
+            return await asyncio.wait_for(future, self.timeout_s)
+        except TimeoutError as exc:
+            raise LineageParseTimeout(
+                f"Lineage parsing did not finish within {self.timeout_s:g}s"
+            ) from exc
+
+    def script_executor(self) -> ProcessPoolExecutor | None:
+        """Return the shared process pool for script statements, or None when disabled."""
+
+        if self.script_workers == 1:
+            return None
+        if self._script_executor is None:
+            # Worker processes are only started once work is submitted.
+            self._script_executor = ProcessPoolExecutor(self.script_workers)
+        return self._script_executor
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._script_executor is not None:
+            self._script_executor.shutdown(wait=False, cancel_futures=True)
+            self._script_executor = None
+
+
+def build_lineage_parser() -> LineageParser:
+    """Build a parser pool configured by `LINEAGE_PARSE_*` environment variables.
+
+    `LINEAGE_SCRIPT_WORKERS` sizes the process pool for script statements.
+    """
+
+    script_workers = os.getenv("LINEAGE_SCRIPT_WORKERS")
+    return LineageParser(
+        max_workers=int(os.getenv("LINEAGE_PARSE_WORKERS", "4")),
+        max_sql_bytes=int(os.getenv("LINEAGE_MAX_SQL_BYTES", "1000000")),
+        timeout_s=float(os.getenv("LINEAGE_PARSE_TIMEOUT_S", "5")),
+        script_workers=int(script_workers) if script_workers else None,
+    )
+
+
+lineage_parser = build_lineage_parser()
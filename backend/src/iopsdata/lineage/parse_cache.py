@@ -0,0 +1,127 @@
+"""LRU cache of parsed SQL statements and their literal-stripped fingerprints."""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import sqlglot
+from sqlglot import expressions as exp
+
+
+@dataclass
+class ParseCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class _Entry:
+    __slots__ = ("expression", "fingerprint")
+
+    def __init__(self, expression: exp.Expression) -> None:
+        self.expression = expression
+        self.fingerprint: str | None = None
+
+
+def _strip_literal(node: exp.Expression) -> exp.Expression:
+    if isinstance(node, exp.Literal):
+        return exp.Placeholder()
+    return node
+
+
+class ParseCache:
+    """Parse SQL once per (statement, dialect) and hand out the cached AST.
+
+    Entries are keyed by a SHA-1 of the SQL text plus the sqlglot read
+    dialect and evicted least-recently-used beyond `max_entries`. `parse`
+    returns a copy by default, so callers may mutate the tree; read-only
+    callers pass `copy=False` to share the cached tree. Parse errors are
+    raised and not cached.
+    """
+
+    def __init__(self, max_entries: int = 4096) -> None:
+        self._max_entries = max_entries
+        self._entries: OrderedDict[tuple[bytes, str], _Entry] = OrderedDict()
+        # Lineage parsing may run in worker threads; keep LRU bookkeeping atomic.
+        self._lock = threading.Lock()
+        self.stats = ParseCacheStats()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _entry(self, sql: str, dialect: str | None) -> _Entry:
+        key = (hashlib.sha1(sql.encode("utf-8")).digest(), dialect or "")
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+                return entry
+            self.stats.misses += 1
+
+        entry = _Entry(sqlglot.parse_one(sql, read=dialect))
+        with self._lock:
+            self._entries[key] = entry
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+        return entry
+
+    def parse(self, sql: str, dialect: str | None = None, copy: bool = True) -> exp.Expression:
+        """Return the AST for `sql`; with `copy=False` the shared tree must not be mutated."""
+
+        expression = self._entry(sql, dialect).expression
+        return expression.copy() if copy else expression
+
+    def fingerprint(self, sql: str, dialect: str | None = None) -> str:
+        """Return a hash identifying `sql` up to literal values, case and whitespace.
+
+        `select * from t where id = 1` and `SELECT * FROM t WHERE id = 2` share
+        a fingerprint.
+        """
+
+        entry = self._entry(sql, dialect)
+        if entry.fingerprint is None:
+            normalized = entry.expression.transform(_strip_literal).sql(
+                dialect=dialect, normalize=True
+            )
+            entry.fingerprint = hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+        return entry.fingerprint
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        self.stats = ParseCacheStats()
+
+    def info(self) -> dict[str, float | int]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self._max_entries,
+            "hits": self.stats.hits,
+            "misses": self.stats.misses,
+            "evictions": self.stats.evictions,
+            "hit_rate": round(self.stats.hit_rate, 4),
+        }
+
+
+parse_cache = ParseCache()
+
+
+def parse_sql(sql: str, dialect: str | None = None, copy: bool = True) -> exp.Expression:
+    """Parse one SQL statement through the shared parse cache."""
+
+    return parse_cache.parse(sql, dialect, copy=copy)
+
+
+def fingerprint_sql(sql: str, dialect: str | None = None) -> str:
+    """Literal-stripped fingerprint of one SQL statement via the shared parse cache."""
+
+    return parse_cache.fingerprint(sql, dialect)
@@ -5,9 +5,10 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Iterable
 
-import sqlglot
 from sqlglot import expressions as exp
 
+from iopsdata.lineage.parse_cache import parse_sql
+
 
 @dataclass(frozen=True)
 class LineageExtraction:
@@ -27,22 +28,20 @@ def _table_name(table: exp.Table) -> str:
     return table.name
 
 
-def _extract_tables(expression: exp.Expression) -> list[str]:
-    return sorted({_table_name(table) for table in expression.find_all(exp.Table)})
-
+def _collect(expression: exp.Expression) -> tuple[set[str], set[str], set[str]]:
+    """Gather referenced tables, columns and CTE names in one walk of the tree."""
 
-def _extract_columns(expression: exp.Expression) -> list[str]:
+    tables: set[str] = set()
     columns: set[str] = set()
-    for column in expression.find_all(exp.Column):
-        if column.table:
-            columns.add(f"{column.table}.{column.name}")
-        else:
-            columns.add(column.name)
-    return sorted(columns)
-
-
-def _extract_ctes(expression: exp.Expression) -> list[str]:
-    return sorted({cte.alias_or_name for cte in expression.find_all(exp.CTE) if cte.alias_or_name})
+    ctes: set[str] = set()
+    for node in expression.walk():
+        if isinstance(node, exp.Column):
+            columns.add(f"{node.table}.{node.name}" if node.table else node.name)
+        elif isinstance(node, exp.Table):
+            tables.add(_table_name(node))
+        elif isinstance(node, exp.CTE) and node.alias_or_name:
+            ctes.add(node.alias_or_name)
+    return tables, columns, ctes
 
 
 def _query_type(expression: exp.Expression) -> str:
@@ -56,36 +55,44 @@ def _query_type(expression: exp.Expression) -> str:
         return "DELETE"
     if isinstance(expression, exp.Create):
         return "CREATE"
+    if isinstance(expression, exp.TruncateTable):
+        return "TRUNCATE"
     return expression.key.upper()
 
 
 def _written_tables(expression: exp.Expression) -> list[str]:
     targets: set[str] = set()
-    if isinstance(expression, (exp.Insert, exp.Update, exp.Delete, exp.Create)):
+    if isinstance(
+        expression, (exp.Insert, exp.Update, exp.Delete, exp.Create, exp.Alter, exp.Merge)
+    ):
         target = expression.this
+        if isinstance(target, exp.Schema):
+            target = target.this
+        elif isinstance(target, exp.Index):
+            target = target.args.get("table")
         if isinstance(target, exp.Table):
             targets.add(_table_name(target))
+    elif isinstance(expression, exp.Drop):
+        targets.update(_table_name(table) for table in expression.args.get("tables") or [])
+    elif isinstance(expression, exp.TruncateTable):
+        targets.update(_table_name(table) for table in expression.expressions)
     return sorted(targets)
 
 
 def extract_lineage(sql: str, dialect: str | None = None) -> LineageExtraction:
     """Extract table/column lineage from SQL using sqlglot."""
 
-    parsed = sqlglot.parse_one(sql, read=dialect) if dialect else sqlglot.parse_one(sql)
-    query_type = _query_type(parsed)
-    tables = _extract_tables(parsed)
+    parsed = parse_sql(sql, dialect, copy=False)
+    tables, columns, ctes = _collect(parsed)
     tables_written = _written_tables(parsed)
-    tables_read = sorted(set(tables) - set(tables_written))
-    columns_used = _extract_columns(parsed)
-    ctes = _extract_ctes(parsed)
 
     return LineageExtraction(
         sql=sql,
-        query_type=query_type,
-        tables_read=tables_read,
+        query_type=_query_type(parsed),
+        tables_read=sorted(tables - set(tables_written)),
         tables_written=tables_written,
-        columns_used=columns_used,
-        ctes=ctes,
+        columns_used=sorted(columns),
+        ctes=sorted(ctes),
     )
 
 
@@ -97,7 +104,7 @@ def extract_dependencies(sql_statements: Iterable[str], dialect: str | None = No
 
     for statement in sql_statements:
         lineage = extract_lineage(statement, dialect=dialect)
-        deps = sorted(previous_tables.intersection(set(lineage.tables_read)))
+        deps = [table for table in lineage.tables_read if table in previous_tables]
         dependencies[statement] = deps
         previous_tables.update(lineage.tables_written)
 
@@ -0,0 +1,142 @@
+"""Lineage and execution order for multi-statement SQL scripts."""
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import repeat
+
+from sqlglot.dialects.dialect import Dialect
+from sqlglot.tokens import TokenType
+
+from iopsdata.lineage.parser import LineageExtraction, extract_lineage
+
+# Statements that change session state; everything before must finish first
+# and everything after waits for them.
+BARRIER_TYPES = frozenset({"SET", "USE", "TRANSACTION", "COMMIT", "ROLLBACK", "COMMAND"})
+
+# Below this many statements, process start-up costs more than parsing.
+PARALLEL_MIN_STATEMENTS = 64
+
+
+@dataclass(frozen=True)
+class ScriptLineage:
+    """Per-statement lineage plus the dependency DAG between statements.
+
+    `dependencies[i]` lists the earlier statements statement `i` must run
+    after; `stages` groups statement indexes into waves whose members are
+    independent of each other and may run concurrently once every earlier
+    stage has finished.
+    """
+
+    statements: list[LineageExtraction]
+    dependencies: list[list[int]]
+    stages: list[list[int]]
+
+
+def split_statements(sql: str, dialect: str | None = None) -> list[str]:
+    """Split a script on top-level semicolons using the dialect's tokenizer.
+
+    Only tokenizing, not parsing, happens here, so the statements can then be
+    parsed independently. Semicolons inside strings and comments are not
+    separators; empty statements and comment-only fragments are dropped.
+    """
+
+    statements: list[str] = []
+    first = last = None
+    for token in Dialect.get_or_raise(dialect).tokenize(sql):
+        if token.token_type == TokenType.SEMICOLON:
+            if first is not None:
+                statements.append(sql[first.start : last.end + 1])
+            first = last = None
+            continue
+        if first is None:
+            first = token
+        last = token
+    if first is not None:
+        statements.append(sql[first.start : last.end + 1])
+    return statements
+
+
+def build_dependencies(
+    statements: list[LineageExtraction],
+) -> tuple[list[list[int]], list[list[int]]]:
+    """Order statements in one pass; returns `(dependencies, stages)`.
+
+    A statement depends on the last earlier writer of every table it reads
+    or writes (read-after-write, write-after-write) and on every earlier
+    reader of a table it writes since that table's last write
+    (write-after-read). Session-state statements (SET, USE, transaction
+    control, unparsed commands) act as barriers.
+    """
+
+    last_writer: dict[str, int] = {}
+    readers: dict[str, list[int]] = {}
+    barrier: int | None = None
+    since_barrier: list[int] = []
+    dependencies: list[list[int]] = []
+    levels: list[int] = []
+    for index, lineage in enumerate(statements):
+        depends: set[int] = set()
+        if barrier is not None:
+            depends.add(barrier)
+        if lineage.query_type in BARRIER_TYPES:
+            depends.update(since_barrier)
+            barrier, since_barrier = index, []
+        else:
+            since_barrier.append(index)
+        for table in lineage.tables_read:
+            if table in last_writer:
+                depends.add(last_writer[table])
+            readers.setdefault(table, []).append(index)
+        for table in lineage.tables_written:
+            if table in last_writer:
+                depends.add(last_writer[table])
+            depends.update(readers.get(table, ()))
+            last_writer[table] = index
+            readers[table] = []
+        depends.discard(index)
+        dependencies.append(sorted(depends))
+        levels.append(1 + max(levels[d] for d in depends) if depends else 0)
+
+    stages: list[list[int]] = [[] for _ in range(max(levels, default=-1) + 1)]
+    for index, level in enumerate(levels):
+        stages[level].append(index)
+    return dependencies, stages
+
+
+def extract_script_lineage(
+    sql: str,
+    dialect: str | None = None,
+    workers: int | None = None,
+    executor: Executor | None = None,
+) -> ScriptLineage:
+    """Extract lineage for every statement of a script and how they depend on each other.
+
+    Statements are parsed independently, across a process pool of `workers`
+    when there are enough of them to pay for it (`workers` defaults to the
+    CPU count; `workers=1` parses in-process). Pass a long-lived `executor`
+    to reuse its processes instead of starting a pool per call. Raises
+    SqlglotError if any statement fails to parse.
+    """
+
+    statements = split_statements(sql, dialect)
+    if workers is None:
+        parallel = len(statements) >= PARALLEL_MIN_STATEMENTS
+        workers = (os.cpu_count() or 1) if parallel else 1
+    if workers > 1 and len(statements) > 1:
+        chunk_size = max(1, len(statements) // (workers * 4))
+        if executor is not None:
+            extractions = list(
+                executor.map(extract_lineage, statements, repeat(dialect), chunksize=chunk_size)
+            )
+        else:
+            with ProcessPoolExecutor(min(workers, len(statements))) as pool:
+                extractions = list(
+                    pool.map(extract_lineage, statements, repeat(dialect), chunksize=chunk_size)
+                )
+    else:
+        extractions = [extract_lineage(statement, dialect) for statement in statements]
+    dependencies, stages = build_dependencies(extractions)
+    return ScriptLineage(statements=extractions, dependencies=dependencies, stages=stages)
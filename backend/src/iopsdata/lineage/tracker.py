@@ -2,14 +2,18 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+import logging
+from bisect import bisect_left, insort
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import Any, Protocol
+from typing import Any, Protocol, runtime_checkable
 
 from iopsdata.db.supabase import SupabaseClientWrapper
-from iopsdata.lineage.models import LineageQuery, LineageRecord
+from iopsdata.lineage.models import LineagePage, LineageQuery, LineageRecord
 from iopsdata.lineage.parser import LineageExtraction, extract_lineage
 
+logger = logging.getLogger(__name__)
+
 
 class LineageStore(Protocol):
     """Persistence interface for lineage records."""
@@ -20,29 +24,123 @@ class LineageStore(Protocol):
     async def list(self, session_id: str) -> list[LineageRecord]:  # pragma: no cover - protocol
         ...
 
+    async def page(
+        self,
+        session_id: str,
+        since: datetime | None = None,
+        table: str | None = None,
+        cursor: str | None = None,
+        limit: int = 50,
+    ) -> LineagePage:  # pragma: no cover - protocol
+        ...
+
+
+@runtime_checkable
+class LineageSnapshotStore(Protocol):
+    """Optional persistence for tracker snapshots, implemented alongside LineageStore."""
+
+    async def save_snapshot(
+        self, session_id: str, snapshot: dict[str, Any]
+    ) -> None:  # pragma: no cover - protocol
+        ...
+
+    async def load_snapshot(
+        self, session_id: str
+    ) -> dict[str, Any] | None:  # pragma: no cover - protocol
+        ...
+
+
+def _created_at(record: LineageRecord) -> datetime:
+    return record.created_at
+
+
+def _tables_touched(query: LineageQuery) -> list[str]:
+    return sorted(set(query.tables_read) | set(query.tables_written))
+
 
 @dataclass
 class InMemoryLineageStore:
-    """In-memory lineage store for development/testing."""
+    """In-memory lineage store for development/testing.
+
+    Records are indexed by session and by (session, table touched), each
+    kept in `created_at` order, so a page is a slice of one index. Cursors
+    are positions in that index, which only grows at the end while
+    records arrive in time order.
+    """
 
     _records: list[LineageRecord]
+    _snapshots: dict[str, dict[str, Any]] = field(default_factory=dict)
+    _by_session: dict[str, list[LineageRecord]] = field(default_factory=dict, init=False)
+    _by_table: dict[tuple[str, str], list[LineageRecord]] = field(
+        default_factory=dict, init=False
+    )
+
+    def __post_init__(self) -> None:
+        for record in self._records:
+            self._index(record)
+
+    def _index(self, record: LineageRecord) -> None:
+        insort(self._by_session.setdefault(record.session_id, []), record, key=_created_at)
+        for table in _tables_touched(record.query):
+            index = self._by_table.setdefault((record.session_id, table), [])
+            insort(index, record, key=_created_at)
 
     async def save(self, record: LineageRecord) -> None:
         self._records.append(record)
+        self._index(record)
 
     async def list(self, session_id: str) -> list[LineageRecord]:
-        return [record for record in self._records if record.session_id == session_id]
+        return list(self._by_session.get(session_id, []))
+
+    async def page(
+        self,
+        session_id: str,
+        since: datetime | None = None,
+        table: str | None = None,
+        cursor: str | None = None,
+        limit: int = 50,
+    ) -> LineagePage:
+        if table is None:
+            records = self._by_session.get(session_id, [])
+        else:
+            records = self._by_table.get((session_id, table), [])
+        low = bisect_left(records, since, key=_created_at) if since is not None else 0
+        high = min(int(cursor), len(records)) if cursor else len(records)
+        start = max(low, high - max(1, limit))
+        return LineagePage(
+            records=records[start:high][::-1],
+            next_cursor=str(start) if start > low else None,
+        )
+
+    async def save_snapshot(self, session_id: str, snapshot: dict[str, Any]) -> None:
+        self._snapshots[session_id] = snapshot
+
+    async def load_snapshot(self, session_id: str) -> dict[str, Any] | None:
+        return self._snapshots.get(session_id)
 
 
 class SupabaseLineageStore:
     """Supabase-backed lineage store.
 
     The default table name assumes a `lineage_events` table with JSONB columns.
+    Records are saved through the client's write-behind buffer and
+    bulk-inserted in batches; reads flush pending records first. Each row
+    also stores the tables it touches in a `tables` array so `page` can
+    filter by table server-side, and pages are fetched with a keyset
+    cursor on `(created_at, id)`.
     """
 
-    def __init__(self, client: SupabaseClientWrapper, table_name: str = "lineage_events") -> None:
+    _COLUMNS = "id,session_id,created_at,query,dependencies,metadata"
+
+    def __init__(
+        self,
+        client: SupabaseClientWrapper,
+        table_name: str = "lineage_events",
+        snapshot_table: str = "lineage_snapshots",
+    ) -> None:
         self._client = client
         self._table = table_name
+        self._snapshot_table = snapshot_table
 
     async def save(self, record: LineageRecord) -> None:
         payload = {
@@ -51,43 +149,144 @@ class SupabaseLineageStore:
             "query": record.query.model_dump(),
             "dependencies": record.dependencies,
             "metadata": record.metadata,
+            "tables": _tables_touched(record.query),
         }
-        client = await self._client._get_client()
-        response = await client.table(self._table).insert(payload).execute()
-        if response.data is None:
-            raise RuntimeError("Failed to persist lineage record")
+        if not await self._client.batch_writer(self._table).put(payload):
+            logger.warning("Lineage buffer full; dropped record for session %s", record.session_id)
 
     async def list(self, session_id: str) -> list[LineageRecord]:
+        await self._client.batch_writer(self._table).flush()
         client = await self._client._get_client()
         response = (
             await client.table(self._table)
-            .select("*")
+            .select(self._COLUMNS)
             .eq("session_id", session_id)
             .order("created_at", desc=True)
             .execute()
         )
-        records: list[LineageRecord] = []
-        for item in response.data or []:
-            records.append(
-                LineageRecord(
-                    id=item.get("id"),
-                    session_id=item["session_id"],
-                    created_at=datetime.fromisoformat(item["created_at"]),
-                    query=LineageQuery(**item["query"]),
-                    dependencies=item.get("dependencies", []),
-                    metadata=item.get("metadata", {}),
-                )
+        return [self._to_record(item) for item in response.data or []]
+
+    async def page(
+        self,
+        session_id: str,
+        since: datetime | None = None,
+        table: str | None = None,
+        cursor: str | None = None,
+        limit: int = 50,
+    ) -> LineagePage:
+        await self._client.batch_writer(self._table).flush()
+        client = await self._client._get_client()
+        limit = max(1, limit)
+        query = client.table(self._table).select(self._COLUMNS).eq("session_id", session_id)
+        if since is not None:
+            query = query.gte("created_at", since.isoformat())
+        if table is not None:
+            query = query.contains("tables", [table])
+        if cursor:
+            created_at, _, last_id = cursor.partition("|")
+            query = query.or_(
+                f'created_at.lt."{created_at}",'
+                f'and(created_at.eq."{created_at}",id.lt.{last_id})'
             )
-        return records
+        response = await (
+            query.order("created_at", desc=True).order("id", desc=True).limit(limit + 1).execute()
+        )
+        rows = list(response.data or [])
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = f"{rows[-1]['created_at']}|{rows[-1]['id']}"
+        return LineagePage(
+            records=[self._to_record(item) for item in rows], next_cursor=next_cursor
+        )
+
+    @staticmethod
+    def _to_record(item: dict[str, Any]) -> LineageRecord:
+        return LineageRecord(
+            id=item.get("id"),
+            session_id=item["session_id"],
+            created_at=datetime.fromisoformat(item["created_at"]),
+            query=LineageQuery(**item["query"]),
+            dependencies=item.get("dependencies", []),
+            metadata=item.get("metadata", {}),
+        )
+
+    async def save_snapshot(self, session_id: str, snapshot: dict[str, Any]) -> None:
+        client = await self._client._get_client()
+        payload = {"session_id": session_id, "snapshot": snapshot}
+        await client.table(self._snapshot_table).upsert(payload, on_conflict="session_id").execute()
+
+    async def load_snapshot(self, session_id: str) -> dict[str, Any] | None:
+        client = await self._client._get_client()
+        response = (
+            await client.table(self._snapshot_table)
+            .select("snapshot")
+            .eq("session_id", session_id)
+            .execute()
+        )
+        return response.data[0]["snapshot"] if response.data else None
 
 
 class LineageTracker:
-    """Track SQL queries and persist lineage per session."""
+    """Track SQL queries and persist lineage per session.
+
+    Dependencies are resolved from an incremental index of the last
+    statement (by sequence number) that wrote each table, so `track()`
+    costs O(tables read) however long the session runs. With a store that
+    also implements LineageSnapshotStore, the index is persisted every
+    `snapshot_every` statements and `resume()` restores it, then replays
+    the statements tracked after it was taken.
+    """
+
+    # Page size used when replaying history newer than a snapshot.
+    _REPLAY_PAGE_SIZE = 500
 
-    def __init__(self, session_id: str, store: LineageStore | None = None) -> None:
+    def __init__(
+        self,
+        session_id: str,
+        store: LineageStore | None = None,
+        snapshot_every: int | None = None,
+    ) -> None:
         self.session_id = session_id
         self._store = store or InMemoryLineageStore([])
-        self._queries: list[LineageExtraction] = []
+        self._snapshot_every = snapshot_every
+        self._statements = 0
+        self._last_writer: dict[str, int] = {}
+        self._last_created_at: datetime | None = None
+
+    @classmethod
+    async def resume(
+        cls,
+        session_id: str,
+        store: LineageStore,
+        snapshot_every: int | None = None,
+    ) -> LineageTracker:
+        """Continue a session from its persisted snapshot, or by replaying its history.
+
+        Statements tracked after the snapshot was taken are replayed on top
+        of it, so resuming never loses writes between snapshots.
+        """
+
+        tracker = cls(session_id, store, snapshot_every)
+        snapshot = None
+        if isinstance(store, LineageSnapshotStore):
+            snapshot = await store.load_snapshot(session_id)
+        if snapshot is None:
+            records = sorted(await store.list(session_id), key=_created_at)
+        else:
+            tracker._statements = int(snapshot["statements"])
+            tracker._last_writer = dict(snapshot["last_writer"])
+            if snapshot.get("created_at"):
+                since = datetime.fromisoformat(snapshot["created_at"])
+                tracker._last_created_at = since
+                records = await tracker._records_after(since)
+            else:
+                # Snapshot without a timestamp: it covers the first `statements` records.
+                records = sorted(await store.list(session_id), key=_created_at)
+                records = records[tracker._statements :]
+        for record in records:
+            tracker._record_writes(record.query.tables_written, record.created_at)
+        return tracker
 
     async def track(self, sql: str, dialect: str | None = None, metadata: dict[str, Any] | None = None) -> LineageRecord:
         """Parse SQL, update dependencies, and persist lineage."""
@@ -109,7 +308,13 @@ class LineageTracker:
             metadata=metadata or {},
         )
         await self._store.save(record)
-        self._queries.append(extraction)
+        self._record_writes(extraction.tables_written, record.created_at)
+        if (
+            self._snapshot_every
+            and self._statements % self._snapshot_every == 0
+            and isinstance(self._store, LineageSnapshotStore)
+        ):
+            await self._store.save_snapshot(self.session_id, self.snapshot())
         return record
 
     async def history(self) -> list[LineageRecord]:
@@ -117,8 +322,59 @@ class LineageTracker:
 
         return await self._store.list(self.session_id)
 
+    async def history_page(
+        self,
+        since: datetime | None = None,
+        table: str | None = None,
+        cursor: str | None = None,
+        limit: int = 50,
+    ) -> LineagePage:
+        """Return one page of this session's history, newest first.
+
+        Pass the returned `next_cursor` back to fetch the following page.
+        """
+
+        return await self._store.page(self.session_id, since, table, cursor, limit)
+
+    def last_writer(self, table: str) -> int | None:
+        """Sequence number (1-based) of the latest tracked statement that wrote `table`."""
+
+        return self._last_writer.get(table)
+
+    def snapshot(self) -> dict[str, Any]:
+        """Serializable state needed to resume dependency resolution.
+
+        `created_at` is the timestamp of the last statement the state covers;
+        `resume()` replays anything newer.
+        """
+
+        created_at = self._last_created_at.isoformat() if self._last_created_at else None
+        return {
+            "statements": self._statements,
+            "last_writer": dict(self._last_writer),
+            "created_at": created_at,
+        }
+
+    async def _records_after(self, since: datetime) -> list[LineageRecord]:
+        """Return this session's records created after `since`, oldest first."""
+
+        records: list[LineageRecord] = []
+        cursor = None
+        while True:
+            page = await self._store.page(
+                self.session_id, since=since, cursor=cursor, limit=self._REPLAY_PAGE_SIZE
+            )
+            records.extend(record for record in page.records if record.created_at > since)
+            cursor = page.next_cursor
+            if cursor is None:
+                return sorted(records, key=_created_at)
+
+    def _record_writes(self, tables_written: list[str], created_at: datetime) -> None:
+        self._statements += 1
+        self._last_created_at = created_at
+        for table in tables_written:
+            self._last_writer[table] = self._statements
+
     def _resolve_dependencies(self, extraction: LineageExtraction) -> list[str]:
-        dependencies: set[str] = set()
-        written_tables = {table for item in self._queries for table in item.tables_written}
-        dependencies.update(written_tables.intersection(set(extraction.tables_read)))
-        return sorted(dependencies)
+        last_writer = self._last_writer
+        return sorted(table for table in extraction.tables_read if table in last_writer)
@@ -1,15 +1,26 @@
 """LLM provider interfaces and routing utilities."""
 
 from iopsdata.llm.base import BaseLLMProvider, LLMProviderError, LLMResponse, RateLimitError
+from iopsdata.llm.health import ProviderHealthRegistry, provider_health
+from iopsdata.llm.hedging import LatencyTracker, generate_hedged, latency_tracker
 from iopsdata.llm.router import configured_providers, generate_with_fallback, get_provider, stream_with_fallback
+from iopsdata.llm.usage import UsageRecord, UsageRecorder, usage_recorder
 
 __all__ = [
     "BaseLLMProvider",
+    "LatencyTracker",
     "LLMProviderError",
     "LLMResponse",
+    "ProviderHealthRegistry",
     "RateLimitError",
+    "UsageRecord",
+    "UsageRecorder",
     "configured_providers",
+    "generate_hedged",
     "generate_with_fallback",
     "get_provider",
+    "latency_tracker",
+    "provider_health",
     "stream_with_fallback",
+    "usage_recorder",
 ]
@@ -2,9 +2,21 @@
 
 from __future__ import annotations
 
+import json
+import os
+import time
 from abc import ABC, abstractmethod
+from collections.abc import AsyncIterable, AsyncIterator, Mapping
 from dataclasses import dataclass
-from typing import Any, AsyncIterator
+from email.utils import parsedate_to_datetime
+from typing import Any, ClassVar
+
+import httpx
+
+from iopsdata.utils.rate_limit import estimate_tokens, get_provider_limiter
+
+# Upper bound for a speculative connection warm-up request.
+WARMUP_TIMEOUT_S = 5.0
 
 
 class LLMProviderError(RuntimeError):
@@ -14,6 +26,26 @@ class LLMProviderError(RuntimeError):
 class RateLimitError(LLMProviderError):
     """Raised when a provider returns a rate-limit response."""
 
+    def __init__(self, message: str, retry_after: float | None = None) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> float | None:
+    """Return the `Retry-After` delay in seconds from response headers, if present."""
+
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
 
 @dataclass
 class LLMResponse:
@@ -25,14 +57,155 @@ class LLMResponse:
     prompt_tokens: int | None = None
     completion_tokens: int | None = None
     total_tokens: int | None = None
+    cached_tokens: int | None = None
+    latency_ms: float | None = None
     raw: Any | None = None
 
 
+@dataclass(slots=True)
+class StreamEvent:
+    """One decoded server-sent event."""
+
+    data: str
+    event: str = "message"
+    id: str | None = None
+
+    def json(self) -> Any:
+        return json.loads(self.data)
+
+
+@dataclass
+class StreamResult:
+    """Finish reason and token usage reported at the end of a streamed completion."""
+
+    finish_reason: str | None = None
+    prompt_tokens: int | None = None
+    completion_tokens: int | None = None
+    total_tokens: int | None = None
+    cached_tokens: int | None = None
+
+
+class SSEDecoder:
+    """Incremental `text/event-stream` decoder.
+
+    Accepts arbitrary text chunks (frames may be split anywhere, including
+    between CR and LF) and returns complete events. Handles LF, CRLF and CR
+    line endings, multi-line `data:` fields, `event:`/`id:` fields and
+    comment lines such as keep-alives.
+    """
+
+    __slots__ = ("_buffer", "_id", "_skip_lf")
+
+    def __init__(self) -> None:
+        self._buffer = ""
+        self._id: str | None = None
+        self._skip_lf = False
+
+    def feed(self, chunk: str) -> list[StreamEvent]:
+        if self._skip_lf and chunk.startswith("\n"):
+            chunk = chunk[1:]
+        self._skip_lf = False
+        buffer = self._buffer + chunk if self._buffer else chunk
+        if "\r" in buffer:
+            # A trailing CR may be the first half of a CRLF split across chunks.
+            self._skip_lf = buffer.endswith("\r")
+            buffer = buffer.replace("\r\n", "\n").replace("\r", "\n")
+        frames = buffer.split("\n\n")
+        self._buffer = frames.pop()
+
+        events: list[StreamEvent] = []
+        for frame in frames:
+            if frame.startswith("data:") and "\n" not in frame:
+                # Hot path: LLM streams send one single-line `data:` frame per token.
+                events.append(StreamEvent(frame[6:] if frame[5:6] == " " else frame[5:]))
+            elif frame:
+                event = self._parse_frame(frame)
+                if event is not None:
+                    events.append(event)
+        return events
+
+    def _parse_frame(self, frame: str) -> StreamEvent | None:
+        data: list[str] = []
+        event_type = "message"
+        for line in frame.strip("\n").split("\n"):
+            if not line or line[0] == ":":
+                continue
+            field, _, value = line.partition(":")
+            if value[:1] == " ":
+                value = value[1:]
+            if field == "data":
+                data.append(value)
+            elif field == "event":
+                event_type = value
+            elif field == "id":
+                self._id = value
+        if not data:
+            return None
+        return StreamEvent("\n".join(data), event_type, self._id)
+
+    def finish(self) -> list[StreamEvent]:
+        """Flush a final event that was not followed by a blank line."""
+
+        events = self.feed("\n\n") if self._buffer.strip("\n") else []
+        self._buffer = ""
+        return events
+
+
+async def iter_sse(chunks: AsyncIterable[str]) -> AsyncIterator[StreamEvent]:
+    """Decode server-sent events from a stream of text chunks."""
+
+    decoder = SSEDecoder()
+    async for chunk in chunks:
+        for event in decoder.feed(chunk):
+            yield event
+    for event in decoder.finish():
+        yield event
+
+
+async def iter_ndjson(chunks: AsyncIterable[str]) -> AsyncIterator[Any]:
+    """Decode newline-delimited JSON objects from a stream of text chunks."""
+
+    buffer = ""
+    async for chunk in chunks:
+        buffer += chunk
+        if "\n" not in chunk:
+            continue
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    if buffer.strip():
+        yield json.loads(buffer)
+
+
 class BaseLLMProvider(ABC):
     """Abstract base class for all LLM providers."""
 
+    # Model used when none is passed to the constructor.
+    default_model: ClassVar[str] = ""
+    # Environment variable holding the API key; None when no key is needed.
+    api_key_env: ClassVar[str | None] = None
+
+    @classmethod
+    def env_configured(cls) -> bool:
+        """Return True if the environment configures this provider.
+
+        Unlike `is_configured`, this needs no instance, so routing can rank
+        providers without opening an HTTP client per candidate.
+        """
+
+        return cls.api_key_env is None or bool(os.getenv(cls.api_key_env))
+
+    @classmethod
+    def env_model(cls) -> str:
+        """Model an instance built without arguments will use."""
+
+        return cls.default_model
+
     def __init__(self, model: str) -> None:
         self.model = model
+        # Set by `stream()` once the upstream reports how the completion ended.
+        self.stream_result: StreamResult | None = None
 
     @property
     @abstractmethod
@@ -45,7 +218,12 @@ class BaseLLMProvider(ABC):
 
     @abstractmethod
     async def generate(self, prompt: str, **kwargs: Any) -> LLMResponse:
-        """Generate a completion response for the given prompt."""
+        """Generate a completion response for the given prompt.
+
+        A `prefix` keyword carries the stable part of the prompt (instructions
+        and schema context). Providers send it ahead of `prompt` in a form the
+        upstream API can cache and report cache hits in `cached_tokens`.
+        """
 
     async def stream(self, prompt: str, **kwargs: Any) -> AsyncIterator[str]:
         """Stream tokens for the given prompt when supported."""
@@ -57,3 +235,62 @@ class BaseLLMProvider(ABC):
         """Close any underlying HTTP clients."""
 
         return None
+
+    async def warmup(self) -> None:
+        """Open the upstream connection ahead of the first request; a no-op by default."""
+
+        return None
+
+    async def _warm_connection(self, client: httpx.AsyncClient, url: str) -> None:
+        """Establish a pooled (TLS) connection to `url`, ignoring the response and any errors."""
+
+        try:
+            await client.head(url, timeout=WARMUP_TIMEOUT_S)
+        except httpx.HTTPError:
+            pass
+
+    async def _throttle(self, prompt: str, **kwargs: Any) -> int:
+        """Wait for this provider's client-side rate budget and return the token estimate.
+
+        Bursts queue here (optionally in a `priority` lane) instead of failing
+        with provider-side 429s.
+        """
+
+        text = f"{kwargs.get('prefix') or ''}{prompt}"
+        estimate = estimate_tokens(text) + int(kwargs.get("max_tokens") or 512)
+        limiter = get_provider_limiter(self.name)
+        if limiter is not None:
+            await limiter.acquire(estimate, priority=int(kwargs.get("priority", 0)))
+        return estimate
+
+    def _chat_messages(self, prompt: str, prefix: str | None) -> list[dict[str, Any]]:
+        """Build chat messages with the cacheable prefix as a leading system message."""
+
+        messages: list[dict[str, Any]] = [{"role": "system", "content": prefix}] if prefix else []
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
+    def _settle(self, estimate: int, response: LLMResponse) -> LLMResponse:
+        """Report actual token usage back to the limiter."""
+
+        limiter = get_provider_limiter(self.name)
+        if limiter is not None:
+            limiter.settle(estimate, response.total_tokens)
+        return response
+
+    def _finish_stream(self, estimate: int, result: StreamResult) -> None:
+        """Record how a stream ended and report its token usage to the limiter."""
+
+        self.stream_result = result
+        limiter = get_provider_limiter(self.name)
+        if limiter is not None:
+            limiter.settle(estimate, result.total_tokens)
+
+    def _rate_limit_error(self, message: str, headers: Mapping[str, str]) -> RateLimitError:
+        """Build a RateLimitError and pause the local limiter for the server's Retry-After."""
+
+        retry_after = parse_retry_after(headers)
+        limiter = get_provider_limiter(self.name)
+        if limiter is not None and retry_after:
+            limiter.penalize(retry_after)
+        return RateLimitError(message, retry_after=retry_after)
@@ -2,21 +2,47 @@
 
 from iopsdata.llm.context.prompt_templates import (
     EXPLANATION_PROMPT,
+    FIX_ERROR_PREFIX,
     FIX_ERROR_PROMPT,
+    FIX_ERROR_SUFFIX,
+    FOLLOW_UP_PREFIX,
     FOLLOW_UP_PROMPT,
+    FOLLOW_UP_SUFFIX,
+    SQL_GENERATION_PREFIX,
     SQL_GENERATION_PROMPT,
+    SQL_GENERATION_SUFFIX,
 )
-from iopsdata.llm.context.schema_builder import ColumnSpec, TableSpec, build_schema_context, table_from_dict
-from iopsdata.llm.context.sql_extractor import extract_sql_from_response
+from iopsdata.llm.context.schema_builder import (
+    ColumnSpec,
+    SchemaContext,
+    TableSpec,
+    build_schema_context,
+    compile_schema_context,
+    schema_fingerprint,
+    table_from_dict,
+)
+from iopsdata.llm.context.sql_extractor import StreamingSQLExtractor, extract_sql_from_response
+from iopsdata.llm.context.sql_validator import validate_sql_against_schema
 
 __all__ = [
     "ColumnSpec",
+    "SchemaContext",
+    "StreamingSQLExtractor",
     "TableSpec",
     "build_schema_context",
+    "compile_schema_context",
+    "schema_fingerprint",
     "table_from_dict",
     "extract_sql_from_response",
+    "validate_sql_against_schema",
     "SQL_GENERATION_PROMPT",
+    "SQL_GENERATION_PREFIX",
+    "SQL_GENERATION_SUFFIX",
     "EXPLANATION_PROMPT",
     "FIX_ERROR_PROMPT",
+    "FIX_ERROR_PREFIX",
+    "FIX_ERROR_SUFFIX",
     "FOLLOW_UP_PROMPT",
+    "FOLLOW_UP_PREFIX",
+    "FOLLOW_UP_SUFFIX",
 ]
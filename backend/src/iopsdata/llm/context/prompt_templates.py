@@ -1,6 +1,13 @@
-"""Prompt templates for schema-aware SQL generation."""
+"""Prompt templates for schema-aware SQL generation.
 
-SQL_GENERATION_PROMPT = """
+Templates that embed the schema context are split into a `*_PREFIX` holding
+the instructions and schema, which is identical across requests for the same
+connection and can be cached by providers, and a `*_SUFFIX` with the
+per-request text. The combined `*_PROMPT` strings are kept for single-message
+use.
+"""
+
+SQL_GENERATION_PREFIX = """
 You are an expert analytics engineer. Generate a single SQL query that answers the user's request.
 Use only the tables and columns provided in the schema context.
 Follow the dialect-specific guidance and include explicit JOINs with clear aliases.
@@ -9,11 +16,15 @@ Return ONLY SQL without explanations.
 
 Schema Context:
 {schema_context}
+""".strip()
 
+SQL_GENERATION_SUFFIX = """
 User Request:
 {user_request}
 """.strip()
 
+SQL_GENERATION_PROMPT = f"{SQL_GENERATION_PREFIX}\n\n{SQL_GENERATION_SUFFIX}"
+
 EXPLANATION_PROMPT = """
 You are a helpful data analyst. Explain what the SQL query does in clear steps,
 including tables used, joins, filters, and aggregations. Avoid speculation.
@@ -22,13 +33,15 @@ SQL:
 {sql_query}
 """.strip()
 
-FIX_ERROR_PROMPT = """
+FIX_ERROR_PREFIX = """
 You are an expert SQL debugger. Fix the SQL based on the error message.
 Return ONLY the corrected SQL.
 
 Schema Context:
 {schema_context}
+""".strip()
 
+FIX_ERROR_SUFFIX = """
 Failed SQL:
 {sql_query}
 
@@ -36,16 +49,22 @@ Error:
 {error_message}
 """.strip()
 
-FOLLOW_UP_PROMPT = """
+FIX_ERROR_PROMPT = f"{FIX_ERROR_PREFIX}\n\n{FIX_ERROR_SUFFIX}"
+
+FOLLOW_UP_PREFIX = """
 You are an expert analytics engineer. Continue the conversation and answer the follow-up request.
 Use the recent queries for continuity and return ONLY SQL.
 
 Schema Context:
 {schema_context}
+""".strip()
 
+FOLLOW_UP_SUFFIX = """
 Conversation History:
 {conversation_history}
 
 Follow-up Request:
 {user_request}
 """.strip()
+
+FOLLOW_UP_PROMPT = f"{FOLLOW_UP_PREFIX}\n\n{FOLLOW_UP_SUFFIX}"
@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+import hashlib
+import json
 from collections import Counter
 from dataclasses import dataclass
 from typing import Any
@@ -30,6 +32,17 @@ class TableSpec:
     relationships: list[str] | None = None
 
 
+@dataclass(frozen=True)
+class SchemaContext:
+    """Rendered schema context for a specific schema fingerprint, dialect and budget."""
+
+    fingerprint: str
+    dialect: str
+    max_tables: int
+    tables: tuple[TableSpec, ...]
+    text: str
+
+
 def _dialect_hints(dialect: str) -> str:
     hints = {
         "postgresql": "Use PostgreSQL syntax, double quotes for identifiers, and ILIKE for case-insensitive matches.",
@@ -133,3 +146,28 @@ def table_from_dict(table: dict[str, Any]) -> TableSpec:
         columns=columns,
         relationships=table.get("relationships"),
     )
+
+
+def schema_fingerprint(schema: list[dict[str, Any]]) -> str:
+    """Return a stable hash of a raw schema payload."""
+
+    payload = json.dumps(schema, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+def compile_schema_context(
+    schema: list[dict[str, Any]],
+    dialect: str = "postgresql",
+    max_tables: int = 25,
+    fingerprint: str | None = None,
+) -> SchemaContext:
+    """Convert a raw schema payload into TableSpecs and render its prompt context once."""
+
+    tables = tuple(table_from_dict(table) for table in schema)
+    return SchemaContext(
+        fingerprint=fingerprint or schema_fingerprint(schema),
+        dialect=dialect.lower(),
+        max_tables=max_tables,
+        tables=tables,
+        text=build_schema_context(list(tables), dialect=dialect, max_tables=max_tables),
+    )
@@ -6,6 +6,11 @@ import re
 from typing import Iterable
 
 SQL_START = re.compile(r"\b(select|with|insert|update|delete)\b", re.IGNORECASE)
+SQL_LEADING = re.compile(r"\s*(select|with|insert|update|delete)\b", re.IGNORECASE)
+SQL_LINE_START = re.compile(
+    r"^\s*(select|with|insert|update|delete)\b",
+    re.IGNORECASE | re.MULTILINE,
+)
 CODE_BLOCK = re.compile(r"```(?:sql)?\n(.*?)```", re.DOTALL | re.IGNORECASE)
 
 
@@ -58,3 +63,54 @@ def extract_sql_from_response(text: str) -> str | None:
                 return _normalize_sql(snippet)
 
     return None
+
+
+class StreamingSQLExtractor:
+    """Incrementally detect the end of the SQL statement in a streamed response.
+
+    Chunks are fed as they arrive; `feed` returns the normalized SQL as soon as
+    a fenced code block closes or a bare statement is terminated, so callers can
+    act on it before the model finishes its reply. A bare statement is only
+    accepted when the response itself starts with SQL, so prose mentioning
+    "select ...;" never wins over a fenced block that follows it.
+    """
+
+    def __init__(self) -> None:
+        self._text = ""
+        self.sql: str | None = None
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    def feed(self, chunk: str) -> str | None:
+        """Append a chunk and return the SQL the first time it becomes complete."""
+
+        self._text += chunk
+        if self.sql is not None or not any(marker in chunk for marker in ("`", ";")):
+            return None
+
+        if "```" in self._text:
+            match = CODE_BLOCK.search(self._text)
+            if match:
+                self.sql = extract_sql_from_response(match.group(0))
+            return self.sql
+
+        if not SQL_LEADING.match(self._text):
+            return None
+
+        end = self._text.rfind(";")
+        candidate = self._text[: end + 1]
+        if end >= 0 and candidate.count("'") % 2 == 0:
+            self.sql = extract_sql_from_response(candidate)
+        return self.sql
+
+    def finish(self) -> str | None:
+        """Return SQL from the complete response once the stream has ended, if any."""
+
+        if self.sql is not None:
+            return self.sql
+        match = CODE_BLOCK.search(self._text) or SQL_LINE_START.search(self._text)
+        if match:
+            self.sql = extract_sql_from_response(self._text[match.start():])
+        return self.sql
@@ -0,0 +1,129 @@
+"""Cheap static validation of generated SQL against a cached schema."""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+
+from sqlglot import expressions as exp
+from sqlglot.errors import SqlglotError
+
+from iopsdata.lineage.parse_cache import parse_sql
+from iopsdata.llm.context.schema_builder import TableSpec
+
+# Prompt dialect names that sqlglot spells differently.
+SQLGLOT_DIALECTS = {"postgresql": "postgres"}
+
+# Catalog schemas every database provides but the cached schema never lists.
+SYSTEM_SCHEMAS = frozenset(
+    {"information_schema", "pg_catalog", "mysql", "performance_schema", "sys", "sqlite_schema"}
+)
+# Catalog tables that resolve without a schema qualifier (search path, SQLite).
+SYSTEM_TABLE_PREFIXES = ("pg_", "sqlite_")
+
+
+def sqlglot_dialect(dialect: str | None) -> str | None:
+    """Map a prompt dialect name onto the sqlglot dialect name."""
+
+    if not dialect:
+        return None
+    return SQLGLOT_DIALECTS.get(dialect.lower(), dialect.lower())
+
+
+def _table_key(table: exp.Table) -> str:
+    return f"{table.db}.{table.name}".lower() if table.db else table.name.lower()
+
+
+def _is_system_table(table: exp.Table) -> bool:
+    if table.db:
+        return table.db.lower() in SYSTEM_SCHEMAS
+    return table.name.lower().startswith(SYSTEM_TABLE_PREFIXES)
+
+
+def _derived_sources(parsed: exp.Expression) -> list[exp.Expression]:
+    """FROM-clause sources whose columns the cached schema cannot know."""
+
+    return [
+        node
+        for node in parsed.find_all(exp.Subquery, exp.Lateral, exp.Unnest, exp.Values)
+        if not (isinstance(node, exp.Values) and isinstance(node.parent, exp.Insert))
+    ]
+
+
+def _index_tables(tables: Sequence[TableSpec]) -> dict[str, TableSpec]:
+    index: dict[str, TableSpec] = {}
+    for table in tables:
+        name = table.name.lower()
+        index[name] = table
+        # Allow unqualified references to schema-qualified tables (public.users -> users).
+        index.setdefault(name.rsplit(".", 1)[-1], table)
+    return index
+
+
+def validate_sql_against_schema(
+    sql: str,
+    tables: Sequence[TableSpec],
+    dialect: str | None = None,
+) -> list[str]:
+    """Return problems found by checking SQL against known tables and columns.
+
+    Only definite problems are reported: references to unknown tables, and
+    columns missing from every table they could resolve to. Anything that
+    cannot be resolved statically (derived tables, VALUES lists, table
+    functions, system catalogs, SQL that sqlglot cannot parse) is left to
+    the database, e.g. via `EXPLAIN`.
+    """
+
+    try:
+        parsed = parse_sql(sql, sqlglot_dialect(dialect), copy=False)
+    except SqlglotError:
+        return []
+    if parsed is None:
+        return []
+
+    known = _index_tables(tables)
+    ctes = {cte.alias_or_name.lower() for cte in parsed.find_all(exp.CTE)}
+    problems: list[str] = []
+
+    sources: dict[str, TableSpec] = {}
+    fully_resolved = True
+    for table in parsed.find_all(exp.Table):
+        key = _table_key(table)
+        if key in ctes or _is_system_table(table):
+            fully_resolved = False
+            continue
+        spec = known.get(key) or (None if table.db else known.get(table.name.lower()))
+        if spec is None:
+            if table.name:
+                problems.append(f"Unknown table: {_table_key(table)}")
+            fully_resolved = False
+            continue
+        sources[table.alias_or_name.lower()] = spec
+        sources.setdefault(table.name.lower(), spec)
+    derived_sources = _derived_sources(parsed)
+    derived = {node.alias.lower() for node in derived_sources if node.alias}
+    if derived_sources:
+        fully_resolved = False
+
+    aliases = {alias.alias.lower() for alias in parsed.find_all(exp.Alias)}
+    available = {
+        column.name.lower() for spec in sources.values() for column in spec.columns
+    }
+    reported: set[str] = set()
+    for column in parsed.find_all(exp.Column):
+        name = column.name.lower()
+        if not name or isinstance(column.this, exp.Star):
+            continue
+        qualifier = column.table.lower()
+        if qualifier:
+            spec = None if qualifier in derived else sources.get(qualifier)
+            if spec is None or name in {col.name.lower() for col in spec.columns}:
+                continue
+            label = f"{column.table}.{column.name}"
+        else:
+            if not fully_resolved or name in available or name in aliases:
+                continue
+            label = column.name
+        if label not in reported:
+            reported.add(label)
+            problems.append(f"Unknown column: {label}")
+    return problems
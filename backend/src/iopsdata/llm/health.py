@@ -0,0 +1,133 @@
+"""Live provider health tracking for adaptive LLM routing."""
+
+from __future__ import annotations
+
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+
+# Relative cost of a typical NL-to-SQL call; lower is cheaper.
+PROVIDER_COST_RANK: dict[str, int] = {
+    "mock": 0,
+    "ollama": 0,
+    "groq": 1,
+    "gemini": 1,
+    "openrouter": 2,
+    "openai": 2,
+    "anthropic": 3,
+}
+
+
+@dataclass
+class ProviderHealth:
+    """Rolling health statistics for one provider/model pair."""
+
+    ewma_latency_s: float | None = None
+    success_rate: float = 1.0
+    consecutive_failures: int = 0
+    cooldown_until: float = 0.0
+    open_until: float | None = None
+    probe_started: float | None = None
+
+    @property
+    def circuit_open(self) -> bool:
+        return self.open_until is not None
+
+
+class ProviderHealthRegistry:
+    """Track EWMA latency, success rate, rate-limit cooldowns and circuit state.
+
+    A provider's circuit opens after `failure_threshold` consecutive failures
+    and rejects traffic for `open_duration_s`; afterwards a single half-open
+    probe is let through and its outcome closes or re-opens the circuit. An
+    abandoned probe (e.g. a cancelled hedge) frees its slot after the same
+    duration. Rate limits put the provider into a cooldown derived from
+    `Retry-After`.
+    """
+
+    def __init__(
+        self,
+        alpha: float = 0.2,
+        failure_threshold: int = 3,
+        open_duration_s: float = 30.0,
+        default_cooldown_s: float = 10.0,
+        healthy_success_rate: float = 0.8,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._alpha = alpha
+        self._failure_threshold = failure_threshold
+        self._open_duration_s = open_duration_s
+        self._default_cooldown_s = default_cooldown_s
+        self._healthy_success_rate = healthy_success_rate
+        self._clock = clock
+        self._health: dict[tuple[str, str], ProviderHealth] = {}
+
+    def get(self, provider: str, model: str) -> ProviderHealth:
+        return self._health.setdefault((provider, model), ProviderHealth())
+
+    def record_success(self, provider: str, model: str, latency_s: float) -> None:
+        health = self.get(provider, model)
+        if health.ewma_latency_s is None:
+            health.ewma_latency_s = latency_s
+        else:
+            health.ewma_latency_s += self._alpha * (latency_s - health.ewma_latency_s)
+        health.success_rate += self._alpha * (1.0 - health.success_rate)
+        health.consecutive_failures = 0
+        health.open_until = None
+        health.probe_started = None
+
+    def record_failure(self, provider: str, model: str) -> None:
+        health = self.get(provider, model)
+        health.success_rate -= self._alpha * health.success_rate
+        health.consecutive_failures += 1
+        probing = health.probe_started is not None
+        if probing or health.consecutive_failures >= self._failure_threshold:
+            health.open_until = self._clock() + self._open_duration_s
+        health.probe_started = None
+
+    def record_rate_limit(self, provider: str, model: str, retry_after: float | None) -> None:
+        health = self.get(provider, model)
+        health.success_rate -= self._alpha * health.success_rate
+        delay = retry_after if retry_after is not None else self._default_cooldown_s
+        health.cooldown_until = max(health.cooldown_until, self._clock() + delay)
+        health.probe_started = None
+
+    def is_available(self, provider: str, model: str) -> bool:
+        """Return True if a request could be sent right now."""
+
+        health = self.get(provider, model)
+        now = self._clock()
+        if health.cooldown_until > now:
+            return False
+        if health.open_until is None:
+            return True
+        if health.open_until > now:
+            return False
+        probe_started = health.probe_started
+        return probe_started is None or now - probe_started >= self._open_duration_s
+
+    def acquire(self, provider: str, model: str) -> bool:
+        """Like `is_available`, but claims the half-open probe slot when the circuit is open."""
+
+        if not self.is_available(provider, model):
+            return False
+        health = self.get(provider, model)
+        if health.open_until is not None:
+            health.probe_started = self._clock()
+        return True
+
+    def rank(self, candidates: list[tuple[str, str]]) -> list[tuple[str, str]]:
+        """Order provider/model pairs by health tier, cost, then expected latency."""
+
+        def key(candidate: tuple[str, str]) -> tuple[int, int, float]:
+            health = self.get(*candidate)
+            unhealthy = int(health.success_rate < self._healthy_success_rate)
+            cost = PROVIDER_COST_RANK.get(candidate[0], len(PROVIDER_COST_RANK))
+            # Unknown latency sorts ahead of slow providers so new ones get sampled.
+            latency = health.ewma_latency_s or 0.0
+            return unhealthy, cost, latency / max(health.success_rate, 0.05)
+
+        return sorted(candidates, key=key)
+
+
+provider_health = ProviderHealthRegistry()
@@ -0,0 +1,168 @@
+"""Hedged LLM requests that race providers to cut tail latency."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from collections import deque
+from collections.abc import Callable
+from typing import Any
+
+from iopsdata.llm.base import BaseLLMProvider, LLMProviderError, LLMResponse, RateLimitError
+from iopsdata.llm.context.sql_extractor import extract_sql_from_response
+from iopsdata.llm.health import provider_health
+from iopsdata.llm.router import get_provider
+from iopsdata.llm.usage import usage_recorder
+
+
+class LatencyTracker:
+    """Sliding window of successful response latencies per provider."""
+
+    def __init__(self, window: int = 200, default_delay_s: float = 2.0) -> None:
+        self._window = window
+        self._default_delay_s = default_delay_s
+        self._samples: dict[str, deque[float]] = {}
+
+    def record(self, provider: str, seconds: float) -> None:
+        samples = self._samples.setdefault(provider, deque(maxlen=self._window))
+        samples.append(seconds)
+
+    def percentile(self, provider: str, q: float) -> float | None:
+        """Return the q-th percentile (0-1) latency, or None without samples."""
+
+        samples = self._samples.get(provider)
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+        return ordered[index]
+
+    def hedge_delay(
+        self,
+        provider: str,
+        q: float,
+        floor_s: float = 0.1,
+        ceiling_s: float = 10.0,
+    ) -> float:
+        """Return how long to wait on a provider before firing a hedge request."""
+
+        observed = self.percentile(provider, q)
+        delay = self._default_delay_s if observed is None else observed
+        return min(ceiling_s, max(floor_s, delay))
+
+
+latency_tracker = LatencyTracker()
+
+
+def _has_sql(response: LLMResponse) -> bool:
+    return extract_sql_from_response(response.content) is not None
+
+
+async def _timed_generate(
+    provider: BaseLLMProvider,
+    prompt: str,
+    tracker: LatencyTracker,
+    **kwargs: Any,
+) -> LLMResponse:
+    started = time.perf_counter()
+    try:
+        response = await provider.generate(prompt, **kwargs)
+    except RateLimitError as exc:
+        provider_health.record_rate_limit(provider.name, provider.model, exc.retry_after)
+        usage_recorder.record_failure(
+            provider.name, provider.model, (time.perf_counter() - started) * 1000
+        )
+        raise
+    except LLMProviderError:
+        provider_health.record_failure(provider.name, provider.model)
+        usage_recorder.record_failure(
+            provider.name, provider.model, (time.perf_counter() - started) * 1000
+        )
+        raise
+    else:
+        elapsed = time.perf_counter() - started
+        tracker.record(provider.name, elapsed)
+        provider_health.record_success(provider.name, provider.model, elapsed)
+        response.latency_ms = elapsed * 1000
+        return response
+    finally:
+        # Runs on cancellation too, so losing requests release their clients.
+        await provider.close()
+
+
+async def generate_hedged(
+    prompt: str,
+    providers: list[str],
+    percentile: float | None = None,
+    hedge_delay_s: float | None = None,
+    validate: Callable[[LLMResponse], bool] = _has_sql,
+    tracker: LatencyTracker | None = None,
+    **kwargs: Any,
+) -> LLMResponse:
+    """Generate with hedged requests across configured providers.
+
+    The first provider starts immediately. If it has not answered within its
+    adaptive hedge delay (the tracked latency percentile, or `hedge_delay_s`
+    when given), the next configured provider is fired in parallel; a failure
+    launches the next one right away. The first response passing `validate`
+    wins and the remaining requests are cancelled.
+    """
+
+    tracker = tracker or latency_tracker
+    if percentile is None:
+        percentile = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+
+    candidates: deque[BaseLLMProvider] = deque()
+    for name in providers:
+        provider = get_provider(name)
+        if provider.is_configured() and provider_health.is_available(provider.name, provider.model):
+            candidates.append(provider)
+        else:
+            await provider.close()
+    if not candidates:
+        raise LLMProviderError("No configured providers available")
+
+    pending: set[asyncio.Task[LLMResponse]] = set()
+    last_error: Exception | None = None
+    delay = 0.0
+
+    def _launch() -> None:
+        nonlocal delay
+        provider = candidates.popleft()
+        provider_health.acquire(provider.name, provider.model)
+        pending.add(asyncio.create_task(_timed_generate(provider, prompt, tracker, **kwargs)))
+        delay = hedge_delay_s if hedge_delay_s is not None else tracker.hedge_delay(
+            provider.name, percentile
+        )
+
+    try:
+        _launch()
+        while pending:
+            done, _ = await asyncio.wait(
+                pending,
+                timeout=delay if candidates else None,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            for task in done:
+                pending.discard(task)
+                if task.exception() is not None:
+                    last_error = task.exception()
+                    continue
+                response = task.result()
+                if validate(response):
+                    return response
+                last_error = LLMProviderError(f"{response.provider} returned no valid SQL")
+            # Hedge on timeout, fail over immediately when everything in flight failed.
+            if candidates and (not done or not pending):
+                _launch()
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for provider in candidates:
+            await provider.close()
+
+    if last_error:
+        raise last_error
+    raise LLMProviderError("No configured providers available")
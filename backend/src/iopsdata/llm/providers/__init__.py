@@ -3,6 +3,7 @@
 from iopsdata.llm.providers.anthropic import AnthropicProvider
 from iopsdata.llm.providers.gemini import GeminiProvider
 from iopsdata.llm.providers.groq import GroqProvider
+from iopsdata.llm.providers.mock import MockProvider
 from iopsdata.llm.providers.ollama import OllamaProvider
 from iopsdata.llm.providers.openai import OpenAIProvider
 from iopsdata.llm.providers.openrouter import OpenRouterProvider
@@ -11,6 +12,7 @@ __all__ = [
     "AnthropicProvider",
     "GeminiProvider",
     "GroqProvider",
+    "MockProvider",
     "OllamaProvider",
     "OpenAIProvider",
     "OpenRouterProvider",
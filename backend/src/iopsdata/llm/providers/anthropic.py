@@ -2,21 +2,29 @@
 
 from __future__ import annotations
 
-import json
 import os
 from typing import Any, AsyncIterator
 
 import httpx
 
-from iopsdata.llm.base import BaseLLMProvider, LLMProviderError, LLMResponse, RateLimitError
+from iopsdata.llm.base import (
+    BaseLLMProvider,
+    LLMProviderError,
+    LLMResponse,
+    StreamResult,
+    iter_sse,
+)
 
 
 class AnthropicProvider(BaseLLMProvider):
     """Anthropic provider for Claude models."""
 
-    def __init__(self, model: str = "claude-3-haiku-20240307") -> None:
-        super().__init__(model=model)
-        self._api_key = os.getenv("ANTHROPIC_API_KEY")
+    default_model = "claude-3-haiku-20240307"
+    api_key_env = "ANTHROPIC_API_KEY"
+
+    def __init__(self, model: str | None = None) -> None:
+        super().__init__(model=model or self.default_model)
+        self._api_key = os.getenv(self.api_key_env)
         self._base_url = os.getenv("ANTHROPIC_BASE_URL", "https://api.anthropic.com/v1")
         self._client = httpx.AsyncClient(timeout=30)
 
@@ -27,15 +35,28 @@ class AnthropicProvider(BaseLLMProvider):
     def is_configured(self) -> bool:
         return bool(self._api_key)
 
+    async def warmup(self) -> None:
+        await self._warm_connection(self._client, self._base_url)
+
+    def _add_system_prefix(self, payload: dict[str, Any], prefix: str | None) -> None:
+        """Send the stable prompt prefix as a system block marked for prompt caching."""
+
+        if prefix:
+            payload["system"] = [
+                {"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}}
+            ]
+
     async def generate(self, prompt: str, **kwargs: Any) -> LLMResponse:
         if not self._api_key:
             raise LLMProviderError("ANTHROPIC_API_KEY is not set")
 
+        estimate = await self._throttle(prompt, **kwargs)
         payload = {
             "model": self.model,
             "max_tokens": kwargs.get("max_tokens", 1024),
             "messages": [{"role": "user", "content": prompt}],
         }
+        self._add_system_prefix(payload, kwargs.get("prefix"))
         url = f"{self._base_url}/messages"
         headers = {
             "x-api-key": self._api_key,
@@ -44,7 +65,7 @@ class AnthropicProvider(BaseLLMProvider):
 
         response = await self._client.post(url, json=payload, headers=headers)
         if response.status_code == 429:
-            raise RateLimitError("Anthropic rate limit exceeded")
+            raise self._rate_limit_error("Anthropic rate limit exceeded", response.headers)
         if response.status_code >= 400:
             raise LLMProviderError(f"Anthropic error: {response.text}")
 
@@ -52,26 +73,38 @@ class AnthropicProvider(BaseLLMProvider):
         content_blocks = data.get("content", [])
         content = "".join(block.get("text", "") for block in content_blocks)
         usage = data.get("usage", {})
-        return LLMResponse(
-            content=content,
-            model=data.get("model", self.model),
-            provider=self.name,
-            prompt_tokens=usage.get("input_tokens"),
-            completion_tokens=usage.get("output_tokens"),
-            total_tokens=usage.get("input_tokens", 0) + usage.get("output_tokens", 0),
-            raw=data,
+        # input_tokens excludes tokens read from or written to the prompt cache.
+        prompt_tokens = (
+            usage.get("input_tokens", 0)
+            + (usage.get("cache_read_input_tokens") or 0)
+            + (usage.get("cache_creation_input_tokens") or 0)
+        )
+        return self._settle(
+            estimate,
+            LLMResponse(
+                content=content,
+                model=data.get("model", self.model),
+                provider=self.name,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=usage.get("output_tokens"),
+                total_tokens=prompt_tokens + usage.get("output_tokens", 0),
+                cached_tokens=usage.get("cache_read_input_tokens"),
+                raw=data,
+            ),
         )
 
     async def stream(self, prompt: str, **kwargs: Any) -> AsyncIterator[str]:
         if not self._api_key:
             raise LLMProviderError("ANTHROPIC_API_KEY is not set")
 
+        estimate = await self._throttle(prompt, **kwargs)
         payload = {
             "model": self.model,
             "max_tokens": kwargs.get("max_tokens", 1024),
             "messages": [{"role": "user", "content": prompt}],
             "stream": True,
         }
+        self._add_system_prefix(payload, kwargs.get("prefix"))
         url = f"{self._base_url}/messages"
         headers = {
             "x-api-key": self._api_key,
@@ -80,21 +113,36 @@ class AnthropicProvider(BaseLLMProvider):
 
         async with self._client.stream("POST", url, json=payload, headers=headers) as response:
             if response.status_code == 429:
-                raise RateLimitError("Anthropic rate limit exceeded")
+                raise self._rate_limit_error("Anthropic rate limit exceeded", response.headers)
             if response.status_code >= 400:
                 raise LLMProviderError(f"Anthropic error: {await response.aread()}")
-            async for line in response.aiter_lines():
-                if not line.startswith("data:"):
-                    continue
-                data = line.replace("data:", "").strip()
-                if data == "[DONE]":
-                    break
-                chunk = json.loads(data)
-                if chunk.get("type") == "content_block_delta":
-                    delta = chunk.get("delta", {})
-                    text = delta.get("text")
+            result = StreamResult()
+            input_tokens = output_tokens = 0
+            async for event in iter_sse(response.aiter_text()):
+                if event.event == "content_block_delta":
+                    text = event.json().get("delta", {}).get("text")
                     if text:
                         yield text
+                elif event.event == "message_start":
+                    usage = event.json().get("message", {}).get("usage", {})
+                    result.cached_tokens = usage.get("cache_read_input_tokens")
+                    input_tokens = (
+                        usage.get("input_tokens", 0)
+                        + (usage.get("cache_read_input_tokens") or 0)
+                        + (usage.get("cache_creation_input_tokens") or 0)
+                    )
+                elif event.event == "message_delta":
+                    chunk = event.json()
+                    result.finish_reason = chunk.get("delta", {}).get("stop_reason")
+                    output_tokens = chunk.get("usage", {}).get("output_tokens", output_tokens)
+                elif event.event == "error":
+                    raise LLMProviderError(f"Anthropic stream error: {event.data}")
+                elif event.event == "message_stop":
+                    break
+            result.prompt_tokens = input_tokens
+            result.completion_tokens = output_tokens
+            result.total_tokens = input_tokens + output_tokens
+            self._finish_stream(estimate, result)
 
     async def close(self) -> None:
         await self._client.aclose()
@@ -2,21 +2,29 @@
 
 from __future__ import annotations
 
-import json
 import os
 from typing import Any, AsyncIterator
 
 import httpx
 
-from iopsdata.llm.base import BaseLLMProvider, LLMProviderError, LLMResponse, RateLimitError
+from iopsdata.llm.base import (
+    BaseLLMProvider,
+    LLMProviderError,
+    LLMResponse,
+    StreamResult,
+    iter_sse,
+)
 
 
 class GeminiProvider(BaseLLMProvider):
     """Gemini provider for Google AI Studio."""
 
-    def __init__(self, model: str = "gemini-1.5-flash") -> None:
-        super().__init__(model=model)
-        self._api_key = os.getenv("GEMINI_API_KEY")
+    default_model = "gemini-1.5-flash"
+    api_key_env = "GEMINI_API_KEY"
+
+    def __init__(self, model: str | None = None) -> None:
+        super().__init__(model=model or self.default_model)
+        self._api_key = os.getenv(self.api_key_env)
         self._base_url = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta")
         self._client = httpx.AsyncClient(timeout=30)
 
@@ -27,20 +35,26 @@ class GeminiProvider(BaseLLMProvider):
     def is_configured(self) -> bool:
         return bool(self._api_key)
 
+    async def warmup(self) -> None:
+        await self._warm_connection(self._client, self._base_url)
+
     async def generate(self, prompt: str, **kwargs: Any) -> LLMResponse:
         if not self._api_key:
             raise LLMProviderError("GEMINI_API_KEY is not set")
 
+        estimate = await self._throttle(prompt, **kwargs)
         payload = {
             "contents": [{"role": "user", "parts": [{"text": prompt}]}],
             "generationConfig": {
                 "temperature": kwargs.get("temperature", 0.2),
             },
         }
+        if kwargs.get("prefix"):
+            payload["systemInstruction"] = {"parts": [{"text": kwargs["prefix"]}]}
         url = f"{self._base_url}/models/{self.model}:generateContent"
         response = await self._client.post(url, params={"key": self._api_key}, json=payload)
         if response.status_code == 429:
-            raise RateLimitError("Gemini rate limit exceeded")
+            raise self._rate_limit_error("Gemini rate limit exceeded", response.headers)
         if response.status_code >= 400:
             raise LLMProviderError(f"Gemini error: {response.text}")
 
@@ -49,50 +63,64 @@ class GeminiProvider(BaseLLMProvider):
         parts = (candidate.get("content") or {}).get("parts", [])
         content = "".join(part.get("text", "") for part in parts)
         usage = data.get("usageMetadata", {})
-        return LLMResponse(
-            content=content,
-            model=self.model,
-            provider=self.name,
-            prompt_tokens=usage.get("promptTokenCount"),
-            completion_tokens=usage.get("candidatesTokenCount"),
-            total_tokens=usage.get("totalTokenCount"),
-            raw=data,
+        return self._settle(
+            estimate,
+            LLMResponse(
+                content=content,
+                model=self.model,
+                provider=self.name,
+                prompt_tokens=usage.get("promptTokenCount"),
+                completion_tokens=usage.get("candidatesTokenCount"),
+                total_tokens=usage.get("totalTokenCount"),
+                # Implicit context caching hits on the shared system-instruction prefix.
+                cached_tokens=usage.get("cachedContentTokenCount"),
+                raw=data,
+            ),
         )
 
     async def stream(self, prompt: str, **kwargs: Any) -> AsyncIterator[str]:
         if not self._api_key:
             raise LLMProviderError("GEMINI_API_KEY is not set")
 
+        estimate = await self._throttle(prompt, **kwargs)
         payload = {
             "contents": [{"role": "user", "parts": [{"text": prompt}]}],
             "generationConfig": {
                 "temperature": kwargs.get("temperature", 0.2),
             },
         }
+        if kwargs.get("prefix"):
+            payload["systemInstruction"] = {"parts": [{"text": kwargs["prefix"]}]}
         url = f"{self._base_url}/models/{self.model}:streamGenerateContent"
 
         async with self._client.stream(
             "POST",
             url,
-            params={"key": self._api_key},
+            # alt=sse frames each chunk as an event instead of one streamed JSON array.
+            params={"key": self._api_key, "alt": "sse"},
             json=payload,
         ) as response:
             if response.status_code == 429:
-                raise RateLimitError("Gemini rate limit exceeded")
+                raise self._rate_limit_error("Gemini rate limit exceeded", response.headers)
             if response.status_code >= 400:
                 raise LLMProviderError(f"Gemini error: {await response.aread()}")
-            async for line in response.aiter_lines():
-                if not line:
-                    continue
-                if line.startswith("data:"):
-                    line = line.replace("data:", "").strip()
-                chunk = json.loads(line)
+            result = StreamResult()
+            async for event in iter_sse(response.aiter_text()):
+                chunk = event.json()
                 candidate = (chunk.get("candidates") or [{}])[0]
                 parts = (candidate.get("content") or {}).get("parts", [])
                 for part in parts:
                     text = part.get("text")
                     if text:
                         yield text
+                result.finish_reason = candidate.get("finishReason") or result.finish_reason
+                usage = chunk.get("usageMetadata")
+                if usage:
+                    result.prompt_tokens = usage.get("promptTokenCount")
+                    result.completion_tokens = usage.get("candidatesTokenCount")
+                    result.total_tokens = usage.get("totalTokenCount")
+                    result.cached_tokens = usage.get("cachedContentTokenCount")
+            self._finish_stream(estimate, result)
 
     async def close(self) -> None:
         await self._client.aclose()
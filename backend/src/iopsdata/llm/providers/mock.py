@@ -0,0 +1,136 @@
+"""Deterministic local stand-in LLM provider for offline benchmarks and tests."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import re
+from collections.abc import AsyncIterator
+from typing import Any
+
+from iopsdata.llm.base import BaseLLMProvider, LLMResponse, StreamResult
+from iopsdata.utils.rate_limit import estimate_tokens
+
+TABLE_LINE = re.compile(r"^Table: (\S+)", re.MULTILINE)
+COLUMN_LINE = re.compile(r"^  - (\w+):", re.MULTILINE)
+
+
+class MockProvider(BaseLLMProvider):
+    """Mock provider that answers with SQL over the first table in the schema context.
+
+    Latency, streaming cadence and 429 injection are configured with
+    `MOCK_LLM_*` environment variables (or constructor overrides). Random draws
+    come from one seeded generator per seed, so runs are reproducible.
+    """
+
+    _generators: dict[int, random.Random] = {}
+    default_model = "mock-sql"
+
+    @classmethod
+    def env_configured(cls) -> bool:
+        return os.getenv("MOCK_LLM_ENABLED", "").lower() in {"1", "true", "yes"}
+
+    def __init__(
+        self,
+        model: str | None = None,
+        latency_ms: float | None = None,
+        jitter_ms: float | None = None,
+        distribution: str | None = None,
+        chunk_ms: float | None = None,
+        chunk_chars: int | None = None,
+        rate_limit_rate: float | None = None,
+        seed: int | None = None,
+    ) -> None:
+        super().__init__(model=model or self.default_model)
+        self._latency_ms = _env_float("MOCK_LLM_LATENCY_MS", latency_ms, 200.0)
+        self._jitter_ms = _env_float("MOCK_LLM_JITTER_MS", jitter_ms, 0.0)
+        self._distribution = distribution or os.getenv("MOCK_LLM_DISTRIBUTION", "fixed")
+        self._chunk_ms = _env_float("MOCK_LLM_CHUNK_MS", chunk_ms, 10.0)
+        self._chunk_chars = int(_env_float("MOCK_LLM_CHUNK_CHARS", chunk_chars, 8))
+        self._rate_limit_rate = _env_float("MOCK_LLM_RATE_LIMIT_RATE", rate_limit_rate, 0.0)
+        seed = int(_env_float("MOCK_LLM_SEED", seed, 0))
+        self._random = self._generators.setdefault(seed, random.Random(seed))
+
+    @property
+    def name(self) -> str:
+        return "mock"
+
+    def is_configured(self) -> bool:
+        return self.env_configured()
+
+    def _latency_s(self) -> float:
+        if self._distribution == "uniform":
+            latency = self._random.uniform(
+                self._latency_ms - self._jitter_ms, self._latency_ms + self._jitter_ms
+            )
+        elif self._distribution == "lognormal":
+            # Median at latency_ms with a long right tail controlled by the jitter.
+            sigma = self._jitter_ms / self._latency_ms if self._latency_ms else 0.0
+            latency = self._latency_ms * self._random.lognormvariate(0.0, sigma)
+        else:
+            latency = self._latency_ms
+        return max(0.0, latency) / 1000
+
+    def _maybe_rate_limit(self) -> None:
+        if self._rate_limit_rate and self._random.random() < self._rate_limit_rate:
+            raise self._rate_limit_error("Mock rate limit exceeded", {"retry-after": "1"})
+
+    def _completion(self, prompt: str) -> str:
+        table = TABLE_LINE.search(prompt)
+        if not table:
+            return "```sql\nSELECT 1;\n```"
+        section = prompt[table.end():]
+        next_table = TABLE_LINE.search(section)
+        columns = COLUMN_LINE.findall(section[: next_table.start()] if next_table else section)
+        column_list = ", ".join(columns[:3]) or "*"
+        return f"```sql\nSELECT {column_list} FROM {table.group(1)} LIMIT 10;\n```"
+
+    async def generate(self, prompt: str, **kwargs: Any) -> LLMResponse:
+        estimate = await self._throttle(prompt, **kwargs)
+        self._maybe_rate_limit()
+        await asyncio.sleep(self._latency_s())
+        prefix = kwargs.get("prefix") or ""
+        content = self._completion(prefix + prompt)
+        prompt_tokens = estimate_tokens(prefix + prompt)
+        completion_tokens = estimate_tokens(content)
+        return self._settle(
+            estimate,
+            LLMResponse(
+                content=content,
+                model=self.model,
+                provider=self.name,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                total_tokens=prompt_tokens + completion_tokens,
+            ),
+        )
+
+    async def stream(self, prompt: str, **kwargs: Any) -> AsyncIterator[str]:
+        estimate = await self._throttle(prompt, **kwargs)
+        self._maybe_rate_limit()
+        # Time to first token, then a steady chunk cadence.
+        await asyncio.sleep(self._latency_s())
+        text = (kwargs.get("prefix") or "") + prompt
+        content = self._completion(text)
+        for start in range(0, len(content), self._chunk_chars):
+            yield content[start : start + self._chunk_chars]
+            await asyncio.sleep(self._chunk_ms / 1000)
+        prompt_tokens = estimate_tokens(text)
+        completion_tokens = estimate_tokens(content)
+        self._finish_stream(
+            estimate,
+            StreamResult(
+                finish_reason="stop",
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                total_tokens=prompt_tokens + completion_tokens,
+            ),
+        )
+
+
+def _env_float(name: str, override: float | None, default: float) -> float:
+    if override is not None:
+        return float(override)
+    value = os.getenv(name)
+    return float(value) if value else default
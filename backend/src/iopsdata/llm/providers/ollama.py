@@ -2,21 +2,34 @@
 
 from __future__ import annotations
 
-import json
 import os
 from typing import Any, AsyncIterator
 
 import httpx
 
-from iopsdata.llm.base import BaseLLMProvider, LLMProviderError, LLMResponse, RateLimitError
+from iopsdata.llm.base import (
+    BaseLLMProvider,
+    LLMProviderError,
+    LLMResponse,
+    StreamResult,
+    iter_ndjson,
+)
 
 
 class OllamaProvider(BaseLLMProvider):
     """Ollama provider for local models."""
 
+    default_model = "llama3"
+
+    @classmethod
+    def env_model(cls) -> str:
+        return os.getenv("OLLAMA_MODEL", cls.default_model)
+
     def __init__(self, model: str | None = None) -> None:
-        super().__init__(model=model or os.getenv("OLLAMA_MODEL", "llama3"))
+        super().__init__(model=model or self.env_model())
         self._base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+        # Keeping the model loaded lets Ollama reuse the KV cache for a repeated prompt prefix.
+        self._keep_alive = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
         self._client = httpx.AsyncClient(timeout=30)
 
     @property
@@ -26,55 +39,75 @@ class OllamaProvider(BaseLLMProvider):
     def is_configured(self) -> bool:
         return True
 
+    async def warmup(self) -> None:
+        await self._warm_connection(self._client, self._base_url)
+
     async def generate(self, prompt: str, **kwargs: Any) -> LLMResponse:
+        estimate = await self._throttle(prompt, **kwargs)
         payload = {
             "model": self.model,
-            "messages": [{"role": "user", "content": prompt}],
+            "messages": self._chat_messages(prompt, kwargs.get("prefix")),
+            "keep_alive": self._keep_alive,
             "stream": False,
         }
         url = f"{self._base_url}/api/chat"
 
         response = await self._client.post(url, json=payload)
         if response.status_code == 429:
-            raise RateLimitError("Ollama rate limit exceeded")
+            raise self._rate_limit_error("Ollama rate limit exceeded", response.headers)
         if response.status_code >= 400:
             raise LLMProviderError(f"Ollama error: {response.text}")
 
         data = response.json()
         message = data.get("message", {})
-        usage = data.get("usage", {})
-        return LLMResponse(
-            content=message.get("content", ""),
-            model=data.get("model", self.model),
-            provider=self.name,
-            prompt_tokens=usage.get("prompt_eval_count"),
-            completion_tokens=usage.get("eval_count"),
-            total_tokens=usage.get("prompt_eval_count", 0) + usage.get("eval_count", 0),
-            raw=data,
+        # Ollama reports token counts at the top level of the response.
+        prompt_tokens = data.get("prompt_eval_count")
+        completion_tokens = data.get("eval_count")
+        return self._settle(
+            estimate,
+            LLMResponse(
+                content=message.get("content", ""),
+                model=data.get("model", self.model),
+                provider=self.name,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                total_tokens=(prompt_tokens or 0) + (completion_tokens or 0),
+                raw=data,
+            ),
         )
 
     async def stream(self, prompt: str, **kwargs: Any) -> AsyncIterator[str]:
+        estimate = await self._throttle(prompt, **kwargs)
         payload = {
             "model": self.model,
-            "messages": [{"role": "user", "content": prompt}],
+            "messages": self._chat_messages(prompt, kwargs.get("prefix")),
+            "keep_alive": self._keep_alive,
             "stream": True,
         }
         url = f"{self._base_url}/api/chat"
 
         async with self._client.stream("POST", url, json=payload) as response:
             if response.status_code == 429:
-                raise RateLimitError("Ollama rate limit exceeded")
+                raise self._rate_limit_error("Ollama rate limit exceeded", response.headers)
             if response.status_code >= 400:
                 raise LLMProviderError(f"Ollama error: {await response.aread()}")
-            async for line in response.aiter_lines():
-                if not line:
-                    continue
-                chunk = json.loads(line)
-                if chunk.get("done"):
-                    break
+            async for chunk in iter_ndjson(response.aiter_text()):
                 content = (chunk.get("message") or {}).get("content")
                 if content:
                     yield content
+                if chunk.get("done"):
+                    prompt_tokens = chunk.get("prompt_eval_count", 0)
+                    completion_tokens = chunk.get("eval_count", 0)
+                    self._finish_stream(
+                        estimate,
+                        StreamResult(
+                            finish_reason=chunk.get("done_reason"),
+                            prompt_tokens=prompt_tokens,
+                            completion_tokens=completion_tokens,
+                            total_tokens=prompt_tokens + completion_tokens,
+                        ),
+                    )
+                    break
 
     async def close(self) -> None:
         await self._client.aclose()
@@ -2,21 +2,29 @@
 
 from __future__ import annotations
 
-import json
 import os
 from typing import Any, AsyncIterator
 
 import httpx
 
-from iopsdata.llm.base import BaseLLMProvider, LLMProviderError, LLMResponse, RateLimitError
+from iopsdata.llm.base import (
+    BaseLLMProvider,
+    LLMProviderError,
+    LLMResponse,
+    StreamResult,
+    iter_sse,
+)
 
 
 class OpenRouterProvider(BaseLLMProvider):
     """OpenRouter provider with support for multiple models."""
 
-    def __init__(self, model: str = "openai/gpt-4o-mini") -> None:
-        super().__init__(model=model)
-        self._api_key = os.getenv("OPENROUTER_API_KEY")
+    default_model = "openai/gpt-4o-mini"
+    api_key_env = "OPENROUTER_API_KEY"
+
+    def __init__(self, model: str | None = None) -> None:
+        super().__init__(model=model or self.default_model)
+        self._api_key = os.getenv(self.api_key_env)
         self._base_url = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
         self._client = httpx.AsyncClient(timeout=30)
 
@@ -27,13 +35,17 @@ class OpenRouterProvider(BaseLLMProvider):
     def is_configured(self) -> bool:
         return bool(self._api_key)
 
+    async def warmup(self) -> None:
+        await self._warm_connection(self._client, self._base_url)
+
     async def generate(self, prompt: str, **kwargs: Any) -> LLMResponse:
         if not self._api_key:
             raise LLMProviderError("OPENROUTER_API_KEY is not set")
 
+        estimate = await self._throttle(prompt, **kwargs)
         payload = {
             "model": self.model,
-            "messages": [{"role": "user", "content": prompt}],
+            "messages": self._chat_messages(prompt, kwargs.get("prefix")),
             "temperature": kwargs.get("temperature", 0.2),
         }
         url = f"{self._base_url}/chat/completions"
@@ -41,52 +53,66 @@ class OpenRouterProvider(BaseLLMProvider):
 
         response = await self._client.post(url, json=payload, headers=headers)
         if response.status_code == 429:
-            raise RateLimitError("OpenRouter rate limit exceeded")
+            raise self._rate_limit_error("OpenRouter rate limit exceeded", response.headers)
         if response.status_code >= 400:
             raise LLMProviderError(f"OpenRouter error: {response.text}")
 
         data = response.json()
         message = data.get("choices", [{}])[0].get("message", {})
         usage = data.get("usage", {})
-        return LLMResponse(
-            content=message.get("content", ""),
-            model=data.get("model", self.model),
-            provider=self.name,
-            prompt_tokens=usage.get("prompt_tokens"),
-            completion_tokens=usage.get("completion_tokens"),
-            total_tokens=usage.get("total_tokens"),
-            raw=data,
+        return self._settle(
+            estimate,
+            LLMResponse(
+                content=message.get("content", ""),
+                model=data.get("model", self.model),
+                provider=self.name,
+                prompt_tokens=usage.get("prompt_tokens"),
+                completion_tokens=usage.get("completion_tokens"),
+                total_tokens=usage.get("total_tokens"),
+                # Prefix caching is automatic; hits are reported per request.
+                cached_tokens=(usage.get("prompt_tokens_details") or {}).get("cached_tokens"),
+                raw=data,
+            ),
         )
 
     async def stream(self, prompt: str, **kwargs: Any) -> AsyncIterator[str]:
         if not self._api_key:
             raise LLMProviderError("OPENROUTER_API_KEY is not set")
 
+        estimate = await self._throttle(prompt, **kwargs)
         payload = {
             "model": self.model,
-            "messages": [{"role": "user", "content": prompt}],
+            "messages": self._chat_messages(prompt, kwargs.get("prefix")),
             "temperature": kwargs.get("temperature", 0.2),
             "stream": True,
+            "stream_options": {"include_usage": True},
         }
         url = f"{self._base_url}/chat/completions"
         headers = {"Authorization": f"Bearer {self._api_key}"}
 
         async with self._client.stream("POST", url, json=payload, headers=headers) as response:
             if response.status_code == 429:
-                raise RateLimitError("OpenRouter rate limit exceeded")
+                raise self._rate_limit_error("OpenRouter rate limit exceeded", response.headers)
             if response.status_code >= 400:
                 raise LLMProviderError(f"OpenRouter error: {await response.aread()}")
-            async for line in response.aiter_lines():
-                if not line.startswith("data:"):
-                    continue
-                data = line.replace("data:", "").strip()
-                if data == "[DONE]":
+            result = StreamResult()
+            async for event in iter_sse(response.aiter_text()):
+                if event.data == "[DONE]":
                     break
-                chunk = json.loads(data)
-                delta = chunk.get("choices", [{}])[0].get("delta", {})
-                content = delta.get("content")
+                chunk = event.json()
+                usage = chunk.get("usage")
+                if usage:
+                    result.prompt_tokens = usage.get("prompt_tokens")
+                    result.completion_tokens = usage.get("completion_tokens")
+                    result.total_tokens = usage.get("total_tokens")
+                    details = usage.get("prompt_tokens_details") or {}
+                    result.cached_tokens = details.get("cached_tokens")
+                choice = (chunk.get("choices") or [{}])[0]
+                result.finish_reason = choice.get("finish_reason") or result.finish_reason
+                content = (choice.get("delta") or {}).get("content")
                 if content:
                     yield content
+            self._finish_stream(estimate, result)
 
     async def close(self) -> None:
         await self._client.aclose()
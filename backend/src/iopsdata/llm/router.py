@@ -2,15 +2,19 @@
 
 from __future__ import annotations
 
+import time
 from typing import Any
 
-from iopsdata.llm.base import BaseLLMProvider, LLMProviderError, RateLimitError
+from iopsdata.llm.base import BaseLLMProvider, LLMProviderError, LLMResponse, RateLimitError
+from iopsdata.llm.health import provider_health
 from iopsdata.llm.providers.anthropic import AnthropicProvider
 from iopsdata.llm.providers.gemini import GeminiProvider
 from iopsdata.llm.providers.groq import GroqProvider
+from iopsdata.llm.providers.mock import MockProvider
 from iopsdata.llm.providers.ollama import OllamaProvider
 from iopsdata.llm.providers.openai import OpenAIProvider
 from iopsdata.llm.providers.openrouter import OpenRouterProvider
+from iopsdata.llm.usage import usage_recorder
 
 
 PROVIDER_REGISTRY: dict[str, type[BaseLLMProvider]] = {
@@ -20,6 +24,7 @@ PROVIDER_REGISTRY: dict[str, type[BaseLLMProvider]] = {
     "anthropic": AnthropicProvider,
     "ollama": OllamaProvider,
     "openrouter": OpenRouterProvider,
+    "mock": MockProvider,
 }
 
 
@@ -33,50 +38,129 @@ def get_provider(name: str) -> BaseLLMProvider:
 
 
 def configured_providers() -> list[str]:
-    """Return providers that are configured via environment variables."""
+    """Return providers that are configured via environment variables.
 
-    configured: list[str] = []
-    for name, provider_cls in PROVIDER_REGISTRY.items():
-        provider = provider_cls()
-        if provider.is_configured():
-            configured.append(name)
-    return configured
+    Only class-level metadata is consulted; no provider (or HTTP client) is built.
+    """
 
+    return [name for name, cls in PROVIDER_REGISTRY.items() if cls.env_configured()]
 
-async def generate_with_fallback(
-    prompt: str,
-    primary: str = "groq",
-    fallbacks: list[str] | None = None,
-    **kwargs: Any,
-) -> tuple[str, BaseLLMProvider]:
-    """Generate text using a fallback chain when providers fail."""
 
-    chain = [primary]
-    if fallbacks:
-        chain.extend(fallbacks)
+def route_providers(preferred: str | None = None, fallbacks: list[str] | None = None) -> list[str]:
+    """Return provider names in the order requests should try them.
+
+    An explicit `preferred` provider keeps its position (followed by any
+    `fallbacks`); otherwise every configured provider is ranked by live health,
+    cost and latency. Providers in a rate-limit cooldown or with an open circuit
+    are left out.
+    """
+
+    if preferred:
+        names = [preferred, *(fallbacks or [])]
+    else:
+        names = configured_providers()
 
+    candidates: list[tuple[str, str]] = []
+    for name in names:
+        provider_cls = PROVIDER_REGISTRY.get(name.lower())
+        if provider_cls is None:
+            raise ValueError(f"Unknown provider: {name}")
+        candidates.append((name.lower(), provider_cls.env_model()))
+
+    if not preferred:
+        candidates = provider_health.rank(candidates)
+    return [name for name, model in candidates if provider_health.is_available(name, model)]
+
+
+def _acquire(provider: BaseLLMProvider) -> bool:
+    return provider.is_configured() and provider_health.acquire(provider.name, provider.model)
+
+
+def _record_success(provider: BaseLLMProvider, started: float) -> None:
+    provider_health.record_success(provider.name, provider.model, time.perf_counter() - started)
+
+
+def _record_failed_call(provider: BaseLLMProvider, started: float) -> None:
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    usage_recorder.record_failure(provider.name, provider.model, elapsed_ms)
+
+
+async def _generate_chain(
+    prompt: str,
+    chain: list[str],
+    warmed: BaseLLMProvider | None = None,
+    **kwargs: Any,
+) -> tuple[LLMResponse, BaseLLMProvider]:
     last_error: Exception | None = None
     for name in chain:
-        provider = get_provider(name)
-        if not provider.is_configured():
+        reuse = warmed is not None and warmed.name == name.lower()
+        provider = warmed if reuse else get_provider(name)
+        if not _acquire(provider):
+            if provider.is_configured():
+                last_error = LLMProviderError(f"{provider.name} is cooling down or circuit-open")
+            if not reuse:
+                await provider.close()
             continue
+        started = time.perf_counter()
         try:
             response = await provider.generate(prompt, **kwargs)
-            return response.content, provider
+            _record_success(provider, started)
+            response.latency_ms = (time.perf_counter() - started) * 1000
+            return response, provider
         except RateLimitError as exc:
+            provider_health.record_rate_limit(provider.name, provider.model, exc.retry_after)
+            _record_failed_call(provider, started)
             last_error = exc
             continue
         except LLMProviderError as exc:
+            provider_health.record_failure(provider.name, provider.model)
+            _record_failed_call(provider, started)
             last_error = exc
             continue
         finally:
-            await provider.close()
+            if not reuse:
+                await provider.close()
 
     if last_error:
         raise last_error
     raise LLMProviderError("No configured providers available")
 
 
+async def generate_routed(
+    prompt: str,
+    preferred: str | None = None,
+    fallbacks: list[str] | None = None,
+    warmed: BaseLLMProvider | None = None,
+    **kwargs: Any,
+) -> LLMResponse:
+    """Generate a response using health-aware routing across configured providers.
+
+    A `warmed` provider instance (see `BaseLLMProvider.warmup`) is used in
+    place of a fresh one when the chain reaches its name; the caller keeps
+    ownership and closes it.
+    """
+
+    chain = route_providers(preferred, fallbacks)
+    response, _ = await _generate_chain(prompt, chain, warmed, **kwargs)
+    return response
+
+
+async def generate_with_fallback(
+    prompt: str,
+    primary: str = "groq",
+    fallbacks: list[str] | None = None,
+    **kwargs: Any,
+) -> tuple[str, BaseLLMProvider]:
+    """Generate text using a fallback chain when providers fail."""
+
+    chain = [primary]
+    if fallbacks:
+        chain.extend(fallbacks)
+
+    response, provider = await _generate_chain(prompt, chain, **kwargs)
+    return response.content, provider
+
+
 async def stream_with_fallback(
     prompt: str,
     primary: str = "groq",
@@ -92,16 +176,21 @@ async def stream_with_fallback(
     last_error: Exception | None = None
     for name in chain:
         provider = get_provider(name)
-        if not provider.is_configured():
+        if not _acquire(provider):
+            await provider.close()
             continue
+        started = time.perf_counter()
         try:
             async for chunk in provider.stream(prompt, **kwargs):
                 yield chunk
+            _record_success(provider, started)
             return
         except RateLimitError as exc:
+            provider_health.record_rate_limit(provider.name, provider.model, exc.retry_after)
             last_error = exc
             continue
         except LLMProviderError as exc:
+            provider_health.record_failure(provider.name, provider.model)
             last_error = exc
             continue
         finally:
@@ -0,0 +1,317 @@
+"""Token, latency and cost accounting for LLM calls."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from collections.abc import Iterable
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Protocol
+
+from iopsdata.llm.base import LLMResponse, StreamResult
+
+logger = logging.getLogger(__name__)
+
+# USD per million (input, output) tokens. Cached input tokens are billed at
+# CACHED_INPUT_DISCOUNT of the input price. Unknown models are not costed.
+MODEL_PRICING: dict[str, tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "openai/gpt-4o-mini": (0.15, 0.60),
+    "claude-3-haiku-20240307": (0.25, 1.25),
+    "claude-3-5-haiku-latest": (0.80, 4.00),
+    "claude-3-5-sonnet-latest": (3.00, 15.00),
+    "gemini-1.5-flash": (0.075, 0.30),
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+}
+FREE_PROVIDERS = {"ollama", "mock"}
+CACHED_INPUT_DISCOUNT = 0.5
+
+
+def estimate_cost(
+    provider: str,
+    model: str,
+    prompt_tokens: int | None,
+    completion_tokens: int | None,
+    cached_tokens: int | None = None,
+) -> float | None:
+    """Estimate the USD cost of a call, or None when the model has no known price."""
+
+    if provider in FREE_PROVIDERS:
+        return 0.0
+    pricing = MODEL_PRICING.get(model)
+    if pricing is None or prompt_tokens is None:
+        return None
+    input_price, output_price = pricing
+    cached = min(cached_tokens or 0, prompt_tokens)
+    input_cost = (prompt_tokens - cached + cached * CACHED_INPUT_DISCOUNT) * input_price
+    return (input_cost + (completion_tokens or 0) * output_price) / 1_000_000
+
+
+@dataclass
+class UsageRecord:
+    """One LLM call as recorded for accounting."""
+
+    provider: str
+    model: str
+    operation: str
+    workspace_id: str | None = None
+    prompt_tokens: int | None = None
+    completion_tokens: int | None = None
+    total_tokens: int | None = None
+    cached_tokens: int | None = None
+    latency_ms: float | None = None
+    cost_usd: float | None = None
+    success: bool = True
+    created_at: float = field(default_factory=time.time)
+
+    @classmethod
+    def from_response(
+        cls,
+        response: LLMResponse,
+        operation: str,
+        workspace_id: str | None = None,
+    ) -> UsageRecord:
+        return cls(
+            provider=response.provider,
+            model=response.model,
+            operation=operation,
+            workspace_id=workspace_id,
+            prompt_tokens=response.prompt_tokens,
+            completion_tokens=response.completion_tokens,
+            total_tokens=response.total_tokens,
+            cached_tokens=response.cached_tokens,
+            latency_ms=response.latency_ms,
+            cost_usd=estimate_cost(
+                response.provider,
+                response.model,
+                response.prompt_tokens,
+                response.completion_tokens,
+                response.cached_tokens,
+            ),
+        )
+
+    @classmethod
+    def from_stream(
+        cls,
+        provider: str,
+        model: str,
+        result: StreamResult,
+        latency_ms: float,
+        operation: str = "stream",
+        workspace_id: str | None = None,
+    ) -> UsageRecord:
+        return cls(
+            provider=provider,
+            model=model,
+            operation=operation,
+            workspace_id=workspace_id,
+            prompt_tokens=result.prompt_tokens,
+            completion_tokens=result.completion_tokens,
+            total_tokens=result.total_tokens,
+            cached_tokens=result.cached_tokens,
+            latency_ms=latency_ms,
+            cost_usd=estimate_cost(
+                provider,
+                model,
+                result.prompt_tokens,
+                result.completion_tokens,
+                result.cached_tokens,
+            ),
+        )
+
+
+class UsageSink(Protocol):
+    """Destination for flushed usage records."""
+
+    async def write(self, records: list[UsageRecord]) -> None: ...
+
+
+class JSONLUsageSink:
+    """Append usage records to a local JSON Lines file."""
+
+    def __init__(self, path: str | Path) -> None:
+        self._path = Path(path)
+
+    def _append(self, lines: str) -> None:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        with self._path.open("a", encoding="utf-8") as handle:
+            handle.write(lines)
+
+    async def write(self, records: list[UsageRecord]) -> None:
+        lines = "".join(json.dumps(asdict(record)) + "\n" for record in records)
+        await asyncio.to_thread(self._append, lines)
+
+
+class SupabaseUsageSink:
+    """Insert usage records into the `llm_usage` table through the client's batch writer."""
+
+    def __init__(self, client: Any) -> None:
+        self._client = client
+
+    async def write(self, records: list[UsageRecord]) -> None:
+        rows = []
+        for record in records:
+            row = asdict(record)
+            row["created_at"] = time.strftime(
+                "%Y-%m-%dT%H:%M:%SZ", time.gmtime(row.pop("created_at"))
+            )
+            rows.append(row)
+        accepted = await self._client.insert_llm_usage(rows)
+        if accepted < len(rows):
+            logger.warning("Insert buffer dropped %d LLM usage rows", len(rows) - accepted)
+
+    async def close(self) -> None:
+        """Flush queued rows and close the client."""
+
+        await self._client.close()
+
+
+def _percentile(values: list[float], q: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))]
+
+
+class UsageRecorder:
+    """In-process ring buffer of usage records, batch-flushed to a sink.
+
+    The most recent `capacity` records stay in memory for aggregation. New
+    records are also queued for the sink and written in batches of
+    `flush_size` in the background; a failed write is retried with the next
+    batch (the queue is capped at `capacity`, dropping the oldest records).
+    """
+
+    def __init__(
+        self,
+        sink: UsageSink | None = None,
+        capacity: int = 10_000,
+        flush_size: int = 100,
+    ) -> None:
+        self.sink = sink
+        self._flush_size = flush_size
+        self._recent: deque[UsageRecord] = deque(maxlen=capacity)
+        self._pending: deque[UsageRecord] = deque(maxlen=capacity)
+        self._flush_task: asyncio.Task[None] | None = None
+
+    def record(self, record: UsageRecord) -> None:
+        self._recent.append(record)
+        if self.sink is None:
+            return
+        self._pending.append(record)
+        if len(self._pending) >= self._flush_size and (
+            self._flush_task is None or self._flush_task.done()
+        ):
+            try:
+                loop = asyncio.get_running_loop()
+                self._flush_task = loop.create_task(self._background_flush())
+            except RuntimeError:
+                pass  # No running loop; the next flush() call picks these up.
+
+    def record_failure(self, provider: str, model: str, latency_ms: float) -> None:
+        self.record(
+            UsageRecord(
+                provider=provider,
+                model=model,
+                operation="generate",
+                latency_ms=latency_ms,
+                success=False,
+            )
+        )
+
+    def record_responses(
+        self,
+        responses: Iterable[LLMResponse],
+        operation: str,
+        workspace_id: str | None = None,
+    ) -> None:
+        for response in responses:
+            self.record(UsageRecord.from_response(response, operation, workspace_id))
+
+    async def flush(self) -> int:
+        """Write all pending records to the sink and return how many were written."""
+
+        if self.sink is None or not self._pending:
+            return 0
+        batch = list(self._pending)
+        self._pending.clear()
+        try:
+            await self.sink.write(batch)
+        except Exception:
+            self._pending.extendleft(reversed(batch))
+            raise
+        return len(batch)
+
+    async def _background_flush(self) -> None:
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Flushing LLM usage records failed; will retry")
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        await self.flush()
+        close = getattr(self.sink, "close", None)
+        if close is not None:
+            await close()
+
+    def recent(self, limit: int = 100) -> list[UsageRecord]:
+        return list(self._recent)[-limit:]
+
+    def summary(
+        self,
+        group_by: tuple[str, ...] = ("provider", "model"),
+        since: float | None = None,
+    ) -> list[dict[str, Any]]:
+        """Aggregate recorded calls per group, most expensive first."""
+
+        groups: dict[tuple[Any, ...], list[UsageRecord]] = {}
+        for record in self._recent:
+            if since is not None and record.created_at < since:
+                continue
+            key = tuple(getattr(record, name) for name in group_by)
+            groups.setdefault(key, []).append(record)
+
+        rows: list[dict[str, Any]] = []
+        for key, records in groups.items():
+            latencies = [r.latency_ms for r in records if r.latency_ms is not None]
+            prompts = [r.prompt_tokens for r in records if r.prompt_tokens is not None]
+            rows.append(
+                {
+                    **dict(zip(group_by, key, strict=True)),
+                    "calls": len(records),
+                    "failures": sum(1 for r in records if not r.success),
+                    "prompt_tokens": sum(prompts),
+                    "completion_tokens": sum(r.completion_tokens or 0 for r in records),
+                    "cached_tokens": sum(r.cached_tokens or 0 for r in records),
+                    "avg_prompt_tokens": sum(prompts) / len(prompts) if prompts else None,
+                    "cost_usd": round(sum(r.cost_usd or 0.0 for r in records), 6),
+                    "latency_p50_ms": _percentile(latencies, 0.5),
+                    "latency_p95_ms": _percentile(latencies, 0.95),
+                }
+            )
+        return sorted(rows, key=lambda row: row["cost_usd"], reverse=True)
+
+
+def build_usage_sink() -> UsageSink | None:
+    """Build the usage sink configured by `LLM_USAGE_SINK` (jsonl, supabase or unset)."""
+
+    kind = os.getenv("LLM_USAGE_SINK", "").lower()
+    if kind == "jsonl":
+        return JSONLUsageSink(os.getenv("LLM_USAGE_PATH", "data/llm_usage.jsonl"))
+    if kind == "supabase":
+        from iopsdata.db.supabase import SupabaseClientWrapper, build_supabase_config
+
+        # Usage is recorded server-side without a user session, so RLS needs the service role.
+        return SupabaseUsageSink(SupabaseClientWrapper(build_supabase_config(service_role=True)))
+    return None
+
+
+usage_recorder = UsageRecorder()
@@ -0,0 +1,79 @@
+"""Bounded in-memory conversation history for multi-turn chat."""
+
+from __future__ import annotations
+
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+
+from iopsdata.utils.rate_limit import estimate_tokens
+
+
+@dataclass(frozen=True)
+class ConversationTurn:
+    """One answered request in a conversation (mirrors a user/assistant `Message` pair)."""
+
+    prompt: str
+    sql: str
+
+    def render(self) -> str:
+        return f"User: {self.prompt.strip()}\nSQL: {self.sql.strip()}"
+
+
+class ConversationStore:
+    """Keep the last `max_turns` turns of the `max_conversations` most recently used threads."""
+
+    def __init__(
+        self,
+        max_conversations: int = 1000,
+        max_turns: int = 20,
+        history_token_budget: int = 600,
+    ) -> None:
+        self._max_conversations = max_conversations
+        self._max_turns = max_turns
+        self._history_token_budget = history_token_budget
+        self._conversations: OrderedDict[str, deque[ConversationTurn]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._conversations)
+
+    def append(self, conversation_id: str, prompt: str, sql: str) -> None:
+        turns = self._conversations.get(conversation_id)
+        if turns is None:
+            turns = self._conversations[conversation_id] = deque(maxlen=self._max_turns)
+            while len(self._conversations) > self._max_conversations:
+                self._conversations.popitem(last=False)
+        self._conversations.move_to_end(conversation_id)
+        turns.append(ConversationTurn(prompt=prompt, sql=sql))
+
+    def turns(self, conversation_id: str) -> list[ConversationTurn]:
+        return list(self._conversations.get(conversation_id, ()))
+
+    def clear(self, conversation_id: str) -> None:
+        self._conversations.pop(conversation_id, None)
+
+    def window(
+        self,
+        conversation_id: str,
+        token_budget: int | None = None,
+    ) -> list[ConversationTurn]:
+        """Return the most recent turns that fit in the token budget, oldest first."""
+
+        turns = self._conversations.get(conversation_id)
+        if not turns:
+            return []
+        self._conversations.move_to_end(conversation_id)
+        budget = self._history_token_budget if token_budget is None else token_budget
+        window: list[ConversationTurn] = []
+        for turn in reversed(turns):
+            budget -= estimate_tokens(turn.render())
+            if budget < 0:
+                break
+            window.append(turn)
+        window.reverse()
+        return window
+
+
+def render_history(turns: list[ConversationTurn]) -> str:
+    """Render conversation turns for `FOLLOW_UP_PROMPT`."""
+
+    return "\n\n".join(turn.render() for turn in turns)
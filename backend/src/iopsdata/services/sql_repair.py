@@ -0,0 +1,104 @@
+"""Validate generated SQL before execution and repair failures with the LLM."""
+
+from __future__ import annotations
+
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+
+from iopsdata.connections.base import QueryResult, QuerySession
+from iopsdata.llm.base import LLMResponse
+from iopsdata.llm.context import (
+    FIX_ERROR_PREFIX,
+    FIX_ERROR_SUFFIX,
+    SchemaContext,
+    extract_sql_from_response,
+)
+from iopsdata.llm.context.sql_validator import validate_sql_against_schema
+from iopsdata.utils.timing import StageTimer
+
+
+class SQLRepairError(RuntimeError):
+    """Raised when SQL still fails after the repair budget is spent."""
+
+    def __init__(self, message: str, sql: str, errors: list[str]) -> None:
+        super().__init__(message)
+        self.sql = sql
+        self.errors = errors
+
+
+@dataclass
+class RepairOutcome:
+    """Final SQL, its results (when executed) and the repair responses it took."""
+
+    sql: str
+    result: QueryResult | None = None
+    errors: list[str] = field(default_factory=list)
+    responses: list[LLMResponse] = field(default_factory=list)
+
+    @property
+    def repairs(self) -> int:
+        return len(self.responses)
+
+
+async def check_sql(
+    sql: str,
+    connection: QuerySession,
+    schema_context: SchemaContext,
+) -> str | None:
+    """Return why SQL would fail, or None if it passes static checks and `EXPLAIN`."""
+
+    problems = validate_sql_against_schema(sql, schema_context.tables, schema_context.dialect)
+    if problems:
+        return "; ".join(problems)
+    try:
+        await connection.explain(sql)
+    except RuntimeError as exc:
+        return str(exc)
+    return None
+
+
+async def run_with_repair(
+    sql: str,
+    connection: QuerySession,
+    schema_context: SchemaContext,
+    regenerate: Callable[[str, str], Awaitable[LLMResponse]],
+    execute: bool = True,
+    max_repairs: int = 2,
+    timer: StageTimer | None = None,
+) -> RepairOutcome:
+    """Check (and optionally execute) SQL, sending failures back to the LLM.
+
+    Each attempt is validated against the cached schema and planned with
+    `EXPLAIN` before it is executed, so only SQL the database accepts is run
+    in full. A failure at any step is fed back through `regenerate(prompt,
+    prefix)` using the `FIX_ERROR_*` templates, up to `max_repairs` times.
+    """
+
+    timer = timer or StageTimer()
+    outcome = RepairOutcome(sql=sql)
+    while True:
+        with timer.stage("validate"):
+            error = await check_sql(outcome.sql, connection, schema_context)
+        if error is None and execute:
+            try:
+                with timer.stage("execute"):
+                    outcome.result = await connection.execute(outcome.sql)
+            except RuntimeError as exc:
+                error = str(exc)
+        if error is None:
+            return outcome
+
+        outcome.errors.append(error)
+        if outcome.repairs >= max_repairs:
+            raise SQLRepairError(
+                f"SQL still failing after {outcome.repairs} repair attempts: {error}",
+                outcome.sql,
+                outcome.errors,
+            )
+        with timer.stage("repair"):
+            response = await regenerate(
+                FIX_ERROR_SUFFIX.format(sql_query=outcome.sql, error_message=error),
+                FIX_ERROR_PREFIX.format(schema_context=schema_context.text),
+            )
+        outcome.responses.append(response)
+        outcome.sql = extract_sql_from_response(response.content) or response.content.strip()
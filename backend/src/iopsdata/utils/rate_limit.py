@@ -1,9 +1,15 @@
-"""Simple in-memory rate limiter."""
+"""In-memory rate limiters."""
 
 from __future__ import annotations
 
+import asyncio
+import heapq
+import itertools
+import os
 import time
+from collections.abc import Callable
 from dataclasses import dataclass, field
+from typing import Any
 
 
 @dataclass
@@ -31,3 +37,131 @@ class RateLimiter:
         self.tokens[key] = tokens - 1
         self.timestamps[key] = now
         return True
+
+
+class AsyncRateLimiter:
+    """Async token-bucket limiter for requests/min and tokens/min.
+
+    Callers wait in a fair FIFO queue; lower `priority` values form faster
+    lanes that are served first. Only the head of the queue consumes budget,
+    so a large request is never starved by a stream of small ones.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int | None = None,
+        tokens_per_minute: int | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._clock = clock
+        self._requests = float(requests_per_minute or 0)
+        self._tokens = float(tokens_per_minute or 0)
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._queue: list[list[Any]] = []
+        self._sequence = itertools.count()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._queue)
+
+    def _refill(self) -> float:
+        now = self._clock()
+        elapsed = max(0.0, now - self._updated)
+        self._updated = now
+        if self.requests_per_minute:
+            rate = self.requests_per_minute / 60
+            self._requests = min(float(self.requests_per_minute), self._requests + elapsed * rate)
+        if self.tokens_per_minute:
+            rate = self.tokens_per_minute / 60
+            self._tokens = min(float(self.tokens_per_minute), self._tokens + elapsed * rate)
+        return now
+
+    def _delay(self, tokens: int) -> float:
+        now = self._refill()
+        delay = max(0.0, self._paused_until - now)
+        if self.requests_per_minute and self._requests < 1:
+            delay = max(delay, (1 - self._requests) * 60 / self.requests_per_minute)
+        if self.tokens_per_minute and self._tokens < tokens:
+            delay = max(delay, (tokens - self._tokens) * 60 / self.tokens_per_minute)
+        return delay
+
+    def _wake_head(self) -> None:
+        if self._queue:
+            self._queue[0][2].set()
+
+    async def acquire(self, tokens: int = 0, priority: int = 0) -> None:
+        """Wait until one request and `tokens` tokens fit in the budget, then consume them."""
+
+        if self.tokens_per_minute:
+            tokens = min(tokens, self.tokens_per_minute)
+        entry = [priority, next(self._sequence), asyncio.Event()]
+        heapq.heappush(self._queue, entry)
+        try:
+            while True:
+                if self._queue[0] is not entry:
+                    await entry[2].wait()
+                    entry[2].clear()
+                    continue
+                delay = self._delay(tokens)
+                if delay <= 0:
+                    heapq.heappop(self._queue)
+                    if self.requests_per_minute:
+                        self._requests -= 1
+                    if self.tokens_per_minute:
+                        self._tokens -= tokens
+                    self._wake_head()
+                    return
+                try:
+                    # Woken early if a penalty is lifted or the budget is settled upward.
+                    await asyncio.wait_for(entry[2].wait(), timeout=delay)
+                except TimeoutError:
+                    pass
+                entry[2].clear()
+        except BaseException:
+            if entry in self._queue:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._wake_head()
+            raise
+
+    def settle(self, estimated_tokens: int, actual_tokens: int | None) -> None:
+        """Correct the token bucket once the real usage of a request is known."""
+
+        if not self.tokens_per_minute or actual_tokens is None:
+            return
+        self._refill()
+        refund = estimated_tokens - actual_tokens
+        self._tokens = min(float(self.tokens_per_minute), self._tokens + refund)
+        self._wake_head()
+
+    def penalize(self, seconds: float) -> None:
+        """Hold every waiter for `seconds`, e.g. after a server-side 429."""
+
+        self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+
+_PROVIDER_LIMITERS: dict[str, AsyncRateLimiter | None] = {}
+
+
+def get_provider_limiter(provider: str) -> AsyncRateLimiter | None:
+    """Return the shared limiter for a provider, configured via `<NAME>_RPM` and `<NAME>_TPM`."""
+
+    if provider not in _PROVIDER_LIMITERS:
+        prefix = provider.upper()
+        rpm = os.getenv(f"{prefix}_RPM")
+        tpm = os.getenv(f"{prefix}_TPM")
+        _PROVIDER_LIMITERS[provider] = (
+            AsyncRateLimiter(int(rpm) if rpm else None, int(tpm) if tpm else None)
+            if rpm or tpm
+            else None
+        )
+    return _PROVIDER_LIMITERS[provider]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token) used for budgeting."""
+
+    return len(text) // 4 + 1
@@ -0,0 +1,42 @@
+"""Lightweight per-request stage timing."""
+
+from __future__ import annotations
+
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """Accumulate wall-clock durations per named stage of a request."""
+
+    def __init__(self) -> None:
+        self.stages: dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - started
+
+    def server_timing(self) -> str:
+        """Render stages as a `Server-Timing` header value (durations in ms)."""
+
+        return ", ".join(
+            f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.stages.items()
+        )
+
+
+def parse_server_timing(header: str) -> dict[str, float]:
+    """Parse a `Server-Timing` header into stage durations in milliseconds."""
+
+    stages: dict[str, float] = {}
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if name and key.strip() == "dur":
+                stages[name] = float(value)
+    return stages
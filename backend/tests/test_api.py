@@ -2,9 +2,133 @@
 
 from __future__ import annotations
 
+import json
+import sqlite3
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+import httpx
 from fastapi.testclient import TestClient
 
 from iopsdata.api.main import app
+from iopsdata.api.routes import chat as chat_routes
+from iopsdata.connections.manager import ConnectionManager
+from iopsdata.connections.providers.sqlite import SQLiteConnection
+from iopsdata.lineage.offload import lineage_parser
+from iopsdata.llm.base import BaseLLMProvider, LLMResponse
+from iopsdata.llm.router import PROVIDER_REGISTRY
+from iopsdata.llm.usage import UsageRecorder, usage_recorder
+from iopsdata.utils.encryption import generate_key
+from iopsdata.utils.timing import parse_server_timing
+
+
+class ScriptedProvider(BaseLLMProvider):
+    """Provider returning a fixed completion in small chunks."""
+
+    chunks = ["```sql\nselect id, name ", "from items\n```", " Lists items."]
+    default_model = "scripted"
+
+    def __init__(self) -> None:
+        super().__init__(model=self.default_model)
+
+    @property
+    def name(self) -> str:
+        return "scripted"
+
+    def is_configured(self) -> bool:
+        return True
+
+    async def generate(self, prompt: str, **kwargs: Any) -> LLMResponse:
+        return LLMResponse(content="".join(self.chunks), model=self.model, provider=self.name)
+
+    async def stream(self, prompt: str, **kwargs: Any) -> AsyncIterator[str]:
+        for chunk in self.chunks:
+            yield chunk
+
+
+class FailingProvider(ScriptedProvider):
+    """Provider whose stream breaks after the first chunk."""
+
+    async def stream(self, prompt: str, **kwargs: Any) -> AsyncIterator[str]:
+        yield self.chunks[0]
+        raise httpx.ReadTimeout("stream stalled")
+
+
+class ProseProvider(ScriptedProvider):
+    """Provider that answers without any SQL."""
+
+    chunks = ["I cannot help ", "with that."]
+
+
+class RepairingProvider(ScriptedProvider):
+    """Provider that misspells a column until it is shown the error."""
+
+    prompts: list[str] = []
+
+    async def generate(self, prompt: str, **kwargs: Any) -> LLMResponse:
+        self.prompts.append(prompt)
+        column = "name" if "Failed SQL" in prompt else "nme"
+        return LLMResponse(
+            content=f"```sql\nselect id, {column} from items\n```",
+            model=self.model,
+            provider=self.name,
+            prompt_tokens=10,
+            completion_tokens=5,
+            total_tokens=15,
+        )
+
+
+class RecordingProvider(ScriptedProvider):
+    """Provider that records the prompts it is sent."""
+
+    prompts: list[str] = []
+
+    async def generate(self, prompt: str, **kwargs: Any) -> LLMResponse:
+        self.prompts.append(prompt)
+        return await super().generate(prompt, **kwargs)
+
+
+class InsertingProvider(ScriptedProvider):
+    """Provider that answers with a write."""
+
+    chunks = ["```sql\ninsert into items values (2, 'pear')\n```"]
+
+
+class WarmingProvider(ScriptedProvider):
+    """Provider that records which instance was warmed up and which generated."""
+
+    events: list[tuple[str, int]] = []
+
+    async def warmup(self) -> None:
+        self.events.append(("warmup", id(self)))
+
+    async def generate(self, prompt: str, **kwargs: Any) -> LLMResponse:
+        self.events.append(("generate", id(self)))
+        return await super().generate(prompt, **kwargs)
+
+
+def _register_sqlite(client: TestClient, tmp_path) -> ConnectionManager:
+    db_path = tmp_path / "chat.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute("create table items (id integer, name text)")
+    conn.execute("insert into items values (1, 'apple')")
+    conn.commit()
+    conn.close()
+
+    connection = SQLiteConnection(name="local", path=str(db_path), read_only=True)
+    client.portal.call(connection.connect)
+    manager: ConnectionManager = client.app.state.connection_manager
+    manager.register("local", connection)
+    return manager
+
+
+def _sse_events(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for frame in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
 
 
 def test_health_check() -> None:
@@ -26,3 +150,376 @@ def test_lineage_endpoint() -> None:
     response = client.post("/api/lineage", json={"sql": "select * from users"})
     assert response.status_code == 200
     assert response.json()["query_type"] == "SELECT"
+
+
+def test_lineage_endpoint_enforces_parse_limits(monkeypatch) -> None:
+    monkeypatch.setattr(lineage_parser, "max_sql_bytes", 20)
+    client = TestClient(app)
+    response = client.post("/api/lineage", json={"sql": "select * from users"})
+    assert response.status_code == 200
+    response = client.post("/api/lineage", json={"sql": "select * from users where id = 1"})
+    assert response.status_code == 413
+    response = client.post("/api/lineage", json={"sql": "select from where"})
+    assert response.status_code == 400
+
+
+def test_lineage_endpoint_resolves_columns_against_cached_schema(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("FERNET_KEY", generate_key())
+
+    with TestClient(app) as client:
+        _register_sqlite(client, tmp_path)
+        response = client.post(
+            "/api/lineage",
+            json={
+                "sql": "select name as label from items i cross join (select 1 as one) s",
+                "include_columns": True,
+                "connection_id": "local",
+            },
+        )
+
+    assert response.status_code == 200
+    assert response.json()["column_lineage"] == {"label": ["items.name"]}
+
+
+def test_lineage_script_endpoint_reports_dependencies_and_stages() -> None:
+    client = TestClient(app)
+    sql = "create table a (id int); create table b (id int); insert into a select * from b"
+    response = client.post("/api/lineage/script", json={"sql": sql})
+    assert response.status_code == 200
+    body = response.json()
+    assert [statement["depends_on"] for statement in body["statements"]] == [[], [], [0, 1]]
+    assert body["stages"] == [[0, 1], [2]]
+    response = client.post("/api/lineage/script", json={"sql": "select 1; select from where"})
+    assert response.status_code == 400
+
+
+def test_lineage_neighborhood_aggregates_tracked_queries(monkeypatch) -> None:
+    monkeypatch.setenv("FERNET_KEY", generate_key())
+
+    with TestClient(app) as client:
+        for sql in (
+            "insert into daily select * from orders where id = 1",
+            "insert into daily select * from orders where id = 2",
+            "insert into daily select * from orders o join users u on o.uid = u.id",
+            "insert into report select * from daily",
+            "select * from daily",
+        ):
+            response = client.post("/api/lineage", json={"sql": sql, "track": True})
+            assert response.status_code == 200
+
+        url = "/api/lineage/graph/neighborhood?node=table:daily&depth=1"
+        response = client.get(url)
+        assert response.status_code == 200
+        body = response.json()
+        edges = {(e["source"], e["target"]): e["weight"] for e in body["edges"]}
+        assert edges == {
+            ("table:orders", "table:daily"): 2,
+            ("table:users", "table:daily"): 1,
+            ("table:daily", "table:report"): 1,
+        }
+        nodes = {node["id"]: node for node in body["nodes"]}
+        assert nodes["table:daily"]["readers"] == 1
+        assert all(node["node_type"] == "table" for node in nodes.values())
+
+        etag = response.headers["etag"]
+        assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+        tracked = {"sql": "insert into report select * from users", "track": True}
+        client.post("/api/lineage", json=tracked)
+        assert client.get(url, headers={"If-None-Match": etag}).status_code == 200
+
+        capped = client.get(f"{url}&max_edges=1").json()
+        assert capped["truncated"] and len(capped["edges"]) == 1
+        missing = client.get("/api/lineage/graph/neighborhood?node=table:nope")
+        assert missing.status_code == 404
+
+
+def _stream_chat(tmp_path, monkeypatch, provider_cls, auto_execute: bool = True):
+    monkeypatch.setenv("FERNET_KEY", generate_key())
+    monkeypatch.setattr(chat_routes, "get_provider", lambda name: provider_cls())
+
+    with TestClient(app) as client:
+        _register_sqlite(client, tmp_path)
+        with client.stream(
+            "POST",
+            "/api/chat/stream",
+            json={"connection_id": "local", "prompt": "list items", "auto_execute": auto_execute},
+        ) as response:
+            assert response.headers["content-type"].startswith("text/event-stream")
+            return _sse_events(response.read().decode())
+
+
+def test_chat_stream_emits_sql_then_results(tmp_path, monkeypatch) -> None:
+    events = _stream_chat(tmp_path, monkeypatch, ScriptedProvider)
+
+    kinds = [kind for kind, _ in events]
+    assert kinds == ["token", "token", "sql", "token", "results", "done"]
+    assert events[2][1]["sql"] == "select id, name from items;"
+    assert events[4][1]["rows"] == [[1, "apple"]]
+
+
+def test_chat_stream_without_auto_execute(tmp_path, monkeypatch) -> None:
+    events = _stream_chat(tmp_path, monkeypatch, ScriptedProvider, auto_execute=False)
+
+    kinds = [kind for kind, _ in events]
+    assert kinds == ["token", "token", "sql", "token", "done"]
+
+
+def test_chat_stream_reports_provider_failure(tmp_path, monkeypatch) -> None:
+    events = _stream_chat(tmp_path, monkeypatch, FailingProvider)
+
+    kinds = [kind for kind, _ in events]
+    assert kinds == ["token", "error"]
+    assert "stream stalled" in events[-1][1]["detail"]
+
+
+def test_chat_stream_does_not_execute_prose(tmp_path, monkeypatch) -> None:
+    events = _stream_chat(tmp_path, monkeypatch, ProseProvider)
+
+    kinds = [kind for kind, _ in events]
+    assert kinds == ["token", "token", "error"]
+    assert events[-1][1]["detail"] == "No SQL found in model response"
+
+
+def test_chat_reports_stage_timings_with_mock_provider(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("FERNET_KEY", generate_key())
+    monkeypatch.setenv("MOCK_LLM_ENABLED", "1")
+    monkeypatch.setenv("MOCK_LLM_LATENCY_MS", "0")
+
+    with TestClient(app) as client:
+        _register_sqlite(client, tmp_path)
+        response = client.post(
+            "/api/chat",
+            json={
+                "connection_id": "local",
+                "prompt": "list items",
+                "provider": "mock",
+                "auto_execute": True,
+            },
+        )
+
+    assert response.status_code == 200
+    assert response.json()["results"]["rows"] == [[1, "apple"]]
+    timings = parse_server_timing(response.headers["server-timing"])
+    assert set(timings) == {
+        "schema",
+        "context",
+        "warmup",
+        "session",
+        "llm",
+        "validate",
+        "execute",
+    }
+
+
+def test_usage_summary_aggregates_chat_calls(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("FERNET_KEY", generate_key())
+    monkeypatch.setenv("MOCK_LLM_ENABLED", "1")
+    monkeypatch.setenv("MOCK_LLM_LATENCY_MS", "0")
+    monkeypatch.setattr(usage_recorder, "_recent", UsageRecorder()._recent)
+
+    with TestClient(app) as client:
+        _register_sqlite(client, tmp_path)
+        for _ in range(2):
+            client.post(
+                "/api/chat",
+                json={"connection_id": "local", "prompt": "list items", "provider": "mock"},
+            )
+        summary = client.get("/api/usage/summary", params={"group_by": "provider,operation"})
+        invalid = client.get("/api/usage/summary", params={"group_by": "prompt"})
+
+    assert summary.status_code == 200
+    assert summary.json()["rows"][0]["provider"] == "mock"
+    assert summary.json()["rows"][0]["operation"] == "chat"
+    assert summary.json()["rows"][0]["calls"] == 2
+    assert summary.json()["rows"][0]["cost_usd"] == 0.0
+    assert invalid.status_code == 400
+
+
+def test_execute_serves_repeated_reads_from_result_cache(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("FERNET_KEY", generate_key())
+
+    with TestClient(app) as client:
+        _register_sqlite(client, tmp_path)
+        payload = {"connection_id": "local", "sql": "select id, name from items where id = ?"}
+        first = client.post("/api/execute", json={**payload, "params": [1]})
+        second = client.post("/api/execute", json={**payload, "params": [1]})
+        other = client.post("/api/execute", json={**payload, "params": [2]})
+        bypass = client.post("/api/execute", json={**payload, "params": [1], "use_cache": False})
+
+    assert first.json()["results"]["rows"] == [[1, "apple"]]
+    assert second.json() == {**first.json(), "cached": True}
+    assert [first.json()["cached"], other.json()["cached"], bypass.json()["cached"]] == [
+        False,
+        False,
+        False,
+    ]
+
+
+def test_chat_auto_execute_invalidates_result_cache(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("FERNET_KEY", generate_key())
+    monkeypatch.setitem(PROVIDER_REGISTRY, "scripted", InsertingProvider)
+
+    with TestClient(app) as client:
+        manager = _register_sqlite(client, tmp_path)
+        connection = manager.get("local")
+        connection.read_only = False
+        client.portal.call(connection.disconnect)
+        client.portal.call(connection.connect)
+        read = {"connection_id": "local", "sql": "select id, name from items"}
+        client.post("/api/execute", json=read)
+        chat = client.post(
+            "/api/chat",
+            json={
+                "connection_id": "local",
+                "prompt": "add a pear",
+                "provider": "scripted",
+                "auto_execute": True,
+            },
+        )
+        after = client.post("/api/execute", json=read)
+
+    assert chat.status_code == 200
+    assert after.json()["cached"] is False
+    assert after.json()["results"]["rows"] == [[1, "apple"], [2, "pear"]]
+
+
+def test_chat_checks_out_session_after_llm_and_reuses_warmup(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("FERNET_KEY", generate_key())
+    monkeypatch.setitem(PROVIDER_REGISTRY, "scripted", WarmingProvider)
+    monkeypatch.setattr(WarmingProvider, "events", [])
+    sessions: list[str] = []
+
+    with TestClient(app) as client:
+        connection = _register_sqlite(client, tmp_path).get("local")
+        checkout = connection.session
+
+        @asynccontextmanager
+        async def recording_session():
+            # The pool slot is only taken once the model has produced the SQL.
+            assert [event for event, _ in WarmingProvider.events] == ["warmup", "generate"]
+            sessions.append("checkout")
+            async with checkout() as session:
+                yield session
+            sessions.append("release")
+
+        monkeypatch.setattr(connection, "session", recording_session)
+        response = client.post(
+            "/api/chat",
+            json={
+                "connection_id": "local",
+                "prompt": "list items",
+                "provider": "scripted",
+                "auto_execute": True,
+            },
+        )
+
+    assert response.status_code == 200
+    assert response.json()["results"]["rows"] == [[1, "apple"]]
+    assert sessions == ["checkout", "release"]
+    (warmup, warmed_id), (generate, generated_id) = WarmingProvider.events
+    assert (warmup, generate) == ("warmup", "generate")
+    assert warmed_id == generated_id
+
+
+def _chat(tmp_path, monkeypatch, **payload):
+    monkeypatch.setenv("FERNET_KEY", generate_key())
+    monkeypatch.setitem(PROVIDER_REGISTRY, "scripted", RepairingProvider)
+    monkeypatch.setattr(RepairingProvider, "prompts", [])
+
+    with TestClient(app) as client:
+        _register_sqlite(client, tmp_path)
+        return client.post(
+            "/api/chat",
+            json={
+                "connection_id": "local",
+                "prompt": "list items",
+                "provider": "scripted",
+                **payload,
+            },
+        )
+
+
+def test_chat_repairs_invalid_sql_before_executing(tmp_path, monkeypatch) -> None:
+    response = _chat(tmp_path, monkeypatch, auto_execute=True)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["sql"] == "select id, name from items;"
+    assert body["repairs"] == 1
+    assert body["results"]["rows"] == [[1, "apple"]]
+    assert body["tokens"]["total"] == 30
+    assert "Unknown column: nme" in RepairingProvider.prompts[-1]
+
+
+def test_chat_reports_unrepaired_sql(tmp_path, monkeypatch) -> None:
+    response = _chat(tmp_path, monkeypatch, max_repairs=0)
+
+    assert response.status_code == 422
+    detail = response.json()["detail"]
+    assert detail["sql"] == "select id, nme from items;"
+    assert detail["errors"] == ["Unknown column: nme"]
+
+
+def test_chat_follow_up_includes_conversation_history(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("FERNET_KEY", generate_key())
+    monkeypatch.setitem(PROVIDER_REGISTRY, "scripted", RecordingProvider)
+    monkeypatch.setattr(RecordingProvider, "prompts", [])
+
+    with TestClient(app) as client:
+        _register_sqlite(client, tmp_path)
+        payload = {"connection_id": "local", "provider": "scripted", "conversation_id": "c1"}
+        first = client.post("/api/chat", json={**payload, "prompt": "list items"})
+        client.post("/api/chat", json={**payload, "prompt": "only apples"})
+
+    assert first.json()["conversation_id"] == "c1"
+    assert "Conversation History" not in RecordingProvider.prompts[0]
+    follow_up = RecordingProvider.prompts[-1]
+    assert "User: list items\nSQL: select id, name from items;" in follow_up
+    assert follow_up.endswith("only apples")
+
+
+class BatchProvider(ScriptedProvider):
+    """Provider answering batch prompts; counts how many clients were created."""
+
+    instances = 0
+
+    def __init__(self) -> None:
+        super().__init__()
+        type(self).instances += 1
+
+    async def generate(self, prompt: str, **kwargs: Any) -> LLMResponse:
+        assert "Table: items" in kwargs["prefix"]
+        column = "nope" if "broken" in prompt else "name"
+        return LLMResponse(
+            content=f"select id, {column} from items", model=self.model, provider=self.name
+        )
+
+
+def test_chat_batch_streams_results_per_prompt(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("FERNET_KEY", generate_key())
+    monkeypatch.setattr(BatchProvider, "instances", 0)
+    monkeypatch.setattr(chat_routes, "get_provider", lambda name: BatchProvider())
+
+    with TestClient(app) as client:
+        _register_sqlite(client, tmp_path)
+        response = client.post(
+            "/api/chat/batch",
+            json={
+                "connection_id": "local",
+                "prompts": ["list items", "broken question", "names again"],
+                "provider": "batch",
+                "auto_execute": True,
+                "max_repairs": 0,
+            },
+        )
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    items = sorted(
+        (json.loads(line) for line in response.text.splitlines()), key=lambda item: item["index"]
+    )
+    assert [item["index"] for item in items] == [0, 1, 2]
+    assert items[0]["results"]["rows"] == [[1, "apple"]]
+    assert items[2]["sql"] == "select id, name from items;"
+    assert items[1]["results"] is None
+    assert "Unknown column: nope" in items[1]["error"]
+    assert BatchProvider.instances == 1
@@ -2,11 +2,35 @@
 
 from __future__ import annotations
 
+import asyncio
 import sqlite3
 
 import pytest
 
+from iopsdata.connections.base import QueryResult
+from iopsdata.connections.manager import ConnectionManager
+from iopsdata.connections.providers.duckdb import DuckDBConnection
 from iopsdata.connections.providers.sqlite import SQLiteConnection
+from iopsdata.connections.result_cache import QueryResultCache, canonical_sql
+from iopsdata.utils.encryption import generate_key
+
+
+def _create_items_db(path) -> None:
+    conn = sqlite3.connect(path)
+    conn.execute("create table items (id integer, name text)")
+    conn.commit()
+    conn.close()
+
+
+class CountingSQLiteConnection(SQLiteConnection):
+    """SQLite connection that counts schema extractions."""
+
+    schema_calls = 0
+
+    async def get_schema(self):
+        self.schema_calls += 1
+        await asyncio.sleep(0)
+        return await super().get_schema()
 
 
 @pytest.mark.asyncio
@@ -27,6 +51,32 @@ async def test_sqlite_connection_execute(tmp_path) -> None:
     assert result.columns == ["id", "name"]
 
 
+@pytest.mark.asyncio
+async def test_duckdb_connection_execute(tmp_path) -> None:
+    db_path = tmp_path / "test.duckdb"
+    connection = DuckDBConnection(name="test", path=str(db_path), read_only=False)
+    await connection.connect()
+    await connection.execute("create table items (id integer, name text)")
+    await connection.execute("insert into items values (1, 'apple')")
+    result = await connection.execute("select * from items")
+    await connection.disconnect()
+
+    assert result.rows == [(1, "apple")]
+
+
+@pytest.mark.asyncio
+async def test_sqlite_explain_plans_without_running(tmp_path) -> None:
+    db_path = tmp_path / "test.db"
+    _create_items_db(db_path)
+
+    connection = SQLiteConnection(name="test", path=str(db_path), read_only=True)
+    await connection.connect()
+    await connection.explain("select id from items where id in (select id from items)")
+    with pytest.raises(RuntimeError, match="no such column"):
+        await connection.explain("select id from items where id in (select nope from items)")
+    await connection.disconnect()
+
+
 @pytest.mark.asyncio
 async def test_sqlite_connection_read_only_blocks(tmp_path) -> None:
     db_path = tmp_path / "test.db"
@@ -57,3 +107,200 @@ async def test_sqlite_schema_extraction(tmp_path) -> None:
 
     assert schema
     assert schema[0]["name"] == "items"
+
+
+@pytest.mark.asyncio
+async def test_schema_context_memoized_per_dialect(tmp_path) -> None:
+    db_path = tmp_path / "test.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute("create table items (id integer, name text)")
+    conn.commit()
+    conn.close()
+
+    manager = ConnectionManager(generate_key())
+    connection = SQLiteConnection(name="test", path=str(db_path), read_only=True)
+    await connection.connect()
+    manager.register("test", connection)
+
+    first = await manager.schema_context_for("test", dialect="sqlite")
+    second = await manager.schema_context_for("test", dialect="SQLite")
+    other = await manager.schema_context_for("test", dialect="postgresql")
+    await manager.disconnect("test")
+
+    assert first is second
+    assert other is not first
+    assert other.fingerprint == first.fingerprint
+    assert "Table: items" in first.text
+    assert [table.name for table in first.tables] == ["items"]
+
+
+@pytest.mark.asyncio
+async def test_schema_context_survives_refresh_with_same_fingerprint(tmp_path) -> None:
+    db_path = tmp_path / "test.db"
+    _create_items_db(db_path)
+
+    manager = ConnectionManager(generate_key(), schema_ttl_s=0)
+    connection = CountingSQLiteConnection(name="test", path=str(db_path), read_only=True)
+    await connection.connect()
+    manager.register("test", connection)
+
+    first = await manager.schema_context_for("test")
+    second = await manager.schema_context_for("test")
+    await manager.disconnect("test")
+
+    assert connection.schema_calls == 2
+    assert second is first
+
+
+@pytest.mark.asyncio
+async def test_schema_context_rebuilt_when_fingerprint_changes(tmp_path) -> None:
+    db_path = tmp_path / "test.db"
+    _create_items_db(db_path)
+
+    manager = ConnectionManager(generate_key(), schema_ttl_s=0)
+    connection = SQLiteConnection(name="test", path=str(db_path), read_only=True)
+    await connection.connect()
+    manager.register("test", connection)
+    first = await manager.schema_context_for("test")
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("create table orders (id integer, item_id integer)")
+    conn.commit()
+    conn.close()
+
+    second = await manager.schema_context_for("test")
+    await manager.disconnect("test")
+
+    assert second.fingerprint != first.fingerprint
+    assert second is not first
+    assert "Table: orders" in second.text
+
+
+@pytest.mark.asyncio
+async def test_schema_refresh_is_single_flighted(tmp_path) -> None:
+    db_path = tmp_path / "test.db"
+    _create_items_db(db_path)
+
+    manager = ConnectionManager(generate_key())
+    connection = CountingSQLiteConnection(name="test", path=str(db_path), read_only=True)
+    await connection.connect()
+    manager.register("test", connection)
+
+    contexts = await asyncio.gather(*(manager.schema_context_for("test") for _ in range(5)))
+    await manager.disconnect("test")
+
+    assert connection.schema_calls == 1
+    assert all(context is contexts[0] for context in contexts)
+
+
+@pytest.mark.asyncio
+async def test_register_replacement_invalidates_schema(tmp_path) -> None:
+    first_path = tmp_path / "first.db"
+    second_path = tmp_path / "second.db"
+    _create_items_db(first_path)
+    conn = sqlite3.connect(second_path)
+    conn.execute("create table orders (id integer)")
+    conn.commit()
+    conn.close()
+
+    manager = ConnectionManager(generate_key())
+    first = SQLiteConnection(name="test", path=str(first_path), read_only=True)
+    second = SQLiteConnection(name="test", path=str(second_path), read_only=True)
+    await first.connect()
+    await second.connect()
+
+    manager.register("test", first)
+    assert "Table: items" in (await manager.schema_context_for("test")).text
+    manager.register("test", first)
+    assert "Table: items" in (await manager.schema_context_for("test")).text
+    manager.register("test", second)
+    context = await manager.schema_context_for("test")
+    await first.disconnect()
+    await manager.disconnect("test")
+
+    assert "Table: orders" in context.text
+    assert "Table: items" not in context.text
+
+
+@pytest.mark.asyncio
+async def test_result_cache_invalidates_only_tables_written(tmp_path) -> None:
+    db_path = tmp_path / "cache.db"
+    _create_items_db(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute("create table orders (id integer)")
+    conn.commit()
+    conn.close()
+    connection = SQLiteConnection(name="local", path=str(db_path), read_only=False)
+    await connection.connect()
+    cache = QueryResultCache()
+
+    async def run(sql: str, *params) -> tuple[int, bool]:
+        result, cached = await cache.execute("local", connection, sql, params)
+        return result.row_count, cached
+
+    assert await run("select * from items") == (0, False)
+    assert await run("SELECT *\n  FROM items") == (0, True)
+    assert await run("select * from orders") == (0, False)
+    assert await run("insert into items values (?, ?)", 1, "apple") == (0, False)
+    assert await run("select * from items") == (1, False)
+    assert await run("select * from orders") == (0, True)
+    assert await run("select * from items where id = ?", 2) == (0, False)
+    assert await run("select * from items where id = ?", 1) == (1, False)
+    await connection.disconnect()
+
+
+def test_result_cache_plans_nested_and_untargeted_writes() -> None:
+    cache = QueryResultCache()
+
+    def plan(sql: str) -> tuple[bool, list[str]]:
+        query_plan = cache.plan("local", sql, dialect="postgresql")
+        return query_plan.cacheable, sorted(query_plan.tables_written)
+
+    assert plan("with d as (delete from orders returning *) select * from d") == (
+        False,
+        ["orders"],
+    )
+    assert plan("select id into new_items from items") == (False, ["new_items"])
+    assert plan("insert into public.items (id, name) values (1, 'a')") == (False, ["items"])
+    for sql in ("truncate items", "drop table items", "alter table items add column x int"):
+        assert plan(sql) == (False, ["items"])
+    for sql in ("select setval('items_id_seq', 1)", "select * from items for update"):
+        assert plan(sql) == (False, [])
+    assert plan("select count(*) from items") == (True, [])
+
+
+@pytest.mark.asyncio
+async def test_result_cache_flushes_connection_for_untargeted_writes() -> None:
+    cache = QueryResultCache()
+    result = QueryResult(columns=["n"], rows=[(1,)], row_count=1)
+
+    class Session:
+        async def execute(self, query: str, *args) -> QueryResult:
+            return result
+
+        async def explain(self, query: str) -> QueryResult:
+            return result
+
+    session = cache.session("local", Session(), "postgresql")
+    for sql in ("copy items from '/tmp/items.csv'", "select setval('items_id_seq', 1)"):
+        await session.execute("select * from items")
+        assert len(cache) == 1
+        await session.execute(sql)
+        assert len(cache) == 0
+
+
+def test_result_cache_evicts_lru_and_honours_connection_ttl() -> None:
+    cache = QueryResultCache(max_entries=2)
+    result = QueryResult(columns=[], rows=[], row_count=0)
+    keys = [cache.plan("local", f"select * from t{index}").key for index in range(3)]
+    for key in keys:
+        cache.put(key, result, [])
+
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[2]) is result
+    assert cache.stats.evictions == 1
+
+    cache.set_ttl("uncached", 0)
+    cache.put(cache.plan("uncached", "select 1").key, result, [])
+    assert len(cache) == 2
+    assert canonical_sql("select  a from T") == canonical_sql("SELECT a FROM t")
@@ -0,0 +1,157 @@
+"""Tests for batched Supabase writes."""
+
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+from typing import Any
+
+from iopsdata.db import supabase as supabase_module
+from iopsdata.db.batching import BatchWriter
+from iopsdata.db.supabase import SupabaseClientWrapper, SupabaseConfig
+from iopsdata.lineage.tracker import LineageTracker, SupabaseLineageStore
+from iopsdata.llm.usage import SupabaseUsageSink, UsageRecord, UsageRecorder
+
+
+class _LocalTable:
+    def __init__(self, store: LocalSupabase, name: str) -> None:
+        self._store, self._name = store, name
+        self._rows: list[dict[str, Any]] | None = None
+        self._filters: list[tuple[str, Any]] = []
+
+    def insert(self, rows: dict[str, Any] | list[dict[str, Any]]) -> _LocalTable:
+        self._rows = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def select(self, _columns: str) -> _LocalTable:
+        return self
+
+    def eq(self, column: str, value: Any) -> _LocalTable:
+        self._filters.append((column, value))
+        return self
+
+    def order(self, column: str, desc: bool = False) -> _LocalTable:
+        return self
+
+    async def execute(self) -> SimpleNamespace:
+        table = self._store.tables.setdefault(self._name, [])
+        if self._rows is not None:
+            self._store.insert_calls += 1
+            table.extend(self._rows)
+            return SimpleNamespace(data=self._rows)
+        rows = [row for row in table if all(row.get(c) == v for c, v in self._filters)]
+        return SimpleNamespace(data=rows)
+
+
+class LocalSupabase:
+    """Stand-in for the Supabase async client backed by in-memory tables."""
+
+    def __init__(self) -> None:
+        self.tables: dict[str, list[dict[str, Any]]] = {}
+        self.insert_calls = 0
+
+    def table(self, name: str) -> _LocalTable:
+        return _LocalTable(self, name)
+
+
+def _local_wrapper(**config: Any) -> tuple[SupabaseClientWrapper, LocalSupabase]:
+    wrapper = SupabaseClientWrapper(SupabaseConfig(url="http://local", anon_key="k", **config))
+    local = LocalSupabase()
+    wrapper._client = local  # type: ignore[assignment]
+    return wrapper, local
+
+
+async def test_batch_writer_batches_by_size_and_interval() -> None:
+    batches: list[list[dict[str, Any]]] = []
+
+    async def write(rows: list[dict[str, Any]]) -> None:
+        batches.append(rows)
+
+    writer = BatchWriter(write, max_batch=3, flush_interval_s=0.05)
+    for index in range(4):
+        await writer.put({"id": index})
+    await asyncio.sleep(0.15)
+    assert [len(batch) for batch in batches] == [3, 1]
+
+    await writer.put({"id": 4})
+    await writer.close()
+    assert writer.stats.written == 5
+    assert writer.stats.batches == 3
+
+
+async def test_batch_writer_retries_and_drops_when_full() -> None:
+    attempts: list[int] = []
+
+    async def flaky(rows: list[dict[str, Any]]) -> None:
+        attempts.append(len(rows))
+        if len(attempts) < 3:
+            raise RuntimeError("unavailable")
+
+    writer = BatchWriter(flaky, max_batch=10, flush_interval_s=10, backoff_s=0.001)
+    await writer.put({"id": 1})
+    await writer.flush()
+    assert attempts == [1, 1, 1]
+    assert writer.stats.retries == 2
+    assert writer.stats.written == 1
+
+    async def failing(rows: list[dict[str, Any]]) -> None:
+        raise RuntimeError("down")
+
+    writer = BatchWriter(failing, max_queue=2, policy="drop", max_retries=1, backoff_s=0.001)
+    accepted = [await writer.put({"id": index}) for index in range(5)]
+    assert accepted.count(False) >= 2
+    await writer.close()
+    assert writer.stats.failed + writer.stats.dropped == 5
+
+
+async def test_supabase_wrapper_bulk_inserts_queued_rows() -> None:
+    wrapper, local = _local_wrapper(batch_size=50, batch_interval_s=10)
+    store = SupabaseLineageStore(wrapper)
+    tracker = LineageTracker("s1", store)
+    await tracker.track("insert into staging select * from raw")
+    await tracker.track("select * from staging")
+    for index in range(3):
+        await wrapper.log_query_history({"sql": f"select {index}"})
+    assert local.insert_calls == 0
+
+    records = await store.list("s1")
+    assert [record.dependencies for record in records] == [[], ["staging"]]
+    await wrapper.close()
+    assert len(local.tables["query_history"]) == 3
+    assert local.insert_calls == 2
+
+
+async def test_shared_supabase_client_is_reused_and_flushed_on_close(monkeypatch) -> None:
+    monkeypatch.setenv("SUPABASE_URL", "http://local")
+    monkeypatch.setenv("SUPABASE_ANON_KEY", "k")
+    monkeypatch.setattr(supabase_module, "_shared_client", None)
+    local = LocalSupabase()
+
+    async def create_client(self: SupabaseClientWrapper) -> LocalSupabase:
+        return local
+
+    monkeypatch.setattr(SupabaseClientWrapper, "_create_client", create_client)
+    first = await supabase_module.get_supabase_client()
+    second = await supabase_module.get_supabase_client()
+    assert first is second
+    assert await first.insert_message({"content": "hi"})
+    assert await second.log_query_history({"sql": "select 1"})
+    assert local.insert_calls == 0
+
+    await supabase_module.close_supabase_client()
+    assert supabase_module._shared_client is None
+    assert local.tables["messages"] == [{"content": "hi"}]
+    assert local.tables["query_history"] == [{"sql": "select 1"}]
+
+
+async def test_supabase_usage_sink_batches_through_the_wrapper() -> None:
+    wrapper, local = _local_wrapper(batch_size=50, batch_interval_s=10)
+    recorder = UsageRecorder(sink=SupabaseUsageSink(wrapper), flush_size=100)
+    for _ in range(3):
+        recorder.record(UsageRecord(provider="mock", model="mock-sql", operation="chat"))
+    assert await recorder.flush() == 3
+    assert local.insert_calls == 0
+
+    await recorder.close()
+    assert len(local.tables["llm_usage"]) == 3
+    assert local.insert_calls == 1
@@ -2,7 +2,25 @@
 
 from __future__ import annotations
 
+import json
+import time
+
+import pytest
+from sqlglot import expressions as exp
+
+from iopsdata.lineage.backfill import backfill, iter_file_statements
+from iopsdata.lineage.columns import extract_column_lineage
+from iopsdata.lineage.graph import LineageCycleError, LineageGraph
+from iopsdata.lineage.offload import (
+    LineageParser,
+    LineageParseTimeout,
+    SqlTooLargeError,
+    build_lineage_parser,
+)
+from iopsdata.lineage.parse_cache import ParseCache
 from iopsdata.lineage.parser import extract_lineage
+from iopsdata.lineage.script import extract_script_lineage, split_statements
+from iopsdata.lineage.tracker import InMemoryLineageStore, LineageTracker
 
 
 def test_extract_lineage_select() -> None:
@@ -22,3 +40,336 @@ def test_extract_lineage_insert() -> None:
     lineage = extract_lineage(sql)
     assert "archive" in lineage.tables_written
     assert "events" in lineage.tables_read
+
+
+def test_parse_cache_reuses_trees_and_copies_on_read() -> None:
+    cache = ParseCache(max_entries=2)
+    first = cache.parse("select id from users")
+    first.set("where", None)
+    first.find(exp.Table).set("this", exp.to_identifier("mutated"))
+
+    assert cache.parse("select id from users").sql() == "SELECT id FROM users"
+    assert cache.parse("select id from users", copy=False) is cache.parse(
+        "select id from users", copy=False
+    )
+    assert (cache.stats.hits, cache.stats.misses) == (3, 1)
+
+    cache.parse("select 1")
+    cache.parse("select 2")
+    assert len(cache) == 2
+    assert cache.stats.evictions == 1
+    assert cache.info()["hit_rate"] == 0.5
+
+
+def test_fingerprint_ignores_literals_case_and_whitespace() -> None:
+    cache = ParseCache()
+    base = cache.fingerprint("select * from orders where id = 1 and status = 'open'")
+
+    assert cache.fingerprint("SELECT *\nFROM orders WHERE id = 42 AND status = 'closed'") == base
+    assert cache.fingerprint("select * from orders where customer_id = 1") != base
+    assert cache.parse("select * from orders where id = 1", copy=False).sql() == (
+        "SELECT * FROM orders WHERE id = 1"
+    )
+
+
+def _chain_graph() -> tuple[LineageGraph, list[str]]:
+    graph = LineageGraph()
+    queries = [
+        graph.add_query(extract_lineage(sql))
+        for sql in (
+            "insert into staging select * from raw_events",
+            "insert into daily select * from staging",
+            "insert into report select * from daily join dim_users on true",
+        )
+    ]
+    return graph, queries
+
+
+def test_lineage_graph_traverses_upstream_and_downstream() -> None:
+    graph, queries = _chain_graph()
+
+    assert graph.downstream("table:raw_events", max_depth=2) == [queries[0], "table:staging"]
+    assert graph.downstream("table:raw_events")[-1] == "table:report"
+    assert set(graph.upstream("table:report", max_depth=2)) == {
+        queries[2],
+        "table:daily",
+        "table:dim_users",
+    }
+    assert [depth for _, depth in graph.walk("table:report", "upstream")] == [1, 2, 2, 3, 4, 5, 6]
+    assert set(graph.downstream("table:raw_events")) == {
+        node for node, _ in graph.walk("table:raw_events", depth_first=True)
+    }
+    with pytest.raises(KeyError):
+        graph.upstream("table:missing")
+
+
+def test_lineage_graph_deduplicates_edges_and_orders_topologically() -> None:
+    graph, _ = _chain_graph()
+    edges = graph.edge_count
+
+    assert graph.add_edge("table:staging", "table:daily", "feeds")
+    assert not graph.add_edge("table:staging", "table:daily", "feeds")
+    assert graph.edge_count == edges + 1
+    order = graph.topological_order()
+    assert order.index("table:raw_events") < order.index("table:staging") < order.index(
+        "table:report"
+    )
+    assert graph.find_cycle() is None
+
+    graph.add_edge("table:report", "table:raw_events", "feeds")
+    with pytest.raises(LineageCycleError) as excinfo:
+        graph.topological_order()
+    assert excinfo.value.cycle[0] == excinfo.value.cycle[-1]
+    assert "table:report" in excinfo.value.cycle
+    assert len(graph.to_dict()["edges"]) == graph.edge_count
+
+
+def test_column_lineage_resolves_ctes_subqueries_and_aliases() -> None:
+    schema = {
+        "orders": {"id": "int", "amount": "int", "customer_id": "int"},
+        "customers": {"id": "int", "name": "text"},
+    }
+    sql = """
+        with recent as (
+            select o.id as order_id, name from orders o join customers c on o.customer_id = c.id
+        )
+        select r.order_id, upper(name) as customer, t.total, count(*) as n
+        from recent r
+        join (select customer_id, sum(amount) as total from orders group by 1) t
+          on t.customer_id = r.order_id
+        group by 1, 2, 3
+    """
+
+    assert extract_column_lineage(sql, schema) == {
+        "order_id": ["orders.id"],
+        "customer": ["customers.name"],
+        "total": ["orders.amount"],
+        "n": [],
+    }
+    assert extract_column_lineage("insert into archive (ref) select id from orders", schema) == {
+        "archive.ref": ["orders.id"]
+    }
+
+
+def test_lineage_graph_resolves_columns_lazily() -> None:
+    graph = LineageGraph()
+    query = graph.add_query(extract_lineage("insert into archive select id, amount from orders"))
+    edges = graph.edge_count
+
+    assert not any(node.node_type == "column" for node in graph.nodes.values())
+    assert graph.resolve_columns(query)["archive.amount"] == ["orders.amount"]
+    assert graph.upstream("column:archive.amount", max_depth=1) == [query, "column:orders.amount"]
+    assert graph.edge_count == edges + 4
+    graph.resolve_columns(query)
+    assert graph.edge_count == edges + 4
+
+
+async def test_lineage_tracker_resolves_dependencies_from_last_writers() -> None:
+    store = InMemoryLineageStore([])
+    tracker = LineageTracker("s1", store, snapshot_every=2)
+    first = await tracker.track("insert into staging select * from raw")
+    assert first.dependencies == []
+    await tracker.track("insert into report select * from staging join dim on staging.id = dim.id")
+    await tracker.track("insert into staging select * from raw2")
+    record = await tracker.track("select * from report join staging on report.id = staging.id")
+    assert record.dependencies == ["report", "staging"]
+    assert tracker.last_writer("staging") == 3
+    assert tracker.last_writer("dim") is None
+    assert await store.load_snapshot("s1") == tracker.snapshot()
+
+    resumed = await LineageTracker.resume("s1", store)
+    assert resumed.snapshot() == tracker.snapshot()
+    store._snapshots.clear()
+    replayed = await LineageTracker.resume("s1", store)
+    assert replayed.snapshot() == tracker.snapshot()
+
+
+async def test_lineage_tracker_resume_replays_statements_after_snapshot() -> None:
+    store = InMemoryLineageStore([])
+    tracker = LineageTracker("s1", store, snapshot_every=2)
+    await tracker.track("insert into staging select * from raw")
+    await tracker.track("insert into report select * from staging")
+    await tracker.track("insert into archive select * from report")
+    assert (await store.load_snapshot("s1"))["statements"] == 2
+
+    resumed = await LineageTracker.resume("s1", store, snapshot_every=2)
+    assert resumed.snapshot() == tracker.snapshot()
+    assert resumed.last_writer("archive") == 3
+    record = await resumed.track("select * from archive")
+    assert record.dependencies == ["archive"]
+
+
+async def test_in_memory_lineage_store_pages_by_session_table_and_time() -> None:
+    store = InMemoryLineageStore([])
+    tracker = LineageTracker("s1", store)
+    other = LineageTracker("s2", store)
+    for index in range(5):
+        await tracker.track(f"insert into t{index % 2} select * from raw")
+    await other.track("select * from t0")
+    records = await tracker.history()
+
+    first = await tracker.history_page(limit=2)
+    assert first.records == records[::-1][:2]
+    second = await tracker.history_page(cursor=first.next_cursor, limit=2)
+    third = await tracker.history_page(cursor=second.next_cursor, limit=2)
+    assert second.records + third.records == records[::-1][2:]
+    assert third.next_cursor is None
+
+    touched = await tracker.history_page(table="t0", limit=10)
+    assert touched.records == [records[4], records[2], records[0]]
+    recent = await tracker.history_page(since=records[3].created_at, limit=10)
+    assert recent.records == [records[4], records[3]]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_backfill_dedupes_statements_and_merges_lineage(tmp_path, workers: int) -> None:
+    log = tmp_path / "queries.jsonl"
+    rows = [
+        {"sql_query": "select * from orders where id = 1"},
+        {"sql_query": "select *  from orders\nwhere id = 2;"},
+        {"sql_query": "insert into daily select * from orders where day = '2024-01-01'"},
+        {"sql_query": "select from where"},
+        {"sql_query": "select * from orders where id = 3"},
+    ]
+    log.write_text("\n".join(json.dumps(row) for row in rows))
+
+    report = backfill(iter_file_statements(log), workers=workers, chunk_size=1)
+    assert (report.statements, report.unique, report.failed) == (5, 3, 1)
+    queries = [node for node in report.graph.nodes.values() if node.node_type == "query"]
+    assert sorted(node.metadata["occurrences"] for node in queries) == ["1", "3"]
+    assert report.graph.downstream("table:orders", max_depth=2)[-1] == "table:daily"
+    assert report.statements_per_s > 0
+
+
+def test_lineage_graph_streams_exports_and_deltas(tmp_path) -> None:
+    graph = LineageGraph()
+    graph.add_query(extract_lineage("insert into daily select * from orders"))
+    seen = graph.version
+    query = graph.add_query(extract_lineage("select * from daily join users on 1 = 1"))
+
+    document = json.loads("".join(graph.iter_json()))
+    assert document["version"] == graph.version
+    assert document == {"version": graph.version, **graph.to_dict()}
+    lines = [json.loads(line) for line in graph.iter_ndjson()]
+    assert sum(line["kind"] == "edge" for line in lines) == graph.edge_count
+    assert lines[-1] == {"kind": "version", "version": graph.version}
+
+    delta = graph.delta(seen)
+    assert [node["id"] for node in delta["nodes"]] == [query, "table:users"]
+    assert {(edge["source"], edge["relation"]) for edge in delta["edges"]} == {
+        ("table:daily", "reads"),
+        ("table:users", "reads"),
+    }
+    assert json.loads("".join(graph.iter_json(since=graph.version)))["nodes"] == []
+    assert not hasattr(graph.nodes[query], "__dict__")
+
+
+def test_lineage_graph_exports_parquet(tmp_path) -> None:
+    pq = pytest.importorskip("pyarrow.parquet")
+    graph = LineageGraph()
+    graph.add_query(extract_lineage("insert into daily select * from orders"))
+    nodes_path, edges_path = graph.write_parquet(tmp_path)
+    assert pq.read_table(nodes_path).num_rows == len(graph)
+    assert pq.read_table(edges_path).column("relation").to_pylist() == ["reads", "writes"]
+
+
+def test_lineage_graph_neighborhood_skips_query_hops_and_caps_nodes() -> None:
+    graph = LineageGraph()
+    for sql in (
+        "insert into b select * from a",
+        "insert into c select * from b",
+        "insert into d select * from c",
+        "insert into x select * from a",
+    ):
+        graph.add_query(extract_lineage(sql))
+
+    around = graph.neighborhood("table:b", max_depth=1)
+    assert {node["id"] for node in around["nodes"]} == {"table:a", "table:b", "table:c"}
+    assert not around["truncated"]
+
+    raw = graph.neighborhood("table:b", max_depth=1, aggregate_queries=False)
+    assert {edge["relation"] for edge in raw["edges"]} == {"reads", "writes"}
+
+    # Folded-away queries do not count towards max_nodes: a, b, x and c, but not d.
+    capped = graph.neighborhood("table:a", max_depth=3, direction="downstream", max_nodes=4)
+    assert capped["truncated"]
+    assert [node["depth"] for node in capped["nodes"]] == [0, 1, 1, 2]
+    # Without aggregation the queries are shown and do count: a, its two queries, b and x.
+    raw = graph.neighborhood(
+        "table:a", max_depth=3, direction="downstream", max_nodes=5, aggregate_queries=False
+    )
+    assert raw["truncated"]
+    assert [node["depth"] for node in raw["nodes"]] == [0, 0, 0, 1, 1]
+
+
+def test_lineage_graph_neighborhood_folds_many_readers() -> None:
+    graph = LineageGraph()
+    graph.add_query(extract_lineage("insert into orders select * from raw_orders"))
+    graph.add_query(extract_lineage("insert into daily_sales select * from orders"))
+    for index in range(500):
+        graph.add_query(extract_lineage(f"select * from orders where id = {index}"))
+
+    around = graph.neighborhood("table:orders", max_depth=1, max_nodes=200, max_queries=10)
+    assert {node["id"] for node in around["nodes"]} == {
+        "table:orders",
+        "table:raw_orders",
+        "table:daily_sales",
+    }
+    assert {(edge["source"], edge["target"]) for edge in around["edges"]} == {
+        ("table:raw_orders", "table:orders"),
+        ("table:orders", "table:daily_sales"),
+    }
+    center = next(node for node in around["nodes"] if node["id"] == "table:orders")
+    assert center["readers"] == 500
+    assert not around["truncated"]
+
+
+async def test_lineage_parser_offloads_with_size_and_time_limits() -> None:
+    parser = LineageParser(max_workers=1, max_sql_bytes=64, timeout_s=0.05)
+    lineage = await parser.run("select * from users", extract_lineage, "select * from users")
+    assert lineage.tables_read == ["users"]
+    with pytest.raises(SqlTooLargeError):
+        await parser.run("x" * 65, extract_lineage, "x" * 65)
+    with pytest.raises(LineageParseTimeout):
+        await parser.run("select 1", time.sleep, 0.3)
+    parser.close()
+
+
+MIGRATION = """
+-- nightly migration
+create table a (id int);
+create table b (id int); -- trailing; comment
+insert into a select * from raw where note = 'x;y';
+insert into b select * from raw2;
+create table c as select * from a join b on a.id = b.id;
+alter table a add column z int;
+commit;
+select * from c
+"""
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_script_lineage_orders_statements_into_concurrent_stages(workers: int) -> None:
+    assert len(split_statements(MIGRATION)) == 8
+    script = extract_script_lineage(MIGRATION, workers=workers)
+    assert script.statements[2].sql == "insert into a select * from raw where note = 'x;y'"
+    assert script.statements[5].tables_written == ["a"]
+    # The ALTER waits for the last write to `a` and for the CTAS that reads it.
+    assert script.dependencies[5] == [2, 4]
+    assert script.dependencies[6] == [0, 1, 2, 3, 4, 5]
+    assert script.stages == [[0, 1], [2, 3], [4], [5], [6], [7]]
+
+
+def test_script_lineage_reuses_the_parser_process_pool(monkeypatch) -> None:
+    monkeypatch.setenv("LINEAGE_SCRIPT_WORKERS", "2")
+    parser = build_lineage_parser()
+    executor = parser.script_executor()
+    assert parser.script_workers == 2
+    assert parser.script_executor() is executor
+    for _ in range(2):
+        script = extract_script_lineage(MIGRATION, workers=2, executor=executor)
+        assert script.stages == [[0, 1], [2, 3], [4], [5], [6], [7]]
+    parser.close()
+
+    monkeypatch.setenv("LINEAGE_SCRIPT_WORKERS", "1")
+    assert build_lineage_parser().script_executor() is None
@@ -0,0 +1,86 @@
+"""Tests for the schema context engine."""
+
+from __future__ import annotations
+
+from iopsdata.llm.context import (
+    StreamingSQLExtractor,
+    table_from_dict,
+    validate_sql_against_schema,
+)
+
+SCHEMA = [
+    table_from_dict({"name": "public.users", "columns": [{"name": "id"}, {"name": "email"}]}),
+    table_from_dict({"name": "public.orders", "columns": [{"name": "id"}, {"name": "user_id"}]}),
+]
+
+
+def test_streaming_extractor_detects_closed_code_block() -> None:
+    extractor = StreamingSQLExtractor()
+    assert extractor.feed("```sql\nselect id ") is None
+    assert extractor.feed("from users\n") is None
+    assert extractor.feed("```") == "select id from users;"
+    assert extractor.feed(" trailing explanation") is None
+
+
+def test_streaming_extractor_detects_bare_statement() -> None:
+    extractor = StreamingSQLExtractor()
+    assert extractor.feed("select * from t where name = ';") is None
+    assert extractor.feed("'") is None
+    assert extractor.feed(";\n") == "select * from t where name = ';';"
+
+
+def test_streaming_extractor_ignores_prose_before_code_block() -> None:
+    extractor = StreamingSQLExtractor()
+    assert extractor.feed("This will select the users; then group them.\n") is None
+    assert extractor.feed("```sql\nselect team, count(*) from users group by team\n") is None
+    assert extractor.feed("```") == "select team, count(*) from users group by team;"
+
+
+def test_streaming_extractor_finish_falls_back_to_full_text() -> None:
+    extractor = StreamingSQLExtractor()
+    extractor.feed("select count(*) from orders")
+    assert extractor.finish() == "select count(*) from orders;"
+
+
+def test_streaming_extractor_finish_without_sql() -> None:
+    extractor = StreamingSQLExtractor()
+    extractor.feed("I cannot help with that.")
+    assert extractor.finish() is None
+
+
+def test_validator_accepts_known_tables_and_columns() -> None:
+    sql = (
+        "select u.email, count(*) as n from users u "
+        "join public.orders o on o.user_id = u.id group by u.email order by n"
+    )
+    assert validate_sql_against_schema(sql, SCHEMA, "postgresql") == []
+
+
+def test_validator_reports_unknown_tables_and_columns() -> None:
+    assert validate_sql_against_schema("select * from userz", SCHEMA) == ["Unknown table: userz"]
+    assert validate_sql_against_schema("select u.mail from users u", SCHEMA) == [
+        "Unknown column: u.mail"
+    ]
+    assert validate_sql_against_schema("select user_id from users", SCHEMA) == [
+        "Unknown column: user_id"
+    ]
+
+
+def test_validator_defers_unresolvable_sql_to_database() -> None:
+    cte = "with x as (select id from users) select y from x"
+    assert validate_sql_against_schema(cte, SCHEMA) == []
+    assert validate_sql_against_schema("select from where", SCHEMA) == []
+
+
+def test_validator_skips_system_catalogs_and_derived_sources() -> None:
+    catalog = "select table_name from information_schema.tables where table_schema = 'public'"
+    assert validate_sql_against_schema(catalog, SCHEMA, "postgresql") == []
+    assert validate_sql_against_schema("select * from pg_catalog.pg_tables", SCHEMA) == []
+    assert validate_sql_against_schema("select relname from pg_class", SCHEMA) == []
+    assert validate_sql_against_schema("select v from (values (1)) as t(v)", SCHEMA) == []
+    derived = "select d.total from (select count(*) as total from orders) as d"
+    assert validate_sql_against_schema(derived, SCHEMA) == []
+    assert validate_sql_against_schema("insert into users values (1, 'a')", SCHEMA) == []
+    assert validate_sql_against_schema("select user_id from users", SCHEMA) == [
+        "Unknown column: user_id"
+    ]
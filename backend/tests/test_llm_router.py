@@ -2,9 +2,69 @@
 
 from __future__ import annotations
 
+import asyncio
+import json
 import os
+from typing import Any
 
-from iopsdata.llm.router import configured_providers, get_provider
+import httpx
+import pytest
+
+from iopsdata.llm import router as llm_router
+from iopsdata.llm.base import (
+    BaseLLMProvider,
+    LLMProviderError,
+    LLMResponse,
+    RateLimitError,
+    SSEDecoder,
+    iter_ndjson,
+    parse_retry_after,
+)
+from iopsdata.llm.health import ProviderHealthRegistry
+from iopsdata.llm.hedging import LatencyTracker, generate_hedged
+from iopsdata.llm.providers.anthropic import AnthropicProvider
+from iopsdata.llm.providers.groq import GroqProvider
+from iopsdata.llm.providers.mock import MockProvider
+from iopsdata.llm.providers.ollama import OllamaProvider
+from iopsdata.llm.providers.openai import OpenAIProvider
+from iopsdata.llm.router import (
+    PROVIDER_REGISTRY,
+    configured_providers,
+    generate_routed,
+    get_provider,
+    route_providers,
+)
+from iopsdata.llm.usage import JSONLUsageSink, UsageRecord, UsageRecorder, estimate_cost
+from iopsdata.utils import rate_limit
+
+
+def _fake_provider(provider_name: str, delay_s: float, content: str, events: list[str]):
+    class FakeProvider(BaseLLMProvider):
+        default_model = f"{provider_name}-model"
+
+        def __init__(self) -> None:
+            super().__init__(model=self.default_model)
+
+        @property
+        def name(self) -> str:
+            return provider_name
+
+        def is_configured(self) -> bool:
+            return True
+
+        async def generate(self, prompt: str, **kwargs: Any) -> LLMResponse:
+            events.append(f"start:{provider_name}")
+            await asyncio.sleep(delay_s)
+            if content.startswith("error"):
+                raise LLMProviderError(content)
+            if content.startswith("429"):
+                raise RateLimitError(content, retry_after=30)
+            return LLMResponse(content=content, model=self.model, provider=provider_name)
+
+        async def close(self) -> None:
+            events.append(f"close:{provider_name}")
+
+    return FakeProvider
 
 
 def test_get_provider_returns_instance() -> None:
@@ -21,3 +81,425 @@ def test_configured_providers_respects_env(monkeypatch) -> None:
     monkeypatch.setenv("GROQ_API_KEY", "test")
     providers = configured_providers()
     assert "groq" in providers
+
+
+def test_routing_does_not_instantiate_providers(monkeypatch) -> None:
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    monkeypatch.setenv("OLLAMA_MODEL", "qwen2.5-coder")
+    monkeypatch.setattr(llm_router, "provider_health", ProviderHealthRegistry())
+    built: list[str] = []
+    for name, provider_cls in list(PROVIDER_REGISTRY.items()):
+        monkeypatch.setattr(
+            provider_cls, "__init__", lambda self, *a, _n=name, **k: built.append(_n)
+        )
+
+    routed = route_providers()
+
+    assert {"groq", "ollama"} <= set(routed)
+    assert "mock" not in routed
+    assert built == []
+    assert OllamaProvider.env_model() == "qwen2.5-coder"
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_takes_fastest_valid_response(monkeypatch) -> None:
+    events: list[str] = []
+    monkeypatch.setitem(PROVIDER_REGISTRY, "slow", _fake_provider("slow", 1.0, "select 1", events))
+    monkeypatch.setitem(PROVIDER_REGISTRY, "fast", _fake_provider("fast", 0.01, "select 2", events))
+
+    tracker = LatencyTracker()
+    response = await generate_hedged("q", ["slow", "fast"], hedge_delay_s=0.05, tracker=tracker)
+
+    assert response.provider == "fast"
+    assert events[:2] == ["start:slow", "start:fast"]
+    assert "close:slow" in events
+    assert tracker.percentile("fast", 0.5) is not None
+    assert tracker.percentile("slow", 0.5) is None
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_fails_over_immediately(monkeypatch) -> None:
+    events: list[str] = []
+    monkeypatch.setitem(
+        PROVIDER_REGISTRY, "broken", _fake_provider("broken", 0, "error: 500", events)
+    )
+    monkeypatch.setitem(PROVIDER_REGISTRY, "prose", _fake_provider("prose", 0, "no idea", events))
+    monkeypatch.setitem(PROVIDER_REGISTRY, "good", _fake_provider("good", 0, "select 3", events))
+
+    response = await generate_hedged("q", ["broken", "prose", "good"], hedge_delay_s=5.0)
+
+    assert response.provider == "good"
+
+
+def test_latency_tracker_hedge_delay_adapts() -> None:
+    tracker = LatencyTracker(default_delay_s=2.0)
+    assert tracker.hedge_delay("groq", 0.9) == 2.0
+    for seconds in (0.2, 0.3, 0.4, 0.5, 1.5):
+        tracker.record("groq", seconds)
+    assert tracker.hedge_delay("groq", 0.5) == 0.4
+    assert tracker.hedge_delay("groq", 1.0) == 1.5
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_circuit_opens_and_half_open_probe() -> None:
+    clock = FakeClock()
+    health = ProviderHealthRegistry(failure_threshold=2, open_duration_s=30, clock=clock)
+
+    health.record_failure("groq", "m")
+    assert health.is_available("groq", "m")
+    health.record_failure("groq", "m")
+    assert not health.is_available("groq", "m")
+
+    clock.now += 31
+    assert health.acquire("groq", "m")
+    assert not health.acquire("groq", "m")
+    health.record_failure("groq", "m")
+    assert not health.is_available("groq", "m")
+
+    clock.now += 31
+    assert health.acquire("groq", "m")
+    health.record_success("groq", "m", 0.5)
+    assert health.is_available("groq", "m")
+    assert not health.get("groq", "m").circuit_open
+
+
+def test_rate_limit_cooldown_uses_retry_after() -> None:
+    clock = FakeClock()
+    health = ProviderHealthRegistry(clock=clock)
+    health.record_rate_limit("openai", "m", retry_after=5)
+    assert not health.is_available("openai", "m")
+    clock.now += 6
+    assert health.is_available("openai", "m")
+
+
+def test_rank_prefers_healthy_then_cheap_then_fast() -> None:
+    health = ProviderHealthRegistry()
+    health.record_success("openai", "m", 0.4)
+    health.record_success("anthropic", "m", 0.2)
+    health.record_success("gemini", "m", 2.0)
+    health.record_success("groq", "m", 0.3)
+    for _ in range(3):
+        health.record_failure("groq", "m")
+
+    ranked = health.rank([("anthropic", "m"), ("groq", "m"), ("openai", "m"), ("gemini", "m")])
+    assert ranked == [("gemini", "m"), ("openai", "m"), ("anthropic", "m"), ("groq", "m")]
+
+
+def test_parse_retry_after() -> None:
+    assert parse_retry_after({"retry-after": "12"}) == 12.0
+    assert parse_retry_after({}) is None
+    assert parse_retry_after({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_routing_skips_rate_limited_provider(monkeypatch) -> None:
+    events: list[str] = []
+    monkeypatch.setattr(llm_router, "provider_health", ProviderHealthRegistry())
+    monkeypatch.setitem(PROVIDER_REGISTRY, "limited", _fake_provider("limited", 0, "429", events))
+    monkeypatch.setitem(
+        PROVIDER_REGISTRY, "backup", _fake_provider("backup", 0, "select 1", events)
+    )
+
+    first = await generate_routed("q", "limited", ["backup"])
+    second = await generate_routed("q", "limited", ["backup"])
+
+    assert first.provider == second.provider == "backup"
+    assert events.count("start:limited") == 1
+    assert route_providers("limited", ["backup"]) == ["backup"]
+
+
+@pytest.mark.asyncio
+async def test_provider_throttles_and_honours_retry_after(monkeypatch) -> None:
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    monkeypatch.setenv("GROQ_RPM", "60")
+    monkeypatch.setenv("GROQ_TPM", "100000")
+    monkeypatch.setattr(rate_limit, "_PROVIDER_LIMITERS", {})
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.headers.get("x-attempt") == "limited":
+            return httpx.Response(429, headers={"Retry-After": "7"})
+        return httpx.Response(
+            200,
+            json={
+                "choices": [{"message": {"content": "select 1"}}],
+                "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+            },
+        )
+
+    provider = GroqProvider()
+    provider._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    limiter = rate_limit.get_provider_limiter("groq")
+    assert limiter is not None
+
+    response = await provider.generate("list users")
+    assert response.total_tokens == 15
+    assert limiter._tokens > 100000 - 100
+
+    provider._client.headers["x-attempt"] = "limited"
+    with pytest.raises(RateLimitError) as excinfo:
+        await provider.generate("list users")
+    await provider.close()
+
+    assert excinfo.value.retry_after == 7.0
+    assert limiter._paused_until > limiter._clock() + 6
+
+
+@pytest.mark.asyncio
+async def test_mock_provider_is_deterministic(monkeypatch) -> None:
+    monkeypatch.setenv("MOCK_LLM_ENABLED", "1")
+    prompt = "Table: public.users\n  - id: integer\n  - email: text\n"
+
+    def latencies() -> list[float]:
+        monkeypatch.setattr(MockProvider, "_generators", {})
+        provider = MockProvider(latency_ms=100, jitter_ms=50, distribution="lognormal", seed=7)
+        return [provider._latency_s() for _ in range(5)]
+
+    assert latencies() == latencies()
+    provider = MockProvider(latency_ms=0, seed=7)
+    assert provider.is_configured()
+    response = await provider.generate(prompt)
+    assert "SELECT id, email FROM public.users LIMIT 10;" in response.content
+    chunks = [chunk async for chunk in MockProvider(latency_ms=0, chunk_ms=0).stream(prompt)]
+    assert "".join(chunks) == response.content
+
+
+@pytest.mark.asyncio
+async def test_mock_provider_injects_rate_limits() -> None:
+    provider = MockProvider(latency_ms=0, rate_limit_rate=1.0)
+    with pytest.raises(RateLimitError) as excinfo:
+        await provider.generate("list users")
+    assert excinfo.value.retry_after == 1.0
+
+
+def _capture_transport(requests: list[dict], payload: dict) -> httpx.MockTransport:
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, json=payload)
+
+    return httpx.MockTransport(handler)
+
+
+@pytest.mark.asyncio
+async def test_anthropic_marks_prefix_for_prompt_caching(monkeypatch) -> None:
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test")
+    sent: list[dict] = []
+    provider = AnthropicProvider()
+    provider._client = httpx.AsyncClient(
+        transport=_capture_transport(
+            sent,
+            {
+                "content": [{"type": "text", "text": "select 1"}],
+                "usage": {
+                    "input_tokens": 12,
+                    "cache_read_input_tokens": 900,
+                    "cache_creation_input_tokens": 0,
+                    "output_tokens": 5,
+                },
+            },
+        )
+    )
+
+    response = await provider.generate("User Request:\nlist users", prefix="Schema Context: ...")
+    await provider.close()
+
+    assert sent[0]["system"] == [
+        {"type": "text", "text": "Schema Context: ...", "cache_control": {"type": "ephemeral"}}
+    ]
+    assert sent[0]["messages"] == [{"role": "user", "content": "User Request:\nlist users"}]
+    assert response.prompt_tokens == 912
+    assert response.cached_tokens == 900
+    assert response.total_tokens == 917
+
+
+@pytest.mark.asyncio
+async def test_openai_sends_prefix_first_and_reports_cached_tokens(monkeypatch) -> None:
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    sent: list[dict] = []
+    provider = OpenAIProvider()
+    provider._client = httpx.AsyncClient(
+        transport=_capture_transport(
+            sent,
+            {
+                "choices": [{"message": {"content": "select 1"}}],
+                "usage": {
+                    "prompt_tokens": 1200,
+                    "completion_tokens": 5,
+                    "total_tokens": 1205,
+                    "prompt_tokens_details": {"cached_tokens": 1024},
+                },
+            },
+        )
+    )
+
+    response = await provider.generate("list users", prefix="Schema Context: ...")
+    await provider.close()
+
+    assert [message["role"] for message in sent[0]["messages"]] == ["system", "user"]
+    assert response.cached_tokens == 1024
+
+
+def test_sse_decoder_handles_split_frames_and_line_endings() -> None:
+    body = (
+        ": keep-alive\r\n\r\n"
+        "event: message_start\r\ndata: {\"a\": 1}\r\n\r\n"
+        "data: first\ndata:second\n\n"
+        "id: 7\rdata: cr\r\r"
+        "data: tail"
+    )
+    for size in (1, 3, len(body)):
+        decoder = SSEDecoder()
+        events = []
+        for start in range(0, len(body), size):
+            events.extend(decoder.feed(body[start : start + size]))
+        events.extend(decoder.finish())
+
+        assert [(event.event, event.data) for event in events] == [
+            ("message_start", '{"a": 1}'),
+            ("message", "first\nsecond"),
+            ("message", "cr"),
+            ("message", "tail"),
+        ]
+        assert events[0].json() == {"a": 1}
+        assert events[2].id == "7"
+
+
+@pytest.mark.asyncio
+async def test_iter_ndjson_reassembles_partial_lines() -> None:
+    async def chunks():
+        for chunk in ['{"a": 1}\n{"b"', ': 2}\n', '\n{"c": 3}']:
+            yield chunk
+
+    assert [item async for item in iter_ndjson(chunks())] == [{"a": 1}, {"b": 2}, {"c": 3}]
+
+
+@pytest.mark.asyncio
+async def test_openai_stream_reports_usage_and_finish_reason(monkeypatch) -> None:
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    frames = [
+        {"choices": [{"delta": {"content": "select "}}]},
+        {"choices": [{"delta": {"content": "1"}, "finish_reason": "stop"}]},
+        {"choices": [], "usage": {"prompt_tokens": 9, "completion_tokens": 2, "total_tokens": 11}},
+    ]
+    body = "".join(f"data: {json.dumps(frame)}\n\n" for frame in frames) + "data: [DONE]\n\n"
+    sent: list[dict] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        sent.append(json.loads(request.content))
+        return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+    provider = OpenAIProvider()
+    provider._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    chunks = [chunk async for chunk in provider.stream("list users")]
+    await provider.close()
+
+    assert "".join(chunks) == "select 1"
+    assert sent[0]["stream_options"] == {"include_usage": True}
+    assert provider.stream_result is not None
+    assert provider.stream_result.finish_reason == "stop"
+    assert provider.stream_result.total_tokens == 11
+
+
+@pytest.mark.asyncio
+async def test_ollama_reports_top_level_token_counts() -> None:
+    provider = OllamaProvider()
+    provider._client = httpx.AsyncClient(
+        transport=_capture_transport(
+            [],
+            {
+                "model": "llama3",
+                "message": {"content": "select 1"},
+                "prompt_eval_count": 40,
+                "eval_count": 6,
+            },
+        )
+    )
+
+    response = await provider.generate("list users")
+    await provider.close()
+
+    assert (response.prompt_tokens, response.completion_tokens, response.total_tokens) == (
+        40,
+        6,
+        46,
+    )
+
+
+def test_estimate_cost_discounts_cached_input() -> None:
+    full = estimate_cost("openai", "gpt-4o-mini", 1_000_000, 0)
+    cached = estimate_cost("openai", "gpt-4o-mini", 1_000_000, 0, cached_tokens=1_000_000)
+
+    assert full == pytest.approx(0.15)
+    assert cached == pytest.approx(0.075)
+    assert estimate_cost("ollama", "llama3", 500, 50) == 0.0
+    assert estimate_cost("openai", "unknown-model", 500, 50) is None
+
+
+class _ListSink:
+    def __init__(self, fail: bool = False) -> None:
+        self.fail = fail
+        self.batches: list[list[UsageRecord]] = []
+
+    async def write(self, records: list[UsageRecord]) -> None:
+        if self.fail:
+            raise ConnectionError("sink down")
+        self.batches.append(records)
+
+
+@pytest.mark.asyncio
+async def test_usage_recorder_batches_and_summarises() -> None:
+    sink = _ListSink()
+    recorder = UsageRecorder(sink=sink, flush_size=2)
+    for latency in (10.0, 30.0):
+        recorder.record_responses(
+            [
+                LLMResponse(
+                    content="select 1",
+                    model="gpt-4o-mini",
+                    provider="openai",
+                    prompt_tokens=100,
+                    completion_tokens=10,
+                    latency_ms=latency,
+                )
+            ],
+            "chat",
+        )
+    recorder.record_failure("groq", "llama-3.3-70b-versatile", latency_ms=5.0)
+    await recorder.close()
+
+    assert sum(len(batch) for batch in sink.batches) == 3
+    rows = {row["provider"]: row for row in recorder.summary()}
+    assert rows["openai"]["calls"] == 2
+    assert rows["openai"]["avg_prompt_tokens"] == 100
+    assert rows["openai"]["latency_p95_ms"] == 30.0
+    assert rows["groq"]["failures"] == 1
+    assert recorder.summary(("operation",))[0]["operation"] in {"chat", "generate"}
+
+
+@pytest.mark.asyncio
+async def test_usage_recorder_keeps_records_when_sink_fails() -> None:
+    sink = _ListSink(fail=True)
+    recorder = UsageRecorder(sink=sink, flush_size=10)
+    recorder.record(UsageRecord(provider="mock", model="mock", operation="chat"))
+
+    with pytest.raises(ConnectionError):
+        await recorder.flush()
+    sink.fail = False
+    assert await recorder.flush() == 1
+
+
+@pytest.mark.asyncio
+async def test_jsonl_usage_sink_appends_records(tmp_path) -> None:
+    path = tmp_path / "usage" / "llm.jsonl"
+    sink = JSONLUsageSink(path)
+    await sink.write([UsageRecord(provider="mock", model="mock", operation="chat")])
+    await sink.write([UsageRecord(provider="mock", model="mock", operation="batch")])
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["operation"] for line in lines] == ["chat", "batch"]
@@ -0,0 +1,29 @@
+"""Tests for application services."""
+
+from __future__ import annotations
+
+from iopsdata.services.conversations import ConversationStore, render_history
+
+
+def test_conversation_store_windows_recent_turns_by_token_budget() -> None:
+    store = ConversationStore(max_turns=3)
+    for index in range(5):
+        store.append("c1", f"question {index}", f"select {index}")
+
+    assert [turn.sql for turn in store.turns("c1")] == ["select 2", "select 3", "select 4"]
+    assert [turn.sql for turn in store.window("c1", token_budget=10)] == ["select 4"]
+    window = store.window("c1", token_budget=1000)
+    assert render_history(window).startswith("User: question 2\nSQL: select 2")
+    assert store.window("missing") == []
+
+
+def test_conversation_store_evicts_least_recently_used() -> None:
+    store = ConversationStore(max_conversations=2)
+    store.append("a", "q", "select 1")
+    store.append("b", "q", "select 1")
+    store.window("a")
+    store.append("c", "q", "select 1")
+
+    assert len(store) == 2
+    assert store.turns("b") == []
+    assert store.turns("a") and store.turns("c")
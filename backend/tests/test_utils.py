@@ -2,10 +2,13 @@
 
 from __future__ import annotations
 
+import asyncio
+import time
+
 import pytest
 
 from iopsdata.utils.encryption import decrypt_value, encrypt_value, generate_key
-from iopsdata.utils.rate_limit import RateLimiter
+from iopsdata.utils.rate_limit import AsyncRateLimiter, RateLimiter
 from iopsdata.utils.validation import validate_sql_safe
 
 
@@ -24,3 +27,46 @@ def test_rate_limiter_allows_then_blocks() -> None:
     limiter = RateLimiter(rate=1, per_seconds=60)
     assert limiter.allow("user") is True
     assert limiter.allow("user") is False
+
+
+@pytest.mark.asyncio
+async def test_async_rate_limiter_waits_for_token_budget() -> None:
+    limiter = AsyncRateLimiter(tokens_per_minute=600)
+    await limiter.acquire(tokens=600)
+
+    started = time.perf_counter()
+    await limiter.acquire(tokens=3)
+    assert time.perf_counter() - started >= 0.25
+
+
+@pytest.mark.asyncio
+async def test_async_rate_limiter_serves_priority_lane_first() -> None:
+    limiter = AsyncRateLimiter(requests_per_minute=600)
+    limiter._requests = 0
+    order: list[str] = []
+
+    async def request(label: str, priority: int) -> None:
+        await limiter.acquire(priority=priority)
+        order.append(label)
+
+    low = asyncio.create_task(request("low", 1))
+    await asyncio.sleep(0)
+    high = asyncio.create_task(request("high", 0))
+    await asyncio.gather(low, high)
+
+    assert order == ["high", "low"]
+    assert limiter.waiting == 0
+
+
+@pytest.mark.asyncio
+async def test_async_rate_limiter_cancelled_waiter_leaves_queue() -> None:
+    limiter = AsyncRateLimiter(requests_per_minute=1)
+    await limiter.acquire()
+
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    assert limiter.waiting == 1
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert limiter.waiting == 0